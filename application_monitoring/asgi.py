@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'application_monitoring.settings')
 
 application = get_asgi_application()
+
+# Префиксный индекс подсказок адресов строится в фоне при запуске процесса (ADDRESS_PREFIX_INDEX_ENABLED)
+from backend.autocomplete import warm_address_prefix_index  # noqa: E402
+
+warm_address_prefix_index()
@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'backend',
     'rest_framework',
@@ -125,3 +126,43 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.TokenAuthentication',
     ),
 }
+
+
+# Внутрипроцессный кеш справочников (backend.cache)
+
+REFERENCE_CACHE_MAX_ENTRIES = 16
+REFERENCE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+# Размер пачки идентификаторов заявок, резервируемой процессом (1 - без резервирования)
+
+REQUEST_ID_BLOCK_SIZE = 1
+
+
+# Нормативные сроки выполнения заявок (backend.sla): для аварийных дефектов - в часах,
+# для остальных - повторный срок дефекта в днях, а если он не задан - срок по умолчанию
+
+SLA_EMERGENCY_TERM_HOURS = 24
+SLA_DEFAULT_TERM_DAYS = 3
+SLA_WARNING_HOURS = 24
+
+
+# Шаг (в секундах), с которым в списке просроченных заявок пересчитываются остаток срока и состав выборки:
+# в пределах шага ответ не меняется, и повторный запрос подтверждается по ETag (304)
+
+SLA_CONDITIONAL_GET_SECONDS = 60
+
+
+# Поток заявок по часам и суткам (backend.flows): сколько суток хранятся часовые интервалы
+# до свёртки в суточные и наибольший период почасовой выборки
+
+REQUEST_FLOW_HOURLY_DAYS = 35
+REQUEST_FLOW_MAX_HOURLY_DAYS = 31
+
+
+# Подсказки адресов (backend.autocomplete): число подсказок по умолчанию и наибольшее,
+# внутрипроцессный префиксный индекс (строится при запуске WSGI-приложения, занимает память в каждом процессе)
+
+ADDRESS_SUGGEST_LIMIT = 10
+ADDRESS_SUGGEST_MAX_LIMIT = 50
+ADDRESS_PREFIX_INDEX_ENABLED = False
@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import User, Organization, ImplementingOrganization, ODS, Address, Defect, WorkPerformedType, \
-    SecurityEvents, Request, MarmExecutor, MarmImplementingOrganization, ClosingResult, Review, Refinement
+    SecurityEvents, Request, MarmExecutor, MarmImplementingOrganization, ClosingResult, Review, Refinement, \
+    UrgencyCategory, RequestStatus, RequestSource, PaymentCategory, Efficiency, OpenRequestRollup, \
+    RequestFlowBucket
 
 
 @admin.register(User)
@@ -85,3 +87,24 @@ class ContactAdmin(admin.ModelAdmin):
 @admin.register(Refinement)
 class ContactAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(UrgencyCategory)
+@admin.register(RequestStatus)
+@admin.register(RequestSource)
+@admin.register(PaymentCategory)
+@admin.register(Efficiency)
+class LookupAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'code')
+
+
+@admin.register(OpenRequestRollup)
+class OpenRequestRollupAdmin(admin.ModelAdmin):
+    list_display = ('dimension', 'key', 'open_count', 'updated_at')
+    list_filter = ('dimension',)
+
+
+@admin.register(RequestFlowBucket)
+class RequestFlowBucketAdmin(admin.ModelAdmin):
+    list_display = ('event', 'dimension', 'key', 'granularity', 'bucket_start', 'count')
+    list_filter = ('event', 'dimension', 'granularity')
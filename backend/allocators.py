@@ -0,0 +1,83 @@
+import threading
+from collections import deque
+from datetime import datetime
+
+import pytz
+from django.conf import settings
+from django.db import connection
+
+from backend.models import RequestNumberCounter
+
+# Общая последовательность для root_id и version_id заявок (создаётся миграцией 0012)
+REQUEST_ID_SEQUENCE = 'backend_request_identifier_seq'
+
+
+def fetch_sequence_values(sequence, count):
+    """
+    Получение count новых значений последовательности одним запросом
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT nextval(%s) FROM generate_series(1, %s)', [sequence, count])
+        return [row[0] for row in cursor.fetchall()]
+
+
+class SequenceAllocator:
+    """
+    Выдача идентификаторов из последовательности Postgres.
+
+    При block_size > 1 процесс резервирует идентификаторы пачкой и раздаёт их из памяти,
+    обращаясь к БД раз в block_size выдач. Значения последовательности не повторяются,
+    поэтому идентификаторы разных процессов не пересекаются; неиспользованный остаток
+    пачки при перезапуске процесса просто пропускается.
+    """
+
+    def __init__(self, sequence, block_size=1):
+        self.sequence = sequence
+        self.block_size = block_size
+        self._reserved = deque()
+        self._lock = threading.Lock()
+
+    def allocate(self, count=1):
+        if self.block_size <= 1:
+            return fetch_sequence_values(self.sequence, count)
+        with self._lock:
+            if len(self._reserved) < count:
+                self._reserved.extend(fetch_sequence_values(self.sequence,
+                                                            max(self.block_size, count - len(self._reserved))))
+            return [self._reserved.popleft() for _ in range(count)]
+
+
+request_id_allocator = SequenceAllocator(REQUEST_ID_SEQUENCE, getattr(settings, 'REQUEST_ID_BLOCK_SIZE', 1))
+
+
+def allocate_request_ids(count):
+    """
+    Новые идентификаторы для root_id/version_id заявок
+    """
+    return request_id_allocator.allocate(count)
+
+
+def allocate_request_id():
+    return request_id_allocator.allocate()[0]
+
+
+def allocate_request_numbers(count, year=None):
+    """
+    count номеров новых заявок вида "N/ГГ" из счётчика текущего года (по московскому времени).
+
+    Счётчик увеличивается одним запросом INSERT ... ON CONFLICT DO UPDATE ... RETURNING: строка года
+    блокируется только на время этого запроса, а запись за новый год создаётся без отдельной проверки.
+    """
+    if year is None:
+        year = datetime.now(pytz.timezone('Europe/Moscow')).year
+    table = connection.ops.quote_name(RequestNumberCounter._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {table} (year, last_number) VALUES (%s, %s) '
+                       f'ON CONFLICT (year) DO UPDATE SET last_number = {table}.last_number + EXCLUDED.last_number '
+                       f'RETURNING last_number', [year, count])
+        last_number = cursor.fetchone()[0]
+    return [f'{number}/{str(year)[-2:]}' for number in range(last_number - count + 1, last_number + 1)]
+
+
+def allocate_request_number(year=None):
+    return allocate_request_numbers(1, year)[0]
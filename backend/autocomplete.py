@@ -0,0 +1,191 @@
+import bisect
+import logging
+import re
+import sys
+import threading
+from array import array
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import CharField
+from django.db.models.functions import Cast
+
+from backend.models import Address
+from backend.references import get_reference_version
+
+logger = logging.getLogger(__name__)
+
+# Наименьшая длина текста для нечёткого поиска: триграммы по более коротким строкам не отбирают
+MIN_FUZZY_LENGTH = 3
+
+# Поля подсказки
+SUGGEST_FIELDS = ('unom', 'problem_address', 'district_name')
+
+# Справочник, версия которого отмечает изменения адресов (backend.references)
+ADDRESSES_REFERENCE = 'addresses'
+
+
+def normalize(text):
+    """
+    Текст для сравнения по началу: нижний регистр, "ё" как "е", знаки препинания как пробелы
+    """
+    return ' '.join(re.sub(r'[^\w]+', ' ', text.casefold().replace('ё', 'е')).split())
+
+
+def address_suggestions_from_db(text, limit, exclude=()):
+    """
+    Подсказки из БД: для числа - адреса, УНОМ которых начинается с него (индекс address_unom_prefix_idx),
+    для текста - адреса, одно из слов которых начинается с текста, по алфавиту, а за ними (для текста
+    не короче MIN_FUZZY_LENGTH) - похожие по триграммам на слова адреса (индекс address_problem_trgm_idx)
+    """
+    queryset = Address.objects.exclude(unom__in=exclude)
+    if text.isdigit():
+        queryset = queryset.annotate(unom_text=Cast('unom', output_field=CharField())) \
+            .filter(unom_text__startswith=text).order_by('unom')
+        return list(queryset.values(*SUGGEST_FIELDS)[:limit])
+    if not text:
+        return []
+    # \m - начало слова в регулярных выражениях PostgreSQL
+    found = list(queryset.filter(problem_address__iregex=rf'\m{re.escape(text)}')
+                 .order_by('problem_address').values(*SUGGEST_FIELDS)[:limit])
+    if len(found) < limit and len(text) >= MIN_FUZZY_LENGTH:
+        found += queryset.exclude(unom__in=[row['unom'] for row in found]) \
+            .filter(problem_address__trigram_word_similar=text) \
+            .annotate(similarity=TrigramWordSimilarity(text, 'problem_address')) \
+            .order_by('-similarity', 'problem_address').values(*SUGGEST_FIELDS)[:limit - len(found)]
+    return found
+
+
+class AddressPrefixIndex:
+    """
+    Внутрипроцессный префиксный индекс адресов: отсортированный список слов адресов и УНОМ
+    с бинарным поиском по началу слова. УНОМ в адрес не входит, поэтому ищется только отдельным словом.
+
+    Слова хранятся по одному экземпляру (sys.intern), номера адресов - в компактном массиве.
+    Индекс строится целиком для версии справочника адресов и заменяется новым после изменений.
+    """
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.rows = tuple(rows)
+        self.addresses = tuple(f' {normalize(row[1])}' for row in self.rows)
+        entries = []
+        for position, (row, address) in enumerate(zip(self.rows, self.addresses)):
+            entries.append((str(row[0]), position))
+            entries += [(sys.intern(word), position) for word in set(address.split())]
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.positions = array('I', (position for _, position in entries))
+
+    @classmethod
+    def build(cls):
+        version, _ = get_reference_version(ADDRESSES_REFERENCE)
+        return cls(version, Address.objects.order_by('problem_address').values_list(*SUGGEST_FIELDS).iterator())
+
+    def word_range(self, prefix):
+        """
+        Диапазон ключей, начинающихся с prefix
+        """
+        return bisect.bisect_left(self.keys, prefix), bisect.bisect_left(self.keys, prefix + '\U0010ffff')
+
+    def search(self, text, limit):
+        """
+        Не более limit адресов, у которых УНОМ или слова адреса начинаются со слов text (в любом порядке)
+        """
+        words = normalize(text).split()
+        if not words:
+            return []
+        # Кандидаты берутся по самому редкому слову и проверяются по остальным
+        start, end = min((self.word_range(word) for word in words), key=lambda bounds: bounds[1] - bounds[0])
+        others = [f' {word}' for word in words]
+        found, seen = [], set()
+        for index in range(start, end):
+            position = self.positions[index]
+            if position in seen:
+                continue
+            seen.add(position)
+            if len(words) > 1 and not all(word in self.addresses[position] for word in others):
+                continue
+            found.append(dict(zip(SUGGEST_FIELDS, self.rows[position])))
+            if len(found) == limit:
+                break
+        return found
+
+
+class AddressPrefixIndexHolder:
+    """
+    Текущий префиксный индекс процесса. Перестроение идёт в фоновом потоке, пока оно не закончено,
+    подсказки берутся из БД
+    """
+
+    def __init__(self):
+        self.index = None
+        self._lock = threading.Lock()
+        self._building = False
+
+    def start_building(self):
+        """
+        Отметка о начале перестроения; False, если оно уже идёт
+        """
+        with self._lock:
+            if self._building:
+                return False
+            self._building = True
+            return True
+
+    def build(self):
+        try:
+            self.index = AddressPrefixIndex.build()
+        except Exception:
+            logger.exception('Не удалось построить префиксный индекс адресов')
+        finally:
+            self._building = False
+
+    def rebuild(self):
+        if self.start_building():
+            self.build()
+
+    def warm(self):
+        """
+        Запуск перестроения в фоновом потоке, если оно ещё не идёт
+        """
+        if self.start_building():
+            threading.Thread(target=self.build, name='address-prefix-index', daemon=True).start()
+
+    def get_current(self):
+        """
+        Индекс текущей версии справочника адресов или None (тогда запускается перестроение)
+        """
+        index = self.index
+        version, _ = get_reference_version(ADDRESSES_REFERENCE)
+        if index is not None and index.version == version:
+            return index
+        self.warm()
+        return None
+
+
+address_prefix_index = AddressPrefixIndexHolder()
+
+
+def warm_address_prefix_index():
+    """
+    Построение префиксного индекса при запуске процесса, если он включён (ADDRESS_PREFIX_INDEX_ENABLED)
+    """
+    if settings.ADDRESS_PREFIX_INDEX_ENABLED:
+        address_prefix_index.warm()
+
+
+def address_suggestions(text, limit):
+    """
+    Подсказки адресов по началу УНОМ или слова адреса и по похожести. Если включён префиксный индекс,
+    совпадения по началу берутся из памяти, а БД запрашивается, только если их меньше limit
+    """
+    text = text.strip()
+    found = []
+    if settings.ADDRESS_PREFIX_INDEX_ENABLED:
+        index = address_prefix_index.get_current()
+        if index is not None:
+            found = index.search(text, limit)
+            if len(found) == limit:
+                return found
+    return found + address_suggestions_from_db(text, limit - len(found), [row['unom'] for row in found])
@@ -0,0 +1,97 @@
+import threading
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+
+from backend.streaming import dump_json
+
+
+class ReferenceSnapshot:
+    """
+    Снимок справочника определённой версии: сериализованные строки и готовое тело ответа
+    """
+
+    def __init__(self, name, version, data):
+        self.name = name
+        self.version = version
+        self.rows = tuple(dump_json(row) for row in data)
+        self.content = f'[{",".join(self.rows)}]'.encode()
+        self._counter = None
+
+    @property
+    def size(self):
+        return len(self.content) + sum(len(row) for row in self.rows)
+
+    @property
+    def counter(self):
+        if self._counter is None:
+            self._counter = Counter(self.rows)
+        return self._counter
+
+    def delta_content(self, previous):
+        """
+        Тело ответа с изменениями относительно предыдущего снимка: добавленные и удалённые строки
+        """
+        if previous.version == self.version:
+            return f'{{"version":{self.version},"unchanged":true}}'.encode()
+        added = ','.join((self.counter - previous.counter).elements())
+        removed = ','.join((previous.counter - self.counter).elements())
+        return f'{{"version":{self.version},"unchanged":false,"added":[{added}],"removed":[{removed}]}}'.encode()
+
+    def full_content(self):
+        """
+        Тело ответа для клиента, чья версия неизвестна: справочник целиком
+        """
+        return f'{{"version":{self.version},"unchanged":false,"results":{self.content.decode()}}}'.encode()
+
+
+class ReferenceCache:
+    """
+    Внутрипроцессный LRU-кеш снимков справочников, ключ - (справочник, версия).
+
+    Версии хранятся в БД (ReferenceVersion) и увеличиваются сигналами при изменении данных,
+    поэтому устаревший снимок просто перестаёт запрашиваться и вытесняется.
+    Предыдущие версии остаются в кеше, пока на них хватает места, и используются для расчёта дельты.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._snapshots = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, name, version):
+        with self._lock:
+            snapshot = self._snapshots.get((name, version))
+            if snapshot is not None:
+                self._snapshots.move_to_end((name, version))
+            return snapshot
+
+    def put(self, snapshot):
+        key = (snapshot.name, snapshot.version)
+        with self._lock:
+            if key in self._snapshots:
+                return self._snapshots[key]
+            self._snapshots[key] = snapshot
+            self._size += snapshot.size
+            while len(self._snapshots) > 1 and \
+                    (len(self._snapshots) > self.max_entries or self._size > self.max_bytes):
+                _, evicted = self._snapshots.popitem(last=False)
+                self._size -= evicted.size
+            return snapshot
+
+    def get_or_build(self, name, version, get_data):
+        snapshot = self.get(name, version)
+        if snapshot is None:
+            snapshot = self.put(ReferenceSnapshot(name, version, get_data()))
+        return snapshot
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+            self._size = 0
+
+
+reference_cache = ReferenceCache(max_entries=getattr(settings, 'REFERENCE_CACHE_MAX_ENTRIES', 16),
+                                 max_bytes=getattr(settings, 'REFERENCE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
@@ -0,0 +1,212 @@
+from functools import lru_cache
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist
+from django.db import models
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import ManyRelatedField, PKOnlyObject, PrimaryKeyRelatedField
+
+# Поля, у которых to_representation сводится к приведению типа: значение нужного типа отдаётся как есть
+PASSTHROUGH_FIELDS = {
+    serializers.CharField: str,
+    serializers.IntegerField: int,
+}
+
+
+def _is_model_path(model, attrs):
+    """
+    Проверка, что source поля проходит только по полям и связям моделей (без свойств и методов)
+    """
+    for attr in attrs:
+        if model is None:
+            return False
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return False
+        model = model_field.related_model
+    return True
+
+
+def _compile_getter(field, model):
+    """
+    Функция чтения атрибута поля с той же семантикой, что у Field.get_attribute
+    """
+    if not _is_model_path(model, field.source_attrs):
+        return field.get_attribute
+    getter = attrgetter('.'.join(field.source_attrs))
+
+    def get_attribute(instance):
+        try:
+            return getter(instance)
+        except ObjectDoesNotExist:
+            return None
+        except (KeyError, AttributeError):
+            return field.get_attribute(instance)
+
+    return get_attribute
+
+
+def _compile_many_getter(field, model):
+    """
+    Функция чтения связи "ко многим": результат prefetch_related берётся напрямую из кеша объекта,
+    без создания менеджера связи; в остальных случаях - как у ListSerializer (manager.all())
+    """
+    get_attribute = _compile_getter(field, model)
+    if len(field.source_attrs) != 1:
+        return get_attribute
+    cache_name = field.source_attrs[0]
+
+    def get_related(instance):
+        prefetched = getattr(instance, '_prefetched_objects_cache', None)
+        if prefetched is not None and cache_name in prefetched:
+            return prefetched[cache_name]
+        value = get_attribute(instance)
+        return value.all() if isinstance(value, models.Manager) else value
+
+    return get_related
+
+
+def _compile_field(field, model, fieldset=None):
+    """
+    Функция получения представления одного поля сериализатора (fieldset - выбранные вложенные поля)
+    """
+    if isinstance(field, serializers.ListSerializer):
+        get_related = _compile_many_getter(field, model)
+        child = _compile_serializer(field.child, fieldset)
+
+        def read_list(instance):
+            value = get_related(instance)
+            return None if value is None else [child(item) for item in value]
+
+        return read_list
+
+    if isinstance(field, ManyRelatedField) and type(field.child_relation) is PrimaryKeyRelatedField \
+            and field.child_relation.pk_field is None and _is_model_path(model, field.source_attrs):
+        get_related = _compile_many_getter(field, model)
+
+        def read_pks(instance):
+            if instance.pk is None:
+                return []
+            value = get_related(instance)
+            return None if value is None else [item.pk for item in value]
+
+        return read_pks
+
+    if isinstance(field, serializers.BaseSerializer):
+        get_attribute = _compile_getter(field, model)
+        child = _compile_serializer(field, fieldset)
+
+        def read_nested(instance):
+            value = get_attribute(instance)
+            return None if value is None else child(value)
+
+        return read_nested
+
+    get_attribute = _compile_getter(field, model)
+    python_type = PASSTHROUGH_FIELDS.get(type(field))
+    if python_type is not None:
+        to_representation = field.to_representation
+
+        def read_passthrough(instance):
+            value = get_attribute(instance)
+            if value is None or type(value) is python_type:
+                return value
+            return to_representation(value)
+
+        return read_passthrough
+
+    def read_value(instance):
+        value = field.get_attribute(instance)
+        check_for_none = value.pk if isinstance(value, PKOnlyObject) else value
+        return None if check_for_none is None else field.to_representation(value)
+
+    return read_value
+
+
+def _is_local_value(model, field):
+    """
+    Проверка, что поле читает обычное (не связанное) поле самой модели: такое чтение не может упасть
+    """
+    if len(field.source_attrs) != 1 or not _is_model_path(model, field.source_attrs):
+        return False
+    model_field = model._meta.get_field(field.source_attrs[0])
+    return model_field.concrete and not model_field.is_relation
+
+
+def _compile_serializer(serializer, fieldset=None):
+    """
+    Сборка функции to_representation из объявления сериализатора.
+
+    Исходный код функции генерируется один раз: простые поля модели читаются обращением к атрибуту прямо
+    в теле функции, остальные поля - через заранее собранные функции чтения.
+    Если передан fieldset (см. backend.fieldsets), в результат попадают только выбранные поля.
+    """
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    selected = None if fieldset is None else dict(fieldset)
+    namespace = {'SkipField': SkipField}
+    lines = ['def to_representation(instance):', '    ret = {}']
+    for index, field in enumerate(serializer._readable_fields):
+        if selected is not None and field.field_name not in selected:
+            continue
+        key = repr(field.field_name)
+        python_type = PASSTHROUGH_FIELDS.get(type(field))
+        if python_type is not None and _is_local_value(model, field):
+            namespace[f'type_{index}'] = python_type
+            namespace[f'convert_{index}'] = field.to_representation
+            lines += [f'    value = instance.{field.source_attrs[0]}',
+                      f'    ret[{key}] = value if value is None or type(value) is type_{index} '
+                      f'else convert_{index}(value)']
+        else:
+            nested_fieldset = None if selected is None else selected[field.field_name]
+            namespace[f'read_{index}'] = _compile_field(field, model, nested_fieldset)
+            lines += ['    try:',
+                      f'        ret[{key}] = read_{index}(instance)',
+                      '    except SkipField:',
+                      '        pass']
+    lines.append('    return ret')
+    exec('\n'.join(lines), namespace)
+    return namespace['to_representation']
+
+
+class CompiledSerializer:
+    """
+    Сериализатор только для чтения, собранный из объявления DRF-сериализатора.
+
+    Обход полей и вложенных сериализаторов выполняется один раз при первом использовании,
+    далее каждая строка превращается в словарь простыми обращениями к атрибутам.
+    Результат совпадает с serializer.data исходного сериализатора.
+    """
+    serializer_class = None
+    fieldset = None
+    _to_representation = None
+
+    def __init__(self, instance=None, many=False, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = kwargs.get('context', {})
+
+    @classmethod
+    def get_to_representation(cls):
+        if cls._to_representation is None:
+            cls._to_representation = staticmethod(_compile_serializer(cls.serializer_class(), cls.fieldset))
+        return cls._to_representation
+
+    @property
+    def data(self):
+        to_representation = self.get_to_representation()
+        if self.many:
+            instances = self.instance.all() if isinstance(self.instance, models.Manager) else self.instance
+            return [to_representation(instance) for instance in instances]
+        return to_representation(self.instance)
+
+
+@lru_cache(maxsize=128)
+def compile_serializer(serializer_class, fieldset=None):
+    """
+    Создание скомпилированного сериализатора для чтения по классу DRF-сериализатора.
+    Для каждого набора полей класс создаётся один раз и переиспользуется.
+    """
+    return type(f'Compiled{serializer_class.__name__}', (CompiledSerializer,),
+                {'serializer_class': serializer_class, 'fieldset': fieldset})
@@ -0,0 +1,99 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from backend.cache import reference_cache
+from backend.references import get_reference_version
+
+
+class ConditionalListMixin:
+    """
+    Миксин условных GET-запросов (ETag / Last-Modified) для списков.
+
+    Валидаторы считаются дешёвым запросом (get_list_validators) до основной выборки:
+    если клиент прислал совпадающие If-None-Match / If-Modified-Since, возвращается 304
+    без выполнения основного запроса и сериализации.
+    """
+    # Поле времени последнего изменения записи для валидаторов по умолчанию
+    last_modified_field = 'updated_at'
+    _etag = None
+    _last_modified = None
+
+    def get_list_validators(self):
+        """
+        Возвращает пару (состояние данных, время последнего изменения или None).
+        По умолчанию - число записей и наибольшее значение last_modified_field в выборке представления
+        """
+        values = self.filter_queryset(self.get_queryset()).order_by() \
+            .aggregate(count=Count('pk'), last_modified=Max(self.last_modified_field))
+        return f"{values['count']}|{values['last_modified']}", values['last_modified']
+
+    def get_not_modified_response(self, request):
+        state, last_modified = self.get_list_validators()
+        digest = hashlib.md5(f'{request.get_full_path()}|{state}'.encode()).hexdigest()
+        self._etag = quote_etag(digest)
+        self._last_modified = int(last_modified.timestamp()) if last_modified is not None else None
+        return get_conditional_response(request, etag=self._etag, last_modified=self._last_modified)
+
+    def list(self, request, *args, **kwargs):
+        response = self.get_not_modified_response(request)
+        if response is not None:
+            return response
+        return super().list(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self._etag is not None and response.status_code == 200:
+            response.setdefault('ETag', self._etag)
+            if self._last_modified is not None:
+                response.setdefault('Last-Modified', http_date(self._last_modified))
+        return response
+
+
+class ReferenceConditionalListMixin(ConditionalListMixin):
+    """
+    Условные GET-запросы для справочника: валидатором служит счётчик изменений (ReferenceVersion)
+    """
+    reference_name = None
+    reference_version = None
+
+    def get_list_validators(self):
+        self.reference_version, updated_at = get_reference_version(self.reference_name)
+        return self.reference_version, updated_at
+
+
+class CachedReferenceListMixin(ReferenceConditionalListMixin):
+    """
+    Список справочника из внутрипроцессного кеша (backend.cache).
+
+    Без параметров возвращается справочник целиком (как и раньше), версия передаётся в заголовке
+    X-Reference-Version. С параметром ?version=<последняя известная клиенту версия> возвращается
+    объект {"version", "unchanged"} и при изменениях - дельта ("added", "removed")
+    либо справочник целиком ("results"), если прежней версии уже нет в кеше.
+    """
+
+    def get_reference_data(self):
+        """
+        Данные справочника для сериализации (список словарей)
+        """
+        return self.get_serializer(self.filter_queryset(self.get_queryset()), many=True).data
+
+    def list(self, request, *args, **kwargs):
+        response = self.get_not_modified_response(request)
+        if response is not None:
+            return response
+        snapshot = reference_cache.get_or_build(self.reference_name, self.reference_version,
+                                                self.get_reference_data)
+        client_version = request.query_params.get('version')
+        if client_version is None:
+            content = snapshot.content
+        else:
+            previous = reference_cache.get(self.reference_name, int(client_version)) \
+                if client_version.isdigit() else None
+            content = snapshot.delta_content(previous) if previous is not None else snapshot.full_content()
+        response = HttpResponse(content, content_type='application/json')
+        response['X-Reference-Version'] = snapshot.version
+        return response
@@ -0,0 +1,145 @@
+import csv
+import io
+import tempfile
+import zlib
+from datetime import datetime
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from backend.serializers import SIGN_YES, SIGN_NO
+from backend.streaming import iterate_queryset, STREAM_CHUNK_SIZE
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    # Выгрузка в XLSX доступна только при установленном openpyxl
+    Workbook = None
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+# Наибольшее число строк данных на листе XLSX (без заголовка), большие выгрузки возможны только в CSV
+XLSX_MAX_ROWS = 1048575
+
+# Разделитель CSV, который Excel с русской локалью открывает без настройки импорта
+CSV_DELIMITER = ';'
+
+# Начала строк, с которых Excel и другие табличные редакторы начинают формулу (CSV/XLSX injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Колонки выгрузки: путь к значению от заявки и заголовок
+EXPORT_COLUMNS = (
+    ('root_id', 'Корневой ИД'),
+    ('number', 'Номер'),
+    ('unique_public_services_appeal_number', 'Номер обращения ГУ'),
+    ('created_at', 'Дата создания'),
+    ('updated_at', 'Дата изменения'),
+    ('status__name', 'Статус'),
+    ('source__name', 'Источник поступления'),
+    ('creator_name', 'Имя создателя'),
+    ('incident_sign', 'Признак инцидента'),
+    ('parent_application_number', 'Номер материнской заявки'),
+    ('description', 'Описание'),
+    ('address__country_name', 'Округ'),
+    ('address__district_name', 'Район'),
+    ('address__problem_address', 'Адрес'),
+    ('address__unom', 'УНОМ'),
+    ('address__ods__number', 'ОДС'),
+    ('address__management_company', 'Управляющая компания'),
+    ('entrance', 'Подъезд'),
+    ('floor', 'Этаж'),
+    ('apartment', 'Квартира'),
+    ('defect__category_name', 'Категория дефекта'),
+    ('defect__name', 'Дефект'),
+    ('defect__urgency_category__name', 'Категория срочности'),
+    ('implementing_organization__name', 'Организация-исполнитель'),
+    ('implementing_organization__inn', 'ИНН исполнителя'),
+    ('payment_category__name', 'Категория платности'),
+    ('card_payment_sign', 'Оплата картой'),
+    ('user__username', 'Пользователь'),
+    ('closing_result__efficiency__name', 'Результативность'),
+    ('closing_result__consumed_material', 'Израсходованный материал'),
+    ('closing_result__being_under_revision_sign', 'На доработке'),
+    ('closing_result__closing_date', 'Дата закрытия'),
+)
+
+
+def format_value(value):
+    if isinstance(value, bool):
+        return SIGN_YES if value else SIGN_NO
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime('%d.%m.%Y %H:%M:%S')
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Текст, который Excel принял бы за формулу, выгружается как текст
+        return f"'{value}"
+    return '' if value is None else value
+
+
+def export_rows(queryset, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Строки выгрузки из серверного курсора: в памяти одновременно только chunk_size строк
+    """
+    queryset = queryset.order_by('created_at', 'root_id').values_list(*(path for path, _ in EXPORT_COLUMNS))
+    for row in iterate_queryset(queryset, chunk_size):
+        yield [format_value(value) for value in row]
+
+
+def iterate_csv(rows, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    CSV по частям из chunk_size строк. Файл начинается с BOM, чтобы Excel распознал UTF-8
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=CSV_DELIMITER)
+    buffer.write('\ufeff')
+    writer.writerow([title for _, title in EXPORT_COLUMNS])
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iterate_gzip(chunks):
+    """
+    Сжатие текстового потока в gzip по мере формирования частей
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def write_xlsx(rows, file):
+    """
+    Запись строк в XLSX в режиме write_only: openpyxl сбрасывает строки во временный файл, а не держит лист в памяти
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Заявки')
+    sheet.append([title for _, title in EXPORT_COLUMNS])
+    for row in rows:
+        sheet.append(row)
+    workbook.save(file)
+
+
+def export_response(queryset, file_format='csv', compress=False):
+    """
+    Файл выгрузки заявок: CSV отдаётся потоком (при compress - сжатым в gzip), XLSX формируется
+    во временном файле и отдаётся по частям
+    """
+    if file_format == 'xlsx':
+        file = tempfile.TemporaryFile()
+        write_xlsx(export_rows(queryset), file)
+        file.seek(0)
+        return FileResponse(file, as_attachment=True, filename='requests.xlsx')
+    chunks = iterate_csv(export_rows(queryset))
+    if compress:
+        response = StreamingHttpResponse(iterate_gzip(chunks), content_type='application/gzip')
+        response['Content-Disposition'] = 'attachment; filename="requests.csv.gz"'
+    else:
+        response = StreamingHttpResponse(chunks, content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="requests.csv"'
+    return response
@@ -0,0 +1,139 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import ManyRelatedField, SlugRelatedField
+
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()] if value else []
+
+
+def _nested_serializer(field):
+    if isinstance(field, serializers.ListSerializer):
+        return field.child
+    if isinstance(field, serializers.BaseSerializer):
+        return field
+    return None
+
+
+def _is_relation(field):
+    return _nested_serializer(field) is not None or isinstance(field, ManyRelatedField)
+
+
+def _add_path(serializer, selection, path, param):
+    name, _, rest = path.partition('.')
+    field = serializer.fields.get(name)
+    if field is None or field.write_only:
+        raise ValidationError({param: f'Неизвестное поле: {name}'})
+    if not rest:
+        selection[name] = None
+        return
+    nested = _nested_serializer(field)
+    if nested is None:
+        raise ValidationError({param: f'Поле {name} не содержит вложенных полей'})
+    if name in selection and selection[name] is None:
+        return
+    _add_path(nested, selection.setdefault(name, {}), rest, param)
+
+
+def _freeze(selection):
+    return tuple(sorted((name, None if nested is None else _freeze(nested)) for name, nested in selection.items()))
+
+
+def parse_fieldset(serializer, fields=None, expand=None):
+    """
+    Разбор параметров ?fields= и ?expand= в набор полей сериализатора.
+
+    fields - перечень полей через запятую (вложенные поля через точку: address.problem_address),
+    expand - связанные объекты, добавляемые к выбранным полям. Если указан только expand,
+    в ответ попадают все простые поля и перечисленные связанные объекты.
+    Возвращает неизменяемый набор полей (кортеж пар "поле - вложенный набор или None")
+    либо None, если ответ не ограничивается.
+    """
+    fields, expand = _split(fields), _split(expand)
+    if not fields and not expand:
+        return None
+    selection = {}
+    if not fields:
+        for name, field in serializer.fields.items():
+            if not field.write_only and not _is_relation(field):
+                selection[name] = None
+    for path in fields:
+        _add_path(serializer, selection, path, 'fields')
+    for path in expand:
+        _add_path(serializer, selection, path, 'expand')
+    return _freeze(selection)
+
+
+class _QueryShape:
+    """
+    Связи и поля, которые нужно загрузить для выбранного набора полей
+    """
+
+    def __init__(self):
+        self.select_related = []
+        self.prefetch_related = []
+        self.only = []
+        self.restrict_columns = True
+
+    def add_relation(self, lookup, many, in_prefetch):
+        if many or in_prefetch:
+            self.prefetch_related.append(lookup)
+        else:
+            self.select_related.append(lookup)
+
+    def collect(self, serializer, fieldset, prefix='', in_prefetch=False):
+        model = serializer.Meta.model
+        selected = None if fieldset is None else dict(fieldset)
+        for field in serializer._readable_fields:
+            if selected is not None and field.field_name not in selected:
+                continue
+            nested_fieldset = None if selected is None else selected[field.field_name]
+            if field.source == '*':
+                self.restrict_columns = False
+                continue
+            lookup, current_model, many = prefix, model, in_prefetch
+            for attr in field.source_attrs:
+                try:
+                    model_field = current_model._meta.get_field(attr)
+                except (FieldDoesNotExist, AttributeError):
+                    # Свойство или метод модели: набор колонок заранее не известен
+                    self.restrict_columns = False
+                    break
+                lookup = f'{lookup}__{attr}' if lookup else attr
+                if model_field.is_relation:
+                    many = many or model_field.many_to_many or model_field.one_to_many
+                    self.add_relation(lookup, many, in_prefetch)
+                    current_model = model_field.related_model
+                    if not many:
+                        # Без явного первичного ключа .only() загрузит связанную модель целиком
+                        self.only.append(f'{lookup}__{current_model._meta.pk.name}')
+                        if model_field.concrete:
+                            self.only.append(lookup)
+                elif not many:
+                    self.only.append(lookup)
+            else:
+                nested = _nested_serializer(field)
+                if nested is not None:
+                    self.collect(nested, nested_fieldset, lookup, many)
+                elif isinstance(field, SlugRelatedField) and not many:
+                    # Связь отдаётся значением одного поля связанной модели
+                    self.only.append(f'{lookup}__{field.slug_field}')
+
+
+def shape_queryset(queryset, serializer, fieldset, extra_fields=()):
+    """
+    Сужение queryset под выбранный набор полей: в select_related/prefetch_related остаются только
+    нужные связи, а .only() ограничивает загружаемые колонки.
+    extra_fields - поля, которые нужны представлению помимо сериализатора (например, для пагинации).
+    """
+    shape = _QueryShape()
+    shape.collect(serializer, fieldset)
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if shape.select_related:
+        queryset = queryset.select_related(*shape.select_related)
+    if shape.prefetch_related:
+        queryset = queryset.prefetch_related(*shape.prefetch_related)
+    if shape.restrict_columns:
+        queryset = queryset.only(*extra_fields, *shape.only)
+    return queryset
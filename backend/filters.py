@@ -0,0 +1,91 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from backend.serializers import SignField
+
+
+def parse_int(value):
+    return int(value)
+
+
+def parse_sign(value):
+    if value in SignField.TRUE_VALUES:
+        return True
+    if value in SignField.FALSE_VALUES:
+        return False
+    raise ValueError(value)
+
+
+# Отбор заявок: параметр -> (условие ORM, преобразование значения, описание ожидаемого значения).
+# Каждое условие идёт по индексу: ссылки заявки на адрес, организацию-исполнителя и источник - по составным
+# индексам (ссылка, дата создания), поля адресов и дефектов - по индексам своих таблиц (см. QueryPlanTests)
+REQUEST_FILTERS = {
+    'district_code': ('address__district_code', parse_int, 'код района'),
+    'country_code': ('address__country_code', parse_int, 'код округа'),
+    'ods': ('address__ods__number', str, 'номер ОДС'),
+    'management_company': ('address__management_company', str, 'управляющая компания'),
+    'defect_category': ('defect__category_name', str, 'категория дефекта'),
+    'urgency_category': ('defect__urgency_category__name', str, 'категория срочности'),
+    'implementing_organization': ('implementing_organization__identifier', parse_int,
+                                  'идентификатор организации-исполнителя'),
+    'source': ('source__name', str, 'источник поступления'),
+    'status_name': ('status__name', str, 'статус'),
+    'incident_sign': ('incident_sign', parse_sign, 'признак инцидента'),
+}
+
+# Отбор по периодам: префикс параметров (<префикс>_from, <префикс>_to - даты включительно) -> поле
+REQUEST_DATE_FILTERS = {
+    'created': 'created_at',
+    'updated': 'updated_at',
+}
+
+
+def parse_filter_date(params, name):
+    try:
+        value = parse_date(params[name])
+    except ValueError:
+        value = None
+    if value is None:
+        raise ValidationError({name: 'Ожидается дата в формате ГГГГ-ММ-ДД'})
+    return value
+
+
+def filter_requests(queryset, params):
+    """
+    Отбор заявок по параметрам REQUEST_FILTERS и REQUEST_DATE_FILTERS. Несколько значений
+    параметра перечисляются через запятую, пустые параметры не учитываются
+    """
+    filters = {}
+    for name, (lookup, parse, description) in REQUEST_FILTERS.items():
+        if not params.get(name):
+            continue
+        try:
+            values = [parse(value.strip()) for value in str(params[name]).split(',')]
+        except ValueError:
+            raise ValidationError({name: f'Ожидается {description}'})
+        if len(values) == 1:
+            filters[lookup] = values[0]
+        else:
+            filters[f'{lookup}__in'] = values
+    # Границы периода - полночь по времени проекта, чтобы условие шло по индексу на дату
+    for prefix, field in REQUEST_DATE_FILTERS.items():
+        if params.get(f'{prefix}_from'):
+            filters[f'{field}__gte'] = timezone.make_aware(
+                datetime.combine(parse_filter_date(params, f'{prefix}_from'), time.min))
+        if params.get(f'{prefix}_to'):
+            filters[f'{field}__lt'] = timezone.make_aware(
+                datetime.combine(parse_filter_date(params, f'{prefix}_to') + timedelta(days=1), time.min))
+    return queryset.filter(**filters)
+
+
+class RequestFilterBackend(BaseFilterBackend):
+    """
+    Отбор заявок в списках по параметрам запроса (filter_requests)
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        return filter_requests(queryset, request.query_params)
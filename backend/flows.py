@@ -0,0 +1,125 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from backend.models import Request, Address, Defect, RequestSource, ClosingResult, RequestFlowBucket, RequestStatus
+
+
+def flow_source_sql(event):
+    """
+    FROM-часть выборки событий event по заявкам r и выражение времени события.
+    Каждое событие даёт по строке (разрез, значение) на источник поступления, категорию дефекта и район.
+    Закрытием считается закрытая заявка с результатом закрытия, время события - дата закрытия
+    """
+    request, address, defect, source, closing_result = (
+        connection.ops.quote_name(model._meta.db_table)
+        for model in (Request, Address, Defect, RequestSource, ClosingResult))
+    sql = (f'FROM {request} r JOIN {address} a ON a.id = r.address_id JOIN {defect} d ON d.id = r.defect_id '
+           f'JOIN {source} s ON s.id = r.source_id ')
+    if event == RequestFlowBucket.CLOSED:
+        sql += f'JOIN {closing_result} c ON c.request_id = r.id AND r.status_id = {RequestStatus.CLOSED:d} '
+    sql += (f"CROSS JOIN LATERAL (VALUES ('{RequestFlowBucket.SOURCE}', s.name), "
+            f"('{RequestFlowBucket.DEFECT_CATEGORY}', d.category_name), "
+            f"('{RequestFlowBucket.DISTRICT}', a.district_name)) AS v (dimension, key)")
+    return sql, 'r.created_at' if event == RequestFlowBucket.CREATED else 'c.closing_date'
+
+
+def flow_insert_sql():
+    table = connection.ops.quote_name(RequestFlowBucket._meta.db_table)
+    return table, f'INSERT INTO {table} (event, dimension, bucket_start, granularity, key, count) '
+
+
+def flow_conflict_sql(table):
+    return (' ON CONFLICT (event, dimension, bucket_start, granularity, key) '
+            f'DO UPDATE SET count = {table}.count + EXCLUDED.count')
+
+
+def hourly_cutoff(now=None):
+    """
+    Начало суток, раньше которого часовые интервалы сворачиваются в суточные
+    """
+    today = timezone.localdate(now or timezone.now())
+    return timezone.make_aware(datetime.combine(today - timedelta(days=settings.REQUEST_FLOW_HOURLY_DAYS), time.min))
+
+
+def adjust_request_flow(event, request_ids, sign):
+    """
+    Изменение часовых интервалов события event (создание или закрытие) на вклад заявок request_ids
+    (первичные ключи) одним INSERT ... ON CONFLICT: sign=1 добавляет, sign=-1 вычитает.
+    Время события и разрезы берутся из текущего состояния заявок в БД.
+    """
+    request_ids = list(request_ids)
+    if not request_ids:
+        return
+    source_sql, timestamp = flow_source_sql(event)
+    table, insert_sql = flow_insert_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f"{insert_sql}SELECT %s, v.dimension, date_trunc('hour', {timestamp}, %s), "
+                       f"'{RequestFlowBucket.HOUR}', v.key, %s * COUNT(*) {source_sql} "
+                       f'WHERE r.id = ANY(%s) GROUP BY v.dimension, 3, v.key{flow_conflict_sql(table)}',
+                       [event, settings.TIME_ZONE, sign, request_ids])
+
+
+def compact_request_flow(now=None):
+    """
+    Свёртка часовых интервалов старше REQUEST_FLOW_HOURLY_DAYS суток в суточные.
+
+    Удаление и добавление выполняются одним запросом, поэтому одновременные изменения часовых интервалов
+    не теряются: если такое изменение создаст часовой интервал заново, он будет свёрнут при следующем запуске.
+    Возвращает число изменённых суточных интервалов.
+    """
+    table, insert_sql = flow_insert_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f'WITH moved AS (DELETE FROM {table} WHERE granularity = %s AND bucket_start < %s '
+                       f'RETURNING event, dimension, bucket_start, key, count) '
+                       f"{insert_sql}SELECT event, dimension, date_trunc('day', bucket_start, %s), %s, key, SUM(count) "
+                       f'FROM moved GROUP BY event, dimension, 3, key HAVING SUM(count) <> 0{flow_conflict_sql(table)}',
+                       [RequestFlowBucket.HOUR, hourly_cutoff(now), settings.TIME_ZONE, RequestFlowBucket.DAY])
+        return cursor.rowcount
+
+
+def backfill_request_flow(start, end, now=None):
+    """
+    Пересчёт интервалов с start по end (начала суток) по таблицам заявок и результатов закрытия.
+    События до границы свёртки попадают сразу в суточные интервалы, более поздние - в часовые.
+
+    На время пересчёта таблица интервалов блокируется от изменений (чтение не блокируется).
+    Возвращает число записанных интервалов.
+    """
+    table, insert_sql = flow_insert_sql()
+    cutoff = hourly_cutoff(now)
+    written = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+        cursor.execute(f'DELETE FROM {table} WHERE bucket_start >= %s AND bucket_start < %s', [start, end])
+        for event, _ in RequestFlowBucket.EVENTS:
+            source_sql, timestamp = flow_source_sql(event)
+            cursor.execute(f'{insert_sql}SELECT %s, v.dimension, '
+                           f"date_trunc(CASE WHEN {timestamp} >= %s THEN 'hour' ELSE 'day' END, {timestamp}, %s), "
+                           f'CASE WHEN {timestamp} >= %s THEN %s ELSE %s END, v.key, COUNT(*) {source_sql} '
+                           f'WHERE {timestamp} >= %s AND {timestamp} < %s GROUP BY v.dimension, 3, 4, v.key',
+                           [event, cutoff, settings.TIME_ZONE, cutoff, RequestFlowBucket.HOUR, RequestFlowBucket.DAY,
+                            start, end])
+            written += cursor.rowcount
+    return written
+
+
+def request_flow_series(event, dimension, granularity, start, end, key=None):
+    """
+    Число событий по интервалам с start по end. Суточный ряд складывается из суточных и ещё не свёрнутых
+    часовых интервалов, часовой есть только за последние REQUEST_FLOW_HOURLY_DAYS суток.
+    """
+    queryset = RequestFlowBucket.objects.filter(event=event, dimension=dimension,
+                                                bucket_start__gte=start, bucket_start__lt=end)
+    if key:
+        queryset = queryset.filter(key=key)
+    if granularity == RequestFlowBucket.HOUR:
+        queryset = queryset.filter(granularity=RequestFlowBucket.HOUR).annotate(bucket=F('bucket_start'))
+    else:
+        queryset = queryset.annotate(bucket=Trunc('bucket_start', 'day'))
+    return queryset.values('bucket', 'key').annotate(requests=Sum('count')).exclude(requests=0) \
+        .order_by('bucket', 'key')
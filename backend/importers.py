@@ -0,0 +1,427 @@
+import csv
+import json
+from collections import Counter
+from datetime import datetime
+from xml.etree.ElementTree import iterparse
+
+from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from backend.allocators import allocate_request_ids, allocate_request_numbers
+from backend.flows import adjust_request_flow
+from backend.incidents import find_incident_parents, mark_incident_parents
+from backend.models import Request, ODS, Address, Defect, ImplementingOrganization, User, WorkPerformedType, \
+    SecurityEvents, MarmExecutor, MarmImplementingOrganization, RequestStatus, RequestSource, PaymentCategory, \
+    RequestFlowBucket
+from backend.rollups import adjust_open_request_rollups
+from backend.serializers import SignField
+
+IMPORT_FORMATS = ('csv', 'jsonl', 'xml')
+
+# Поля записи, которые переносятся в заявку без преобразования (кроме приведения типа)
+PLAIN_FIELDS = ('unique_public_services_appeal_number', 'creator_name', 'parent_application_root_id',
+                'parent_application_number', 'comments', 'description', 'question', 'entrance', 'floor', 'apartment',
+                'desired_time_from', 'desired_time_before', 'incident_sign', 'card_payment_sign')
+
+# Колонки записи, которые принимаются от клиента API (RequestsViewSet.bulk). Автор, дата создания, статус
+# и привязка к инциденту задаются сервером так же, как при создании одной заявки
+API_COLUMNS = tuple(name for name in PLAIN_FIELDS
+                    if name not in {'parent_application_root_id', 'parent_application_number', 'incident_sign'}) \
+    + ('unom', 'defect_identifier', 'implementing_organization_identifier', 'source_name', 'payment_category_name')
+
+# Ссылки на справочники: поле заявки, модель, поле ключа и колонка записи с ключом
+FOREIGN_KEYS = (
+    ('address', Address, 'unom', 'unom'),
+    ('defect', Defect, 'identifier', 'defect_identifier'),
+    ('implementing_organization', ImplementingOrganization, 'identifier', 'implementing_organization_identifier'),
+    ('user', User, 'username', 'username'),
+)
+
+# Справочники "наименование - код": поле заявки, модель и колонки записи
+LOOKUPS = (
+    ('source', RequestSource, 'source_name', 'source_code'),
+    ('status', RequestStatus, 'status_name', 'status_code'),
+    ('payment_category', PaymentCategory, 'payment_category_name', 'payment_category_code'),
+)
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        yield from csv.DictReader(file)
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_xml(path, tag='request'):
+    """
+    Записи XML-выгрузки: элементы tag с дочерними элементами-полями.
+
+    Разобранные элементы удаляются из дерева, поэтому память не растёт с размером файла.
+    """
+    root = None
+    for event, element in iterparse(path, events=('start', 'end')):
+        if root is None:
+            root = element
+        if event == 'end' and element.tag == tag:
+            yield {child.tag: child.text for child in element}
+            root.clear()
+
+
+def read_records(path, import_format, xml_tag='request'):
+    """
+    Потоковое чтение записей файла в виде словарей "колонка - значение"
+    """
+    if import_format == 'csv':
+        return read_csv(path)
+    if import_format == 'jsonl':
+        return read_jsonl(path)
+    return read_xml(path, xml_tag)
+
+
+def clean_value(field, value):
+    """
+    Приведение значения записи к типу поля модели с проверкой длины и обязательности.
+
+    Признаки принимаются в виде "Да"/"Нет", даты без часового пояса считаются заданными в текущем поясе.
+    """
+    if value is None or value == '':
+        value = None if field.null else field.get_default()
+    elif isinstance(field, models.BooleanField):
+        if value not in SignField.TRUE_VALUES | SignField.FALSE_VALUES:
+            raise ValidationError(f'{field.name}: недопустимое значение признака {value}')
+        value = value in SignField.TRUE_VALUES
+    try:
+        value = field.clean(value, None)
+    except ValidationError as error:
+        raise ValidationError([f'{field.name}: {message}' for message in error.messages])
+    if isinstance(value, datetime) and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+class ForeignKeyCache:
+    """
+    Кэш первичных ключей справочника по полю key_field.
+
+    Недостающие ключи загружаются одним запросом на пачку записей, отсутствующие в БД запоминаются,
+    чтобы не запрашивать их повторно.
+    """
+
+    def __init__(self, model, key_field):
+        self.model = model
+        self.key_field = key_field
+        self.field = model._meta.get_field(key_field)
+        self.pks = {}
+
+    def key(self, value):
+        return self.field.to_python(value)
+
+    def load(self, values):
+        keys = set()
+        for value in values:
+            try:
+                keys.add(self.key(value))
+            except ValidationError:
+                continue
+        keys -= self.pks.keys()
+        if not keys:
+            return
+        self.pks.update(dict.fromkeys(keys))
+        self.pks.update(self.model.objects.filter(**{f'{self.key_field}__in': keys}).values_list(self.key_field, 'pk'))
+
+    def get(self, value):
+        pk = self.pks.get(self.key(value))
+        if pk is None:
+            raise ValidationError(f'{self.model._meta.verbose_name} с {self.key_field}={value} не найден')
+        return pk
+
+
+class RequestImporter:
+    """
+    Загрузка заявок из внешней выгрузки пачками через bulk_create.
+
+    Корневые идентификаторы и номера выдаются так же, как при создании заявки через API. Записи, которые
+    не удалось разобрать или связать со справочниками, пропускаются и возвращаются вместе с причиной.
+    """
+
+    def __init__(self, create_lookups=True):
+        self.foreign_keys = {name: ForeignKeyCache(model, key_field) for name, model, key_field, _ in FOREIGN_KEYS}
+        self.lookups = {}
+        # Создавать ли недостающие записи справочников "наименование - код" (для данных из API - нет)
+        self.create_lookups = create_lookups
+
+    def lookup(self, model, name, code):
+        if (model, name) not in self.lookups:
+            if self.create_lookups:
+                self.lookups[model, name] = model.resolve(name, code).pk
+            else:
+                pk = model.objects.filter(name=name).values_list('pk', flat=True).first()
+                if pk is None:
+                    raise ValidationError(f'{model._meta.verbose_name} "{name}" не найден')
+                self.lookups[model, name] = pk
+        return self.lookups[model, name]
+
+    def build(self, record):
+        values = {name: clean_value(Request._meta.get_field(name), record.get(name)) for name in PLAIN_FIELDS}
+        for name, _, _, column in FOREIGN_KEYS:
+            value = record.get(column)
+            if value in (None, '') and Request._meta.get_field(name).null:
+                continue
+            values[f'{name}_id'] = self.foreign_keys[name].get(value)
+        for name, model, name_column, code_column in LOOKUPS:
+            if record.get(name_column):
+                values[f'{name}_id'] = self.lookup(model, record[name_column], record.get(code_column) or '')
+            elif name == 'status':
+                values['status_id'] = RequestStatus.NEW
+            else:
+                raise ValidationError(f'Не заполнено поле {name_column}')
+        return Request(**values), clean_value(Request._meta.get_field('created_at'), record.get('created_at'))
+
+    def import_batch(self, records, first_row=1, match_incidents=False):
+        """
+        Загрузка пачки записей в одной транзакции.
+
+        Возвращает созданные заявки с номерами их строк и список пропущенных записей (номер строки, причина).
+        При match_incidents материнские заявки подбираются сразу для всей пачки, как при создании заявки через API.
+        """
+        for name, _, _, column in FOREIGN_KEYS:
+            self.foreign_keys[name].load(record.get(column) for record in records)
+        # Уже загруженные обращения пропускаются, поэтому повторная загрузка файла не создаёт дублей
+        appeal_numbers = set(Request.objects
+                             .filter(unique_public_services_appeal_number__in=[
+                                 record.get('unique_public_services_appeal_number') or '' for record in records])
+                             .values_list('unique_public_services_appeal_number', flat=True))
+
+        created, created_at, errors = [], [], []
+        with transaction.atomic():
+            for row, record in enumerate(records, first_row):
+                try:
+                    request, record_created_at = self.build(record)
+                    if request.unique_public_services_appeal_number in appeal_numbers:
+                        raise ValidationError(f'Обращение {request.unique_public_services_appeal_number} '
+                                              f'уже существует')
+                except ValidationError as error:
+                    errors.append((row, '; '.join(error.messages)))
+                    continue
+                appeal_numbers.add(request.unique_public_services_appeal_number)
+                created.append((row, request))
+                created_at.append(record_created_at)
+            if not created:
+                return created, errors
+
+            requests = [request for _, request in created]
+            numbers = allocate_request_numbers(len(requests))
+            for request, root_id, number in zip(requests, allocate_request_ids(len(requests)), numbers):
+                request.root_id, request.number = root_id, number
+            if match_incidents:
+                self.match_incidents(requests)
+            Request.objects.bulk_create(requests)
+            self.restore_created_at(requests, created_at)
+            adjust_open_request_rollups((request.pk for request in requests), 1)
+            adjust_request_flow(RequestFlowBucket.CREATED, (request.pk for request in requests), 1)
+        return created, errors
+
+    @staticmethod
+    def match_incidents(requests):
+        """
+        Привязка новых заявок к материнским: один запрос на поиск материнских заявок и один UPDATE для их отметки
+        """
+        defects = {pk: (name, repeated_location) for pk, name, repeated_location in
+                   Defect.objects.filter(pk__in={request.defect_id for request in requests})
+                   .values_list('pk', 'name', 'repeated_location')}
+        parents = find_incident_parents(defects.values())
+        for request in requests:
+            parent = parents.get(defects[request.defect_id])
+            if parent is not None:
+                request.incident_sign = False
+                request.parent_application_root_id = parent['root_id']
+                request.parent_application_number = parent['number']
+        mark_incident_parents({parent['root_id'] for parent in parents.values()})
+
+    @staticmethod
+    def restore_created_at(requests, created_at):
+        """
+        Дата создания из выгрузки: при вставке она заменяется текущей (auto_now_add), поэтому задаётся отдельным
+        запросом
+        """
+        rows = [(request.root_id, value) for request, value in zip(requests, created_at) if value is not None]
+        if not rows:
+            return
+        table = connection.ops.quote_name(Request._meta.db_table)
+        root_ids, dates = zip(*rows)
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {table} SET created_at = v.created_at, updated_at = v.created_at '
+                           f'FROM unnest(%s::integer[], %s::timestamptz[]) AS v (root_id, created_at) '
+                           f'WHERE {table}.root_id = v.root_id', [list(root_ids), list(dates)])
+
+
+class ReferenceLoader:
+    """
+    Обновление справочника по снимку реестра.
+
+    Записи сравниваются с БД по естественному ключу key, записываются только новые и изменившиеся строки
+    (INSERT ... ON CONFLICT DO UPDATE). Ссылки на другие справочники задаются их естественными ключами,
+    связи многие-ко-многим добавляются и удаляются пачками в промежуточной таблице. Строки, которых нет
+    в снимке, не удаляются, а только подсчитываются.
+    """
+
+    def __init__(self, name, model, key, foreign_keys=(), lookups=(), many_to_many=None):
+        self.name = name
+        self.model = model
+        self.key = key
+        self.fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+        # Ссылки: поле модели -> кэш связанной модели по ключу и колонка записи
+        self.foreign_keys = {
+            name: (ForeignKeyCache(model._meta.get_field(name).related_model, related_key), column)
+            for name, related_key, column in foreign_keys
+        }
+        # Справочники "наименование - код": поле модели -> колонки наименования и кода
+        self.lookups = {name: (name_column, code_column) for name, name_column, code_column in lookups}
+        self.lookup_pks = {}
+        self.many_to_many = None
+        if many_to_many is not None:
+            field_name, related_key, column = many_to_many
+            field = model._meta.get_field(field_name)
+            self.many_to_many = (field, ForeignKeyCache(field.related_model, related_key), column)
+        self.stats = Counter()
+        self.keys = set()
+
+    def link_values(self, record):
+        if self.many_to_many is None:
+            return []
+        value = record.get(self.many_to_many[2])
+        if isinstance(value, str):
+            value = value.split(',')
+        return [item.strip() if isinstance(item, str) else item for item in value or () if item != '']
+
+    def lookup(self, name, record):
+        name_column, code_column = self.lookups[name]
+        if not record.get(name_column):
+            raise ValidationError(f'Не заполнено поле {name_column}')
+        key = (name, record[name_column])
+        if key not in self.lookup_pks:
+            related_model = self.model._meta.get_field(name).related_model
+            self.lookup_pks[key] = related_model.resolve(record[name_column], record.get(code_column) or '').pk
+        return self.lookup_pks[key]
+
+    def build(self, record):
+        """
+        Значения полей строки и множество связанных объектов (None, если связи в записи не заданы)
+        """
+        values = {}
+        for field in self.fields:
+            if field.name in self.foreign_keys:
+                cache, column = self.foreign_keys[field.name]
+                values[field.attname] = cache.get(record.get(column))
+            elif field.name in self.lookups:
+                values[field.attname] = self.lookup(field.name, record)
+            else:
+                values[field.attname] = clean_value(field, record.get(field.name))
+        links = None
+        if self.many_to_many is not None and record.get(self.many_to_many[2]) is not None:
+            links = {self.many_to_many[1].get(value) for value in self.link_values(record)}
+        return values, links
+
+    def load_batch(self, records, first_row=1):
+        """
+        Загрузка пачки записей снимка. Возвращает список пропущенных записей (номер строки, причина)
+        """
+        for cache, column in self.foreign_keys.values():
+            cache.load(record.get(column) for record in records)
+        if self.many_to_many is not None:
+            self.many_to_many[1].load(value for record in records for value in self.link_values(record))
+
+        rows, links, errors = {}, {}, []
+        key_attname = self.model._meta.get_field(self.key).attname
+        for row, record in enumerate(records, first_row):
+            try:
+                values, record_links = self.build(record)
+            except ValidationError as error:
+                errors.append((row, '; '.join(error.messages)))
+                continue
+            rows[values[key_attname]] = values
+            if record_links is not None:
+                links[values[key_attname]] = record_links
+        self.stats['skipped'] += len(errors)
+        self.keys.update(rows)
+
+        attnames = [field.attname for field in self.fields]
+        existing = {values[key_attname]: values
+                    for values in self.model.objects.filter(**{f'{self.key}__in': rows}).values(*attnames)}
+        changed = []
+        for key, values in rows.items():
+            current = existing.get(key)
+            if current == values:
+                self.stats['unchanged'] += 1
+                continue
+            self.stats['created' if current is None else 'updated'] += 1
+            changed.append(self.model(**values))
+        # Имена колонок, а не полей: Django 4.1 подставляет их в ON CONFLICT DO UPDATE без преобразования
+        update_fields = [field.attname for field in self.fields if field.name != self.key]
+        if changed and update_fields:
+            self.model.objects.bulk_create(changed, update_conflicts=True, unique_fields=[self.key],
+                                           update_fields=update_fields)
+        elif changed:
+            # Справочник только из ключа: изменённых строк не бывает, добавляются новые
+            self.model.objects.bulk_create(changed, ignore_conflicts=True)
+        if links:
+            self.update_links(links)
+        return errors
+
+    def update_links(self, links):
+        """
+        Приведение связей многие-ко-многим объектов пачки к снимку: недостающие строки промежуточной таблицы
+        добавляются одним INSERT, лишние удаляются одним DELETE
+        """
+        field = self.many_to_many[0]
+        through = field.remote_field.through
+        source, target = f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id'
+        pks = dict(self.model.objects.filter(**{f'{self.key}__in': links}).values_list(self.key, 'pk'))
+        current = {(source_pk, target_pk): pk for pk, source_pk, target_pk in
+                   through.objects.filter(**{f'{source}__in': pks.values()}).values_list('pk', source, target)}
+        desired = {(pks[key], target_pk) for key, targets in links.items() for target_pk in targets}
+        added = desired - current.keys()
+        removed = [pk for pair, pk in current.items() if pair not in desired]
+        if added:
+            through.objects.bulk_create(through(**{source: source_pk, target: target_pk})
+                                        for source_pk, target_pk in added)
+        if removed:
+            through.objects.filter(pk__in=removed).delete()
+        self.stats['links_added'] += len(added)
+        self.stats['links_removed'] += len(removed)
+
+    def count_missing(self):
+        """
+        Число строк справочника, которых нет в загруженном снимке
+        """
+        self.stats['missing'] = len(set(self.model.objects.values_list(self.key, flat=True)) - self.keys)
+        return self.stats['missing']
+
+    @property
+    def changed(self):
+        return any(self.stats[name] for name in ('created', 'updated', 'links_added', 'links_removed'))
+
+
+def reference_loaders():
+    """
+    Загрузчики справочников в порядке зависимостей: справочник загружается после тех, на которые он ссылается
+    """
+    return [
+        ReferenceLoader('ods', ODS, 'number'),
+        ReferenceLoader('addresses', Address, 'unom', foreign_keys=[('ods', 'number', 'ods_number')]),
+        ReferenceLoader('defects', Defect, 'identifier',
+                        lookups=[('urgency_category', 'urgency_category_name', 'urgency_category_code')]),
+        ReferenceLoader('work-performed-types', WorkPerformedType, 'root_version_id',
+                        many_to_many=('defects', 'identifier', 'defect_identifiers')),
+        ReferenceLoader('security-events', SecurityEvents, 'root_version_id',
+                        foreign_keys=[('work_performed_type', 'root_version_id',
+                                       'work_performed_type_root_version_id')]),
+        ReferenceLoader('marm-executors', MarmExecutor, 'failure_reason_id'),
+        ReferenceLoader('marm-implementing-organizations', MarmImplementingOrganization, 'failure_reason_id'),
+    ]
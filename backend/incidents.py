@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+from django.db.models import F, Value, DateTimeField, ExpressionWrapper, Exists, OuterRef
+from django.utils import timezone
+
+from backend.models import Request
+
+# Окно добавления заявки в инцидент: материнская заявка создана от 7 до 1 суток назад
+INCIDENT_WINDOW_START = timedelta(days=7)
+INCIDENT_WINDOW_END = timedelta(days=1)
+
+
+def incident_window(created_at=None):
+    """
+    Заявки, которые могут быть материнскими для заявки, созданной в created_at, без учёта дефекта
+    """
+    if created_at is None:
+        created_at = timezone.now()
+    window_start = ExpressionWrapper(Value(created_at) - F('defect__another_term') * Value(timedelta(days=1)),
+                                     output_field=DateTimeField())
+    return Request.objects.filter(defect__another_term__isnull=False,
+                                  parent_application_root_id__isnull=True,
+                                  created_at__lte=created_at,
+                                  created_at__gte=window_start)
+
+
+def incident_parent_candidates(defect_name, repeated_location, created_at=None):
+    """
+    Заявки, подходящие в материнские для новой заявки с дефектом defect_name / repeated_location.
+
+    Подходит заявка с тем же дефектом, созданная не раньше чем за "повторный срок"
+    (Defect.another_term, в днях) до created_at и сама не являющаяся дочерней.
+    Окно сравнивается в SQL одним запросом по индексам request_defect_created_idx и defect_name_location_idx,
+    поэтому время не зависит от числа прошлых заявок с этим дефектом.
+    """
+    return incident_window(created_at) \
+        .filter(defect__name=defect_name, defect__repeated_location=repeated_location) \
+        .order_by('-created_at')
+
+
+def find_incident_parent(defect_name, repeated_location, created_at=None):
+    """
+    Последняя подходящая материнская заявка: словарь с root_id и number либо None
+    """
+    return incident_parent_candidates(defect_name, repeated_location, created_at).values('root_id', 'number').first()
+
+
+def find_incident_parents(defect_keys, created_at=None):
+    """
+    Последние подходящие материнские заявки сразу для нескольких дефектов одним запросом (DISTINCT ON).
+    defect_keys - пары (наименование дефекта, повторная локация); возвращает словарь
+    пара -> словарь с root_id и number для пар, у которых материнская заявка нашлась
+    """
+    defect_keys = set(defect_keys)
+    if not defect_keys:
+        return {}
+    rows = incident_window(created_at) \
+        .filter(defect__name__in={name for name, _ in defect_keys}) \
+        .order_by('defect__name', 'defect__repeated_location', '-created_at') \
+        .distinct('defect__name', 'defect__repeated_location') \
+        .values_list('defect__name', 'defect__repeated_location', 'root_id', 'number')
+    return {(name, repeated_location): {'root_id': root_id, 'number': number}
+            for name, repeated_location, root_id, number in rows if (name, repeated_location) in defect_keys}
+
+
+def mark_incident_parents(root_ids):
+    """
+    Отметка материнских заявок признаком инцидента одним UPDATE.
+    updated_at проставляется явно: update() не обновляет поля auto_now, а по ним считаются валидаторы списков.
+    """
+    return Request.objects \
+        .filter(root_id__in=root_ids) \
+        .exclude(incident_sign=True) \
+        .update(incident_sign=True, updated_at=timezone.now())
+
+
+def incident_parent_exists():
+    """
+    Условие для выборки заявок: у заявки есть материнская заявка с той же категорией дефекта и адресом,
+    созданная в окне INCIDENT_WINDOW_START - INCIDENT_WINDOW_END до неё.
+    Проверяется коррелированным подзапросом EXISTS, т.е. одним SQL-запросом на всю выборку.
+    """
+    return Exists(Request.objects.filter(root_id=OuterRef('parent_application_root_id'),
+                                         defect__category_name=OuterRef('defect__category_name'),
+                                         address__problem_address=OuterRef('address__problem_address'),
+                                         created_at__gt=OuterRef('created_at') - INCIDENT_WINDOW_START,
+                                         created_at__lt=OuterRef('created_at') - INCIDENT_WINDOW_END))
+
+
+def assign_incident_clusters(rows, window=INCIDENT_WINDOW_START):
+    """
+    Разбиение заявок на инциденты за один проход.
+
+    rows - кортежи (ключ группы, дата создания, данные заявки), отсортированные по ключу и дате создания.
+    Первая заявка группы открывает инцидент и становится материнской, следующие заявки той же группы,
+    созданные в пределах window от материнской, становятся дочерними; более поздняя заявка открывает
+    новый инцидент. В памяти хранится только текущая материнская заявка.
+    Возвращает пары (данные заявки, (корневой ИД материнской заявки, её номер, признак инцидента)).
+    """
+    head = None
+    head_has_children = False
+    for key, created_at, item in rows:
+        if head is not None and key == head[0] and created_at - head[1] < window:
+            head_has_children = True
+            yield item, (head[2].root_id, head[2].number, False)
+            continue
+        if head is not None:
+            yield head[2], (None, '', head_has_children)
+        head, head_has_children = (key, created_at, item), False
+    if head is not None:
+        yield head[2], (None, '', head_has_children)
@@ -0,0 +1,52 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from backend.flows import backfill_request_flow
+from backend.models import Request
+
+
+def parse_day(value):
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise CommandError(f'Ожидается дата в формате ГГГГ-ММ-ДД: {value}')
+    return day
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт интервалов потока заявок за период по таблицам заявок и результатов закрытия. ' \
+           'Период обрабатывается частями по --chunk-days суток, каждая часть - в отдельной транзакции'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', help='Первые сутки периода, по умолчанию - дата первой заявки')
+        parser.add_argument('--date-to', help='Последние сутки периода, по умолчанию - сегодня')
+        parser.add_argument('--chunk-days', type=int, default=31)
+
+    def handle(self, *args, **options):
+        if options['date_from']:
+            day = parse_day(options['date_from'])
+        else:
+            first = Request.objects.aggregate(first=Min('created_at'))['first']
+            if first is None:
+                self.stdout.write('Заявок нет')
+                return
+            day = timezone.localdate(first)
+        last = parse_day(options['date_to']) if options['date_to'] else timezone.localdate()
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days должно быть положительным')
+
+        written = 0
+        while day <= last:
+            chunk_last = min(day + timedelta(days=options['chunk_days'] - 1), last)
+            written += backfill_request_flow(timezone.make_aware(datetime.combine(day, time.min)),
+                                             timezone.make_aware(datetime.combine(chunk_last + timedelta(days=1),
+                                                                                  time.min)))
+            self.stdout.write(f'{day} - {chunk_last}: записано интервалов {written}')
+            day = chunk_last + timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f'Записано интервалов: {written}'))
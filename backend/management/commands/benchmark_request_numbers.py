@@ -0,0 +1,71 @@
+import time
+from datetime import datetime
+
+import pytz
+from django.contrib.postgres.aggregates import StringAgg
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import CharField
+from django.db.models.functions import Cast
+
+from backend.allocators import allocate_request_ids, allocate_request_number
+from backend.models import Request, Address, Defect, User, RequestStatus, RequestSource, PaymentCategory
+
+
+def legacy_request_number():
+    """
+    Прежняя генерация номера: выборка всех номеров заявок и поиск максимального в Python
+    """
+    values = Request.objects.aggregate(string_agg=StringAgg(Cast('number', CharField()), delimiter=', '))
+    numbers = values['string_agg'].split(", ")
+    max_number = max(list(map(lambda x: int(x.split("/")[0]), numbers)))
+    current_datetime = datetime.now(pytz.timezone('Europe/Moscow')).year
+    return str(max_number) + str(current_datetime)[-2:]
+
+
+class Command(BaseCommand):
+    help = 'Время генерации номера заявки в зависимости от размера таблицы: прежний способ и счётчик по годам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--samples', type=int, default=20)
+
+    def handle(self, *args, **options):
+        address, defect, user = Address.objects.first(), Defect.objects.first(), User.objects.first()
+        if address is None or defect is None or user is None:
+            raise CommandError('Для заполнения таблицы нужны хотя бы один адрес, дефект и пользователь')
+
+        # Все изменения откатываются, но значения последовательности идентификаторов расходуются
+        with transaction.atomic():
+            inserted = 0
+            for rows in sorted(options['rows']):
+                missing = rows - Request.objects.count()
+                if missing > 0:
+                    self.fill(missing, inserted, address, defect, user)
+                    inserted += missing
+                legacy = self.measure(legacy_request_number, options['samples'])
+                counter = self.measure(allocate_request_number, options['samples'])
+                self.stdout.write(f'{Request.objects.count():>8} заявок: прежний способ {legacy * 1000:8.2f} мс, '
+                                  f'счётчик {counter * 1000:6.2f} мс на номер')
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def fill(count, offset, address, defect, user):
+        source = RequestSource.resolve('Портал', 'portal')
+        payment_category = PaymentCategory.resolve('Бесплатная', 'free')
+        root_ids = allocate_request_ids(count)
+        Request.objects.bulk_create(
+            (Request(root_id=root_id, number=f'{offset + i + 1}/00',
+                     unique_public_services_appeal_number=f'benchmark-{offset + i + 1}', source=source,
+                     creator_name='Оператор', description='Протечка', address=address, status_id=RequestStatus.NEW,
+                     payment_category=payment_category, defect=defect, user=user)
+             for i, root_id in enumerate(root_ids)),
+            batch_size=5000,
+        )
+
+    @staticmethod
+    def measure(function, samples):
+        started = time.perf_counter()
+        for _ in range(samples):
+            function()
+        return (time.perf_counter() - started) / samples
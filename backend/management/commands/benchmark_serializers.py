@@ -0,0 +1,105 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from backend.models import Request, Address, ODS, ImplementingOrganization, Defect, User, Organization, \
+    WorkPerformedType, SecurityEvents, ClosingResult, Review, UrgencyCategory, RequestStatus, \
+    RequestSource, PaymentCategory, Efficiency
+from backend.serializers import RequestSerializer, CompiledRequestSerializer
+
+
+def set_prefetched(instance, name, objects):
+    """
+    Заполнение кеша prefetch_related так же, как это делает Django после выборки
+    """
+    queryset = getattr(instance, name).get_queryset()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    if not hasattr(instance, '_prefetched_objects_cache'):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[name] = queryset
+
+
+def build_requests(count):
+    """
+    Граф заявок в памяти (без обращений к БД), повторяющий результат REQUESTS_QUERYSET
+    """
+    now = timezone.now()
+    ods = ODS(id=1, number='ОДС-1')
+    organization = Organization(id=1, name='Организация', identifier=1, inn=1, business_role='Диспетчер')
+    implementing_organization = ImplementingOrganization(id=1, name='Исполнитель', identifier=1, inn=2,
+                                                         business_role='Исполнитель')
+    user = User(id=1, username='dispatcher', first_name='Иван', last_name='Иванов', middle_name='Иванович',
+                organization=organization, implementing_organization=None)
+    defect = Defect(id=1, category_name='Протечки', category_root_id=1, category_code='leak', name='Протечка',
+                    short_name='Протечка', identifier=1, code='leak-1',
+                    urgency_category=UrgencyCategory(id=1, name='Обычная', code='usual'),
+                    sign_return_for_revision=False, another_term=3, repeated_location='Подъезд')
+    work_types = [WorkPerformedType(id=i, work_performed_type=f'Вид работ {i}', root_version_id=i) for i in (1, 2)]
+    for work_type in work_types:
+        set_prefetched(work_type, 'defects', [defect])
+        set_prefetched(work_type, 'security_events', [
+            SecurityEvents(id=work_type.id, name=f'Мероприятие {work_type.id}', root_version_id=work_type.id,
+                           term=now, work_performed_type=work_type)
+        ])
+    set_prefetched(defect, 'work_performed_types', work_types)
+
+    addresses = [Address(id=i, country_name='ЦАО', country_code=1, district_name='Тверской', district_code=1,
+                         problem_address=f'ул. Тверская, д. {i}', unom=i, ods=ods, management_company='ГБУ')
+                 for i in range(1, 101)]
+
+    source = RequestSource(id=1, name='Портал', code='portal')
+    status = RequestStatus(id=RequestStatus.NEW, name='Новая', code='new')
+    payment_category = PaymentCategory(id=1, name='Бесплатная', code='free')
+    efficiency = Efficiency(id=1, name='Выполнено', code='done')
+
+    requests = []
+    for i in range(1, count + 1):
+        request = Request(id=i, root_id=i, version_id=None, number=f'{i}/22',
+                          unique_public_services_appeal_number=f'{i:010d}', created_at=now, updated_at=now,
+                          source=source, creator_name='Оператор',
+                          incident_sign=False, parent_application_root_id=None, parent_application_number='',
+                          comments=None, description='Протечка в подъезде', question='', address=addresses[i % 100],
+                          entrance=1, floor=2, apartment=i % 300,
+                          implementing_organization=implementing_organization if i % 2 else None,
+                          status=status, desired_time_from='', desired_time_before='',
+                          payment_category=payment_category, card_payment_sign=False, defect=defect, user=user)
+        if i % 2:
+            closing_result = ClosingResult(id=i, consumed_material='', security_events_sign=False,
+                                           efficiency=efficiency, being_under_revision_sign=False, sign_alerted=True,
+                                           closing_date=now, request=request)
+            Review(id=i, dt=now, review='Хорошо', assessment_quality_work=5, closing_result=closing_result)
+            closing_result._state.fields_cache['refinement'] = None
+        else:
+            request._state.fields_cache['closing_result'] = None
+        requests.append(request)
+    return requests
+
+
+class Command(BaseCommand):
+    help = 'Сравнение скорости DRF-сериализатора заявок и скомпилированного сериализатора'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def measure(self, serializer_class, requests, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = serializer_class(requests, many=True).data
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, JSONRenderer().render(data)
+
+    def handle(self, *args, **options):
+        for rows in options['rows']:
+            requests = build_requests(rows)
+            drf_time, drf_output = self.measure(RequestSerializer, requests, options['repeat'])
+            compiled_time, compiled_output = self.measure(CompiledRequestSerializer, requests, options['repeat'])
+            if drf_output != compiled_output:
+                raise CommandError(f'Результаты сериализаторов различаются на {rows} строках')
+            self.stdout.write(f'{rows} строк: DRF {drf_time:.3f} с, скомпилированный {compiled_time:.3f} с, '
+                              f'ускорение x{drf_time / compiled_time:.1f}')
@@ -0,0 +1,75 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from backend.incidents import INCIDENT_WINDOW_START, assign_incident_clusters
+from backend.models import Request, ACTIVE_STATUS_IDS
+from backend.streaming import iterate_queryset
+
+# Поле адреса, по которому группируются заявки
+GROUP_FIELDS = {
+    'address': 'address__problem_address',
+    'unom': 'address__unom',
+}
+# Размер пачки bulk_update: запрос содержит CASE WHEN на каждую строку пачки для каждого поля
+BULK_UPDATE_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт инцидентов для всех активных заявок: группировка по категории дефекта и адресу ' \
+           'со скользящим окном по дате создания'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group-by', choices=sorted(GROUP_FIELDS), default='address')
+        parser.add_argument('--window-days', type=int, default=INCIDENT_WINDOW_START.days)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true', help='Только подсчитать изменения, не сохраняя их')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        address_field = GROUP_FIELDS[options['group_by']]
+        # Только нужные колонки, отсортированные так, чтобы заявки одной группы шли подряд по дате создания.
+        # Чтение идёт вне транзакции, изменения каждой пачки фиксируются отдельно
+        queryset = Request.objects \
+            .filter(status__in=ACTIVE_STATUS_IDS) \
+            .order_by('defect__category_name', address_field, 'created_at', 'root_id') \
+            .values_list('pk', 'root_id', 'number', 'created_at', 'defect__category_name', address_field,
+                         'parent_application_root_id', 'parent_application_number', 'incident_sign', named=True)
+        rows = ((
+            (row.defect__category_name, getattr(row, address_field)), row.created_at, row
+        ) for row in iterate_queryset(queryset, chunk_size, hold=True))
+
+        started = time.perf_counter()
+        processed = updated = 0
+        changed = []
+        now = timezone.now()
+        for row, assignment in assign_incident_clusters(rows, timedelta(days=options['window_days'])):
+            processed += 1
+            if assignment == (row.parent_application_root_id, row.parent_application_number, row.incident_sign):
+                continue
+            parent_root_id, parent_number, incident_sign = assignment
+            changed.append(Request(pk=row.pk, parent_application_root_id=parent_root_id,
+                                   parent_application_number=parent_number, incident_sign=incident_sign,
+                                   updated_at=now))
+            if len(changed) >= chunk_size:
+                updated += self.save(changed, options['dry_run'])
+                changed = []
+        updated += self.save(changed, options['dry_run'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f'Обработано заявок: {processed}, изменено: {updated}, '
+                          f'{elapsed:.2f} с ({processed / elapsed if elapsed else 0:.0f} заявок/с)'
+                          + (' - пробный запуск, изменения не сохранены' if options['dry_run'] else ''))
+
+    @staticmethod
+    def save(changed, dry_run):
+        # updated_at задаётся явно: bulk_update не обновляет поля auto_now
+        if changed and not dry_run:
+            with transaction.atomic():
+                Request.objects.bulk_update(changed, ['parent_application_root_id', 'parent_application_number',
+                                                      'incident_sign', 'updated_at'],
+                                            batch_size=BULK_UPDATE_BATCH_SIZE)
+        return len(changed)
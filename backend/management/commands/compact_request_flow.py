@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from backend.flows import compact_request_flow
+
+
+class Command(BaseCommand):
+    help = f'Свёртка часовых интервалов потока заявок старше REQUEST_FLOW_HOURLY_DAYS ' \
+           f'({settings.REQUEST_FLOW_HOURLY_DAYS}) суток в суточные. Команду следует запускать периодически'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f'Изменено суточных интервалов: {compact_request_flow()}'))
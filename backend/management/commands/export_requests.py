@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from backend.exports import EXPORT_FORMATS, XLSX_MAX_ROWS, Workbook, export_rows, iterate_csv, iterate_gzip, write_xlsx
+from backend.filters import REQUEST_FILTERS, REQUEST_DATE_FILTERS, filter_requests
+from backend.models import Request
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка заявок в CSV (в том числе сжатый, *.csv.gz) или XLSX с отбором по тем же параметрам, ' \
+           'что и в списках заявок (район, ОДС, дефект, исполнитель, источник, статус, периоды и т.д.). ' \
+           'Строки читаются серверным курсором, поэтому память не растёт с размером выгрузки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--file-format', choices=EXPORT_FORMATS, help='По умолчанию - по расширению файла')
+        # Параметры отбора backend.filters: --district-code, --ods, --created-from и т.д.
+        for name, (_, _, description) in REQUEST_FILTERS.items():
+            parser.add_argument(f'--{name.replace("_", "-")}',
+                                help=f'{description[0].upper()}{description[1:]}, несколько значений - через запятую')
+        for prefix, field in REQUEST_DATE_FILTERS.items():
+            verbose_name = Request._meta.get_field(field).verbose_name
+            parser.add_argument(f'--{prefix}-from', help=f'{verbose_name}: начало периода, ГГГГ-ММ-ДД')
+            parser.add_argument(f'--{prefix}-to', help=f'{verbose_name}: конец периода включительно, ГГГГ-ММ-ДД')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or ('xlsx' if path.endswith('.xlsx') else 'csv')
+        if file_format == 'xlsx' and Workbook is None:
+            raise CommandError('Выгрузка в XLSX недоступна: не установлен openpyxl')
+        try:
+            queryset = filter_requests(Request.objects.all(), options)
+        except ValidationError as error:
+            raise CommandError('; '.join(f'{name}: {message}' for name, message in error.detail.items()))
+
+        if file_format == 'xlsx' and queryset.count() > XLSX_MAX_ROWS:
+            raise CommandError(f'В XLSX помещается не более {XLSX_MAX_ROWS} заявок, используйте CSV')
+
+        started, rows = time.perf_counter(), 0
+
+        def counted_rows():
+            nonlocal rows
+            for row in export_rows(queryset):
+                rows += 1
+                yield row
+
+        if file_format == 'xlsx':
+            write_xlsx(counted_rows(), path)
+        else:
+            chunks = iterate_csv(counted_rows())
+            with open(path, 'wb') as file:
+                if path.endswith('.gz'):
+                    for data in iterate_gzip(chunks):
+                        file.write(data)
+                else:
+                    for chunk in chunks:
+                        file.write(chunk.encode('utf-8'))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'Выгружено заявок: {rows} за {elapsed:.1f} с ({rows / max(elapsed, 1e-9):.0f} строк/с)')
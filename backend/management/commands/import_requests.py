@@ -0,0 +1,78 @@
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from backend.importers import IMPORT_FORMATS, RequestImporter, read_records
+
+
+def read_checkpoint(path, source):
+    """
+    Число уже обработанных записей файла source по файлу контрольной точки
+    """
+    if not path or not os.path.exists(path):
+        return {'rows': 0, 'imported': 0, 'skipped': 0}
+    with open(path, encoding='utf-8') as file:
+        checkpoint = json.load(file)
+    if checkpoint.get('source') != source:
+        raise CommandError(f'Контрольная точка {path} относится к файлу {checkpoint.get("source")}')
+    return checkpoint
+
+
+def write_checkpoint(path, checkpoint):
+    # Запись через временный файл: контрольная точка не повреждается при прерывании загрузки
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+        json.dump(checkpoint, file)
+    os.replace(f'{path}.tmp', path)
+
+
+class Command(BaseCommand):
+    help = 'Загрузка заявок из выгрузки городской системы (CSV, JSONL или XML) пачками в отдельных транзакциях. ' \
+           'Адрес, дефект, исполнитель и пользователь задаются колонками unom, defect_identifier, ' \
+           'implementing_organization_identifier и username. Признаки инцидента не пересчитываются: ' \
+           'после загрузки можно выполнить cluster_incidents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=IMPORT_FORMATS)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--checkpoint', help='Файл контрольной точки для продолжения прерванной загрузки')
+        parser.add_argument('--xml-tag', default='request', help='Элемент XML с одной заявкой')
+
+    def handle(self, *args, **options):
+        source = os.path.abspath(options['path'])
+        import_format = options['format'] or os.path.splitext(source)[1].lstrip('.').lower()
+        if import_format not in IMPORT_FORMATS:
+            raise CommandError(f'Формат файла не определён, укажите --format ({", ".join(IMPORT_FORMATS)})')
+
+        checkpoint = read_checkpoint(options['checkpoint'], source)
+        if checkpoint['rows']:
+            self.stdout.write(f'Продолжение загрузки с записи {checkpoint["rows"] + 1}')
+        records = islice(read_records(source, import_format, options['xml_tag']), checkpoint['rows'], None)
+        importer = RequestImporter()
+        started, processed = time.perf_counter(), 0
+
+        while batch := list(islice(records, options['batch_size'])):
+            try:
+                created, errors = importer.import_batch(batch, first_row=checkpoint['rows'] + 1)
+            except DatabaseError as error:
+                # Пачка откатывается целиком, контрольная точка остаётся на последней загруженной пачке
+                raise CommandError(f'Записи {checkpoint["rows"] + 1}-{checkpoint["rows"] + len(batch)} '
+                                   f'не загружены: {error}')
+            for row, message in errors:
+                self.stderr.write(f'Запись {row} пропущена: {message}')
+            processed += len(batch)
+            checkpoint.update(source=source, rows=checkpoint['rows'] + len(batch),
+                              imported=checkpoint['imported'] + len(created),
+                              skipped=checkpoint['skipped'] + len(errors))
+            if options['checkpoint']:
+                write_checkpoint(options['checkpoint'], checkpoint)
+            rate = processed / (time.perf_counter() - started)
+            self.stdout.write(f'Обработано {checkpoint["rows"]}: загружено {checkpoint["imported"]}, '
+                              f'пропущено {checkpoint["skipped"]}, {rate:.0f} записей/с')
+
+        self.stdout.write(self.style.SUCCESS(f'Загружено заявок: {checkpoint["imported"]}, '
+                                             f'пропущено записей: {checkpoint["skipped"]}'))
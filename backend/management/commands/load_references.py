@@ -0,0 +1,70 @@
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from backend.importers import IMPORT_FORMATS, read_records, reference_loaders
+from backend.references import bump_reference_versions, get_dependent_references
+
+
+def find_snapshot(directory, name):
+    """
+    Файл снимка справочника name в каталоге: name.csv, name.jsonl или name.xml
+    """
+    for import_format in IMPORT_FORMATS:
+        path = os.path.join(directory, f'{name}.{import_format}')
+        if os.path.exists(path):
+            return path, import_format
+    return None, None
+
+
+class Command(BaseCommand):
+    help = 'Обновление справочников по снимкам реестров из каталога (ods, addresses, defects, work-performed-types, ' \
+           'security-events, marm-executors, marm-implementing-organizations): изменяются только новые ' \
+           'и изменившиеся строки. Ссылки задаются колонками ods_number, urgency_category_name, ' \
+           'defect_identifiers и work_performed_type_root_version_id'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--xml-tag', default='record', help='Элемент XML с одной записью справочника')
+        parser.add_argument('--dry-run', action='store_true', help='Показать изменения без сохранения')
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(options['directory']):
+            raise CommandError(f'Каталог {options["directory"]} не найден')
+
+        # Снимок применяется целиком в одной транзакции: справочники не остаются частично обновлёнными
+        with transaction.atomic():
+            changed = []
+            for loader in reference_loaders():
+                path, import_format = find_snapshot(options['directory'], loader.name)
+                if path is None:
+                    continue
+                started, row = time.perf_counter(), 1
+                records = read_records(path, import_format, options['xml_tag'])
+                while batch := list(islice(records, options['batch_size'])):
+                    for error_row, message in loader.load_batch(batch, first_row=row):
+                        self.stderr.write(f'{loader.name}, запись {error_row} пропущена: {message}')
+                    row += len(batch)
+                loader.count_missing()
+                if loader.changed:
+                    changed.append(loader.model)
+                self.write_stats(loader, (row - 1) / (time.perf_counter() - started))
+
+            # bulk_create и удаление через QuerySet не отправляют сигналы, версии справочников обновляются явно
+            bump_reference_versions(name for model in changed for name in get_dependent_references(model))
+            if options['dry_run']:
+                transaction.set_rollback(True)
+                self.stdout.write('Изменения не сохранены (--dry-run)')
+
+    def write_stats(self, loader, rate):
+        stats = loader.stats
+        line = f'{loader.name}: новых {stats["created"]}, изменено {stats["updated"]}, ' \
+               f'без изменений {stats["unchanged"]}, пропущено {stats["skipped"]}, ' \
+               f'нет в снимке {stats["missing"]}'
+        if loader.many_to_many is not None:
+            line += f', связей добавлено {stats["links_added"]}, удалено {stats["links_removed"]}'
+        self.stdout.write(f'{line}, {rate:.0f} записей/с')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from backend.rollups import reconcile_open_request_rollups
+
+
+class Command(BaseCommand):
+    help = 'Сверка счётчиков активных заявок с таблицей заявок и исправление расхождений. ' \
+           'Счётчики не отслеживают изменения адресов и дефектов, поэтому команду следует запускать периодически'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_open_request_rollups()
+        if fixed:
+            self.stdout.write(self.style.WARNING(f'Исправлено счётчиков: {fixed}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
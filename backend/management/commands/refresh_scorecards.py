@@ -0,0 +1,15 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.scorecards import refresh_contractor_scorecards
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт показателей организаций-исполнителей (материализованное представление) без блокировки ' \
+           'чтения и записи. Команду следует запускать периодически'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        refresh_contractor_scorecards()
+        self.stdout.write(self.style.SUCCESS(f'Показатели пересчитаны за {time.perf_counter() - started:.1f} с'))
@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from backend.models import Request, RequestStatus, ACTIVE_STATUS_IDS
+from backend.seeding import seed_requests
+
+# Ссылки на справочники и колонки "наименование - код", которые они заменили
+LOOKUP_COLUMNS = {
+    'status': ('status_name', 'status_code'),
+    'source': ('source_name', 'source_code'),
+    'payment_category': ('payment_category_name', 'payment_category_code'),
+}
+LEGACY_TABLE = 'legacy_request_layout'
+
+
+def legacy_select_sql():
+    """
+    Выборка заявок в прежнем представлении: наименования и коды строками, признаки - "Да"/"Нет"
+    """
+    table = connection.ops.quote_name(Request._meta.db_table)
+    columns, joins = [], []
+    for field in Request._meta.concrete_fields:
+        if field.name in LOOKUP_COLUMNS:
+            alias = f'lookup_{field.name}'
+            name, code = LOOKUP_COLUMNS[field.name]
+            related_table = connection.ops.quote_name(field.related_model._meta.db_table)
+            joins.append(f'JOIN {related_table} {alias} ON {alias}.id = r.{field.column}')
+            columns += [f'{alias}.name::varchar({field.related_model._meta.get_field("name").max_length}) {name}',
+                        f'{alias}.code::varchar({field.related_model._meta.get_field("code").max_length}) {code}']
+        elif field.get_internal_type() == 'BooleanField':
+            columns.append(f"(CASE WHEN r.{field.column} THEN 'Да' ELSE 'Нет' END)::varchar(3) {field.column}")
+        else:
+            columns.append(f'r.{field.column}')
+    return f'SELECT {", ".join(columns)} FROM {table} r {" ".join(joins)}'
+
+
+def relation_stats(cursor, table, indexes):
+    cursor.execute(f'SELECT pg_relation_size(%s), (SELECT AVG(pg_column_size(t.*)) FROM {table} t)', [table])
+    heap_size, row_width = cursor.fetchone()
+    index_sizes = []
+    for index in indexes:
+        cursor.execute('SELECT pg_relation_size(%s)', [index])
+        index_sizes.append(cursor.fetchone()[0])
+    return heap_size, float(row_width), index_sizes
+
+
+class Command(BaseCommand):
+    help = 'Размер таблицы заявок и индексов по статусу на синтетических данных: ' \
+           'справочники и boolean-признаки против прежних строковых колонок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        table = Request._meta.db_table
+        active_ids = ', '.join(str(status_id) for status_id in ACTIVE_STATUS_IDS)
+        active_names = tuple(RequestStatus.objects.filter(id__in=ACTIVE_STATUS_IDS).values_list('name', flat=True))
+        with transaction.atomic(), connection.cursor() as cursor:
+            seed_requests(options['rows'])
+            # Прежнее представление строится из тех же строк во временной таблице с теми же индексами по статусу
+            cursor.execute(f'CREATE TEMP TABLE {LEGACY_TABLE} ON COMMIT DROP AS {legacy_select_sql()}')
+            cursor.execute(f'CREATE INDEX legacy_status_created_idx ON {LEGACY_TABLE} '
+                           f'(status_name, created_at, root_id)')
+            cursor.execute(f'CREATE INDEX legacy_active_created_idx ON {LEGACY_TABLE} (created_at, root_id) '
+                           f'WHERE status_name IN %s', [active_names])
+            # Копия текущей таблицы, чтобы сравнивать плотно упакованные данные без мёртвых версий строк.
+            # Копируются только колонки модели: поисковый вектор к сравнению кодирования не относится
+            columns = ', '.join(field.column for field in Request._meta.concrete_fields)
+            cursor.execute(f'CREATE TEMP TABLE compact_request_layout ON COMMIT DROP AS SELECT {columns} FROM {table}')
+            cursor.execute('CREATE INDEX compact_status_created_idx ON compact_request_layout '
+                           '(status_id, created_at, root_id)')
+            cursor.execute(f'CREATE INDEX compact_active_created_idx ON compact_request_layout (created_at, root_id) '
+                           f'WHERE status_id IN ({active_ids})')
+
+            compact = relation_stats(cursor, 'compact_request_layout',
+                                     ('compact_status_created_idx', 'compact_active_created_idx'))
+            legacy = relation_stats(cursor, LEGACY_TABLE, ('legacy_status_created_idx', 'legacy_active_created_idx'))
+            transaction.set_rollback(True)
+
+        rows = [
+            ('Средний размер строки, байт', legacy[1], compact[1]),
+            ('Таблица, МБ', legacy[0] / 2 ** 20, compact[0] / 2 ** 20),
+            ('Индекс (статус, дата создания, root_id), МБ', legacy[2][0] / 2 ** 20, compact[2][0] / 2 ** 20),
+            ('Частичный индекс активных заявок, МБ', legacy[2][1] / 2 ** 20, compact[2][1] / 2 ** 20),
+        ]
+        self.stdout.write(f'Заявок: {options["rows"]}')
+        self.stdout.write(f'{"":<45}{"строки":>10}{"справочники":>14}{"экономия":>10}')
+        for title, before, after in rows:
+            self.stdout.write(f'{title:<45}{before:>10.2f}{after:>14.2f}{(1 - after / before) * 100:>9.1f}%')
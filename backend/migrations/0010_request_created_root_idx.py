@@ -0,0 +1,17 @@
+# Generated by Django 4.1.2 on 2026-10-18 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0009_alter_user_first_name_alter_user_last_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['created_at', 'root_id'], name='request_created_root_idx'),
+        ),
+    ]
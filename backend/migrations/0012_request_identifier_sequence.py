@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0011_referenceversion'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                'CREATE SEQUENCE IF NOT EXISTS backend_request_identifier_seq AS bigint',
+                "SELECT setval('backend_request_identifier_seq', "
+                "GREATEST(COALESCE(MAX(root_id), 0), COALESCE(MAX(version_id), 0)) + 1, false) "
+                "FROM backend_request",
+            ],
+            reverse_sql='DROP SEQUENCE IF EXISTS backend_request_identifier_seq',
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.2 on 2026-10-18 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0012_request_identifier_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestNumberCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(unique=True, verbose_name='Год')),
+                ('last_number', models.PositiveIntegerField(default=0, verbose_name='Последний выданный номер')),
+            ],
+            options={
+                'verbose_name': 'Счётчик номеров заявок',
+                'verbose_name_plural': 'Счётчики номеров заявок',
+            },
+        ),
+        # Начальные значения счётчиков - максимальные номера вида "N/ГГ" за каждый год
+        migrations.RunSQL(
+            sql="INSERT INTO backend_requestnumbercounter (year, last_number) "
+                "SELECT 2000 + split_part(number, '/', 2)::integer, MAX(split_part(number, '/', 1)::integer) "
+                "FROM backend_request WHERE number ~ '^[0-9]{1,9}/[0-9]{2}$' "
+                "GROUP BY split_part(number, '/', 2)",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
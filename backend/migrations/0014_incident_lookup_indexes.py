@@ -0,0 +1,21 @@
+# Generated by Django 4.1.2 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0013_requestnumbercounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='defect',
+            index=models.Index(fields=['name', 'repeated_location'], name='defect_name_location_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['defect', 'created_at'], name='request_defect_created_idx'),
+        ),
+    ]
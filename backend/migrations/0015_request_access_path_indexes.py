@@ -0,0 +1,25 @@
+# Generated by Django 4.1.2 on 2026-10-18 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0014_incident_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['status_name', 'created_at', 'root_id'], name='request_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(condition=models.Q(('status_name__in', ('Новая', 'Ожидает обработки', 'В работе'))), fields=['created_at', 'root_id'], name='request_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(condition=models.Q(('parent_application_root_id__isnull', False)), fields=['parent_application_root_id'], name='request_parent_root_idx'),
+        ),
+    ]
@@ -0,0 +1,179 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Признаки "Да"/"Нет", которые хранятся как boolean: (таблица, колонка, длина прежнего varchar)
+SIGN_COLUMNS = (
+    ('backend_request', 'incident_sign', 3),
+    ('backend_request', 'card_payment_sign', 3),
+    ('backend_closingresult', 'security_events_sign', 3),
+    ('backend_closingresult', 'being_under_revision_sign', 3),
+    ('backend_closingresult', 'sign_alerted', 3),
+    ('backend_defect', 'sign_return_for_revision', 3),
+)
+
+# Строковые колонки, заменённые ссылками на справочники: (таблица, колонка, длина varchar)
+DROPPED_COLUMNS = (
+    ('backend_request', 'status_name', 17),
+    ('backend_request', 'status_code', 17),
+    ('backend_request', 'source_name', 23),
+    ('backend_request', 'source_code', 10),
+    ('backend_request', 'payment_category_name', 17),
+    ('backend_request', 'payment_category_code', 14),
+    ('backend_defect', 'urgency_category_name', 9),
+    ('backend_defect', 'urgency_category_code', 9),
+    ('backend_closingresult', 'effectiveness', 33),
+    ('backend_closingresult', 'efficiency_code', 9),
+)
+DROPPED_FIELDS = [(table[len('backend_'):], column) for table, column, _ in DROPPED_COLUMNS]
+
+# Справочники "наименование - код": (таблица справочника, таблица данных, колонка ключа, колонки наименования и кода)
+LOOKUP_COLUMNS = (
+    ('backend_requeststatus', 'backend_request', 'status_id', 'status_name', 'status_code'),
+    ('backend_requestsource', 'backend_request', 'source_id', 'source_name', 'source_code'),
+    ('backend_paymentcategory', 'backend_request', 'payment_category_id', 'payment_category_name',
+     'payment_category_code'),
+    ('backend_urgencycategory', 'backend_defect', 'urgency_category_id', 'urgency_category_name',
+     'urgency_category_code'),
+    ('backend_efficiency', 'backend_closingresult', 'efficiency_id', 'effectiveness', 'efficiency_code'),
+)
+
+
+def drop_column_operation(table, column, length):
+    return migrations.RunSQL(
+        sql=f'ALTER TABLE {table} DROP COLUMN {column}',
+        reverse_sql=[f"ALTER TABLE {table} ADD COLUMN {column} varchar({length}) NOT NULL DEFAULT ''",
+                     f'ALTER TABLE {table} ALTER COLUMN {column} DROP DEFAULT'],
+    )
+
+
+def sign_operations():
+    operations = []
+    for table, column, length in SIGN_COLUMNS:
+        operations.append(migrations.RunSQL(
+            sql=f"ALTER TABLE {table} ALTER COLUMN {column} TYPE boolean USING {column} = 'Да'",
+            reverse_sql=f"ALTER TABLE {table} ALTER COLUMN {column} TYPE varchar({length}) "
+                        f"USING CASE WHEN {column} THEN 'Да' ELSE 'Нет' END",
+        ))
+    return operations
+
+
+def fill_lookup_sql():
+    # Основные статусы получают фиксированные идентификаторы (RequestStatus.NEW и т.д.),
+    # код берётся из существующих заявок
+    sql = [
+        "INSERT INTO backend_requeststatus (id, name, code) "
+        "SELECT v.id, v.name, COALESCE((SELECT status_code FROM backend_request WHERE status_name = v.name "
+        "GROUP BY status_code ORDER BY COUNT(*) DESC LIMIT 1), v.code) "
+        "FROM (VALUES (1, 'Новая', 'new'), (2, 'Ожидает обработки', 'pending'), (3, 'В работе', 'in_progress'), "
+        "(4, 'Закрыта', 'closed')) AS v (id, name, code)",
+        "SELECT setval(pg_get_serial_sequence('backend_requeststatus', 'id'), 4)",
+    ]
+    for lookup_table, data_table, key, name, code in LOOKUP_COLUMNS:
+        sql += [
+            f"INSERT INTO {lookup_table} (name, code) SELECT {name}, MIN({code}) FROM {data_table} "
+            f"WHERE {name} NOT IN (SELECT name FROM {lookup_table}) GROUP BY {name}",
+            f"UPDATE {data_table} SET {key} = l.id FROM {lookup_table} l WHERE l.name = {data_table}.{name}",
+        ]
+    # Проверка отложенных внешних ключей сразу, иначе дальнейшие ALTER TABLE в этой транзакции невозможны
+    return sql + ['SET CONSTRAINTS ALL IMMEDIATE']
+
+
+def restore_lookup_sql():
+    return [f"UPDATE {data_table} SET {name} = l.name, {code} = l.code FROM {lookup_table} l "
+            f"WHERE l.id = {data_table}.{key}"
+            for lookup_table, data_table, key, name, code in LOOKUP_COLUMNS] + ['SET CONSTRAINTS ALL IMMEDIATE']
+
+
+def lookup_model(name, name_length, code_length, name_verbose, code_verbose, verbose_name, verbose_name_plural):
+    return migrations.CreateModel(
+        name=name,
+        fields=[
+            ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+            ('name', models.CharField(max_length=name_length, unique=True, verbose_name=name_verbose)),
+            ('code', models.CharField(max_length=code_length, verbose_name=code_verbose)),
+        ],
+        options={
+            'verbose_name': verbose_name,
+            'verbose_name_plural': verbose_name_plural,
+        },
+    )
+
+
+def lookup_foreign_key(model, verbose_name, related_name, null):
+    return models.ForeignKey(null=null, on_delete=django.db.models.deletion.PROTECT, related_name=related_name,
+                             to=f'backend.{model}', verbose_name=verbose_name)
+
+
+# Новые ссылки на справочники: (модель, поле, справочник, verbose_name, related_name)
+LOOKUP_FIELDS = (
+    ('request', 'status', 'requeststatus', 'Статус', 'requests'),
+    ('request', 'source', 'requestsource', 'Источник поступления', 'requests'),
+    ('request', 'payment_category', 'paymentcategory', 'Категория платности', 'requests'),
+    ('defect', 'urgency_category', 'urgencycategory', 'Категория срочности', 'defects'),
+    ('closingresult', 'efficiency', 'efficiency', 'Результативность', 'closing_results'),
+)
+
+# Признаки после перехода на boolean
+SIGN_FIELDS = (
+    ('request', 'incident_sign', 'Признак инцидента'),
+    ('request', 'card_payment_sign', 'Признак оплаты картой'),
+    ('closingresult', 'security_events_sign', 'Признак проведения охранных мероприятий'),
+    ('closingresult', 'being_under_revision_sign', 'Признак нахождения на доработке'),
+    ('closingresult', 'sign_alerted', 'Признак “Оповещен”'),
+    ('defect', 'sign_return_for_revision', 'Признак возврата на доработку'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0015_request_access_path_indexes'),
+    ]
+
+    operations = [
+        lookup_model('Efficiency', 33, 9, 'Результативность', 'Код результативности',
+                     'Результативность', 'Результативность'),
+        lookup_model('PaymentCategory', 17, 14, 'Наименование категории платности', 'Код категории платности',
+                     'Категория платности', 'Категории платности'),
+        lookup_model('RequestSource', 23, 10, 'Наименование источника поступления', 'Код источника поступления',
+                     'Источник поступления', 'Источники поступления'),
+        lookup_model('RequestStatus', 17, 17, 'Наименование статуса', 'Код статуса',
+                     'Статус заявки', 'Статусы заявок'),
+        lookup_model('UrgencyCategory', 9, 9, 'Наименование категории срочности', 'Код категории срочности',
+                     'Категория срочности', 'Категории срочности'),
+        *[migrations.AddField(model_name=model_name, name=name,
+                              field=lookup_foreign_key(model, verbose_name, related_name, null=True))
+          for model_name, name, model, verbose_name, related_name in LOOKUP_FIELDS],
+        # Перенос строковых значений в справочники
+        migrations.RunSQL(sql=fill_lookup_sql(), reverse_sql=restore_lookup_sql()),
+        *[migrations.AlterField(model_name=model_name, name=name,
+                                field=lookup_foreign_key(model, verbose_name, related_name, null=False))
+          for model_name, name, model, verbose_name, related_name in LOOKUP_FIELDS],
+        migrations.RemoveIndex(model_name='request', name='request_status_created_idx'),
+        migrations.RemoveIndex(model_name='request', name='request_active_created_idx'),
+        # Строковые колонки удаляются SQL-запросом: при откате они создаются с пустым значением
+        # и заполняются из справочников
+        migrations.SeparateDatabaseAndState(
+            database_operations=[drop_column_operation(table, column, length)
+                                 for table, column, length in DROPPED_COLUMNS],
+            state_operations=[migrations.RemoveField(model_name=model_name, name=column)
+                              for model_name, column in DROPPED_FIELDS],
+        ),
+        # Признаки "Да"/"Нет" -> boolean с преобразованием данных на месте
+        migrations.SeparateDatabaseAndState(
+            database_operations=sign_operations(),
+            state_operations=[migrations.AlterField(model_name=model_name, name=name,
+                                                    field=models.BooleanField(default=False,
+                                                                              verbose_name=verbose_name))
+                              for model_name, name, verbose_name in SIGN_FIELDS],
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['status', 'created_at', 'root_id'], name='request_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(condition=models.Q(('status__in', (1, 2, 3))), fields=['created_at', 'root_id'],
+                               name='request_active_created_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.1.2 on 2026-10-18 14:30
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_defects(apps, schema_editor):
+    """
+    Дефекты с одинаковым идентификатором сливаются в первый из них (с наименьшим pk): заявки и связи
+    с видами выполненных работ переводятся на него, остальные дефекты удаляются
+    """
+    Defect = apps.get_model('backend', 'Defect')
+    Request = apps.get_model('backend', 'Request')
+    WorkPerformedTypeDefects = apps.get_model('backend', 'WorkPerformedType').defects.through
+    duplicates = Defect.objects.values('identifier').annotate(count=Count('pk'), keep=Min('pk')).filter(count__gt=1)
+    for duplicate in duplicates:
+        keep = duplicate['keep']
+        others = list(Defect.objects.filter(identifier=duplicate['identifier']).exclude(pk=keep)
+                      .values_list('pk', flat=True))
+        Request.objects.filter(defect_id__in=others).update(defect_id=keep)
+        linked = set(WorkPerformedTypeDefects.objects.filter(defect_id=keep)
+                     .values_list('workperformedtype_id', flat=True))
+        for link in WorkPerformedTypeDefects.objects.filter(defect_id__in=others):
+            if link.workperformedtype_id in linked:
+                link.delete()
+            else:
+                linked.add(link.workperformedtype_id)
+                link.defect_id = keep
+                link.save()
+        Defect.objects.filter(pk__in=others).delete()
+    # Отложенные проверки внешних ключей выполняются сразу: иначе ALTER TABLE в той же транзакции не пройдёт
+    schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0016_compact_request_encoding'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_defects, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='defect',
+            name='identifier',
+            field=models.PositiveIntegerField(unique=True, verbose_name='Идентификатор'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.1.2 on 2026-10-18 14:44
+
+from django.db import migrations, models
+
+# Начальное заполнение счётчиков по активным заявкам (статусы 1-3), дальше они поддерживаются при изменении заявок
+FILL_ROLLUP_SQL = (
+    "INSERT INTO backend_openrequestrollup (dimension, key, open_count, updated_at) "
+    "SELECT v.dimension, v.key, COUNT(*), now() FROM backend_request r "
+    "JOIN backend_address a ON a.id = r.address_id JOIN backend_ods o ON o.id = a.ods_id "
+    "JOIN backend_defect d ON d.id = r.defect_id "
+    "CROSS JOIN LATERAL (VALUES ('district', a.district_name), ('ods', o.number), "
+    "('management_company', a.management_company), ('defect_category', d.category_name)) AS v (dimension, key) "
+    "WHERE r.status_id IN (1, 2, 3) GROUP BY v.dimension, v.key"
+)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0017_defect_identifier_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpenRequestRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('district', 'Район'), ('ods', 'ОДС'), ('management_company', 'Управляющая компания'), ('defect_category', 'Категория дефекта')], max_length=18, verbose_name='Разрез')),
+                ('key', models.CharField(max_length=109, verbose_name='Значение')),
+                ('open_count', models.IntegerField(default=0, verbose_name='Активных заявок')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Счётчик активных заявок',
+                'verbose_name_plural': 'Счётчики активных заявок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='openrequestrollup',
+            constraint=models.UniqueConstraint(fields=('dimension', 'key'), name='open_request_rollup_key_uniq'),
+        ),
+        migrations.RunSQL(sql=FILL_ROLLUP_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.2 on 2026-10-18 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0018_open_request_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestFlowBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(choices=[('created', 'Создание'), ('closed', 'Закрытие')], max_length=7, verbose_name='Событие')),
+                ('dimension', models.CharField(choices=[('source', 'Источник поступления'), ('defect_category', 'Категория дефекта'), ('district', 'Район')], max_length=15, verbose_name='Разрез')),
+                ('bucket_start', models.DateTimeField(verbose_name='Начало интервала')),
+                ('granularity', models.CharField(choices=[('hour', 'Час'), ('day', 'Сутки')], max_length=4, verbose_name='Длина интервала')),
+                ('key', models.CharField(max_length=100, verbose_name='Значение')),
+                ('count', models.IntegerField(default=0, verbose_name='Заявок')),
+            ],
+            options={
+                'verbose_name': 'Интервал потока заявок',
+                'verbose_name_plural': 'Интервалы потока заявок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='requestflowbucket',
+            constraint=models.UniqueConstraint(fields=('event', 'dimension', 'bucket_start', 'granularity', 'key'), name='request_flow_bucket_uniq'),
+        ),
+    ]
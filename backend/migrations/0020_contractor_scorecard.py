@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.db import migrations
+
+# Показатели организаций-исполнителей по месяцам закрытия заявок (по времени проекта, TIME_ZONE на момент
+# миграции). Хранятся суммы, а не средние, чтобы показатели за любой период складывались из месяцев
+SCORECARD_SQL = (
+    "CREATE MATERIALIZED VIEW backend_contractorscorecard AS "
+    "SELECT r.implementing_organization_id AS organization_id, "
+    "date_trunc('month', c.closing_date AT TIME ZONE %s)::date AS month, "
+    "COUNT(*) AS closed_count, COUNT(rv.id) AS review_count, "
+    "COALESCE(SUM(rv.assessment_quality_work), 0) AS quality_sum, "
+    "COALESCE(SUM(rf.return_count), 0) AS return_count, "
+    "COUNT(*) FILTER (WHERE c.being_under_revision_sign) AS revision_count "
+    "FROM backend_closingresult c JOIN backend_request r ON r.id = c.request_id "
+    "LEFT JOIN backend_review rv ON rv.closing_result_id = c.id "
+    "LEFT JOIN backend_refinement rf ON rf.closing_result_id = c.id "
+    "WHERE r.implementing_organization_id IS NOT NULL "
+    "GROUP BY r.implementing_organization_id, 2"
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0019_request_flow_bucket'),
+    ]
+
+    operations = [
+        # Уникальный индекс нужен для REFRESH MATERIALIZED VIEW CONCURRENTLY
+        migrations.RunSQL(
+            sql=[(SCORECARD_SQL, [settings.TIME_ZONE]),
+                 'CREATE UNIQUE INDEX contractor_scorecard_uniq '
+                 'ON backend_contractorscorecard (organization_id, month)'],
+            reverse_sql='DROP MATERIALIZED VIEW backend_contractorscorecard',
+        ),
+    ]
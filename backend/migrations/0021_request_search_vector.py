@@ -0,0 +1,26 @@
+from django.db import migrations
+
+# Поисковый вектор по описанию, комментариям и вопросу с русской морфологией и весами полей.
+# Генерируемая колонка пересчитывается самим PostgreSQL при каждой записи заявки; в модели её нет,
+# запросы обращаются к ней через backend.search
+SEARCH_VECTOR_SQL = (
+    "ALTER TABLE backend_request ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('russian'::regconfig, COALESCE(description, '')), 'A') || "
+    "setweight(to_tsvector('russian'::regconfig, COALESCE(comments, '')), 'B') || "
+    "setweight(to_tsvector('russian'::regconfig, COALESCE(question, '')), 'C')) STORED"
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0020_contractor_scorecard'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[SEARCH_VECTOR_SQL,
+                 'CREATE INDEX request_search_idx ON backend_request USING gin (search_vector)'],
+            reverse_sql='ALTER TABLE backend_request DROP COLUMN search_vector',
+        ),
+    ]
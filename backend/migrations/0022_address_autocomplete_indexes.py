@@ -0,0 +1,25 @@
+# Generated by Django 4.1.2 on 2026-10-18 14:52
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0021_request_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='address',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass('problem_address', name='gin_trgm_ops'), name='address_problem_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.comparison.Cast('unom', output_field=models.CharField()), name='varchar_pattern_ops'), name='address_unom_prefix_idx'),
+        ),
+    ]
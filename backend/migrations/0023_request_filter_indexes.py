@@ -0,0 +1,65 @@
+# Generated by Django 4.1.2 on 2026-10-18 14:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0022_address_autocomplete_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='request',
+            name='address',
+            field=models.ForeignKey(blank=True, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='requests', to='backend.address', verbose_name='Адрес'),
+        ),
+        migrations.AlterField(
+            model_name='request',
+            name='implementing_organization',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='requests', to='backend.implementingorganization', verbose_name='Организация-исполнитель'),
+        ),
+        migrations.AlterField(
+            model_name='request',
+            name='source',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='requests', to='backend.requestsource', verbose_name='Источник поступления'),
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['district_code'], name='address_district_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['country_code'], name='address_country_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['management_company'], name='address_company_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='defect',
+            index=models.Index(fields=['category_name'], name='defect_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['address', 'created_at'], name='request_address_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['source', 'created_at'], name='request_source_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['implementing_organization', 'created_at'], name='request_org_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(condition=models.Q(('incident_sign', True)), fields=['created_at', 'root_id'], name='request_incident_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['updated_at'], name='request_updated_idx'),
+        ),
+    ]
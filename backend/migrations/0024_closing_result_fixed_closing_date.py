@@ -0,0 +1,19 @@
+# Generated by Django 4.1.2 on 2026-10-18 15:19
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0023_request_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='closingresult',
+            name='closing_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата закрытия'),
+        ),
+    ]
@@ -3,7 +3,10 @@ from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.apps import apps
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import models, transaction
+from django.db.models.functions import Cast
+from django.utils import timezone
 
 
 class Organization(models.Model):
@@ -151,11 +154,55 @@ class Address(models.Model):
     class Meta:
         verbose_name = 'Адрес'
         verbose_name_plural = 'Список адресов'
+        indexes = [
+            # Отбор заявок по адресу (backend.filters)
+            models.Index(fields=['district_code'], name='address_district_idx'),
+            models.Index(fields=['country_code'], name='address_country_idx'),
+            models.Index(fields=['management_company'], name='address_company_idx'),
+            # Подсказки адресов (backend.autocomplete): нечёткий поиск по адресу и поиск по началу УНОМ
+            GinIndex(OpClass('problem_address', name='gin_trgm_ops'), name='address_problem_trgm_idx'),
+            models.Index(OpClass(Cast('unom', output_field=models.CharField()), name='varchar_pattern_ops'),
+                         name='address_unom_prefix_idx'),
+        ]
 
     def __str__(self):
         return f'{self.problem_address} {str(self.unom)}'
 
 
+class LookupModel(models.Model):
+    """
+    Базовая модель справочника "наименование - код".
+    Строки хранятся один раз, а ссылающиеся модели хранят двухбайтовый ключ (smallint)
+    """
+    id = models.SmallAutoField(primary_key=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f'{self.name} {self.code}'
+
+    @classmethod
+    def resolve(cls, name, code):
+        """
+        Запись справочника по наименованию (создаётся при первом обращении)
+        """
+        obj, _ = cls.objects.get_or_create(name=name, defaults={'code': code})
+        return obj
+
+
+class UrgencyCategory(LookupModel):
+    """
+    Модель категорий срочности
+    """
+    name = models.CharField(max_length=9, unique=True, verbose_name='Наименование категории срочности')
+    code = models.CharField(max_length=9, verbose_name='Код категории срочности')
+
+    class Meta:
+        verbose_name = 'Категория срочности'
+        verbose_name_plural = 'Категории срочности'
+
+
 class Defect(models.Model):
     """
     Модель дефектов
@@ -165,17 +212,24 @@ class Defect(models.Model):
     category_code = models.CharField(max_length=100, blank=True, verbose_name='Код категории')
     name = models.CharField(max_length=150, verbose_name='Наименование')
     short_name = models.CharField(max_length=150, verbose_name='Краткое наименование')
-    identifier = models.PositiveIntegerField(verbose_name='Идентификатор')
+    identifier = models.PositiveIntegerField(unique=True, verbose_name='Идентификатор')
     code = models.CharField(max_length=150, verbose_name='Код')
-    urgency_category_name = models.CharField(max_length=9, verbose_name='Наименование категории срочности')
-    urgency_category_code = models.CharField(max_length=9, verbose_name='Код категории срочности')
-    sign_return_for_revision = models.CharField(max_length=3, verbose_name='Признак возврата на доработку')
+    urgency_category = models.ForeignKey(UrgencyCategory,
+                                         verbose_name='Категория срочности',
+                                         related_name='defects',
+                                         on_delete=models.PROTECT)
+    sign_return_for_revision = models.BooleanField(default=False, verbose_name='Признак возврата на доработку')
     another_term = models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Повторный срок')
     repeated_location = models.CharField(max_length=13, blank=True, verbose_name='Повторная локация')
 
     class Meta:
         verbose_name = 'Дефект'
         verbose_name_plural = 'Список дефектов'
+        indexes = [
+            models.Index(fields=['name', 'repeated_location'], name='defect_name_location_idx'),
+            # Отбор заявок по категории дефекта (backend.filters)
+            models.Index(fields=['category_name'], name='defect_category_idx'),
+        ]
 
 
 class WorkPerformedType(models.Model):
@@ -217,6 +271,57 @@ class SecurityEvents(models.Model):
         return f'{self.name} {str(self.root_version_id)}'
 
 
+class RequestStatus(LookupModel):
+    """
+    Модель статусов заявок (идентификаторы основных статусов фиксированы)
+    """
+    NEW = 1
+    PENDING_PROCESSING = 2
+    IN_PROGRESS = 3
+    CLOSED = 4
+
+    name = models.CharField(max_length=17, unique=True, verbose_name='Наименование статуса')
+    code = models.CharField(max_length=17, verbose_name='Код статуса')
+
+    class Meta:
+        verbose_name = 'Статус заявки'
+        verbose_name_plural = 'Статусы заявок'
+
+
+# Статусы активных заявок
+ACTIVE_STATUS_IDS = (RequestStatus.NEW, RequestStatus.PENDING_PROCESSING, RequestStatus.IN_PROGRESS)
+
+# Допустимые переходы статусов при массовой смене: целевой статус -> статусы, из которых в него можно перейти
+STATUS_TRANSITIONS = {
+    RequestStatus.PENDING_PROCESSING: (RequestStatus.NEW,),
+    RequestStatus.IN_PROGRESS: (RequestStatus.NEW, RequestStatus.PENDING_PROCESSING),
+}
+
+
+class RequestSource(LookupModel):
+    """
+    Модель источников поступления заявок
+    """
+    name = models.CharField(max_length=23, unique=True, verbose_name='Наименование источника поступления')
+    code = models.CharField(max_length=10, verbose_name='Код источника поступления')
+
+    class Meta:
+        verbose_name = 'Источник поступления'
+        verbose_name_plural = 'Источники поступления'
+
+
+class PaymentCategory(LookupModel):
+    """
+    Модель категорий платности
+    """
+    name = models.CharField(max_length=17, unique=True, verbose_name='Наименование категории платности')
+    code = models.CharField(max_length=14, verbose_name='Код категории платности')
+
+    class Meta:
+        verbose_name = 'Категория платности'
+        verbose_name_plural = 'Категории платности'
+
+
 class Request(models.Model):
     """
     Модель заявок
@@ -230,10 +335,14 @@ class Request(models.Model):
                                                             blank=True)
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата начала действия версии')
-    source_name = models.CharField(max_length=23, verbose_name='Наименование источника поступления')
-    source_code = models.CharField(max_length=10, verbose_name='Код источника поступления')
+    # Ссылки на источник, адрес и организацию-исполнителя индексируются составными индексами с датой создания
+    source = models.ForeignKey(RequestSource,
+                               verbose_name='Источник поступления',
+                               related_name='requests',
+                               db_index=False,
+                               on_delete=models.PROTECT)
     creator_name = models.CharField(max_length=20, verbose_name='Имя создателя')
-    incident_sign = models.CharField(max_length=3, verbose_name='Признак инцидента')
+    incident_sign = models.BooleanField(default=False, verbose_name='Признак инцидента')
     parent_application_root_id = models.PositiveIntegerField(blank=True,
                                                              null=True,
                                                              verbose_name='Корневой идентификатор материнской заявки')
@@ -247,6 +356,7 @@ class Request(models.Model):
                                 verbose_name='Адрес',
                                 blank=True,
                                 related_name='requests',
+                                db_index=False,
                                 on_delete=models.CASCADE)
     entrance = models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Подъезд')
     floor = models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Этаж')
@@ -256,14 +366,19 @@ class Request(models.Model):
                                                   blank=True,
                                                   null=True,
                                                   related_name='requests',
+                                                  db_index=False,
                                                   on_delete=models.CASCADE)
-    status_name = models.CharField(max_length=17, verbose_name='Наименование статуса')
-    status_code = models.CharField(max_length=17, verbose_name='Код статуса')
+    status = models.ForeignKey(RequestStatus,
+                               verbose_name='Статус',
+                               related_name='requests',
+                               on_delete=models.PROTECT)
     desired_time_from = models.CharField(max_length=70, blank=True, verbose_name='Желаемое время с')
     desired_time_before = models.CharField(max_length=70, blank=True, verbose_name='Желаемое время до')
-    payment_category_name = models.CharField(max_length=17, verbose_name='Наименование категории платности')
-    payment_category_code = models.CharField(max_length=14, verbose_name='Код категории платности')
-    card_payment_sign = models.CharField(max_length=3, verbose_name='Признак оплаты картой')
+    payment_category = models.ForeignKey(PaymentCategory,
+                                         verbose_name='Категория платности',
+                                         related_name='requests',
+                                         on_delete=models.PROTECT)
+    card_payment_sign = models.BooleanField(default=False, verbose_name='Признак оплаты картой')
     defect = models.ForeignKey(Defect,
                                verbose_name='Дефект',
                                blank=True,
@@ -279,10 +394,35 @@ class Request(models.Model):
         verbose_name = 'Заявка'
         verbose_name_plural = 'Список заявок'
         ordering = ('number',)
+        indexes = [
+            models.Index(fields=['created_at', 'root_id'], name='request_created_root_idx'),
+            models.Index(fields=['defect', 'created_at'], name='request_defect_created_idx'),
+            # Списки заявок по статусу в порядке курсорной пагинации
+            models.Index(fields=['status', 'created_at', 'root_id'], name='request_status_created_idx'),
+            # Активные заявки (списки активных заявок и заявок для добавления в инцидент)
+            models.Index(fields=['created_at', 'root_id'], name='request_active_created_idx',
+                         condition=models.Q(status__in=ACTIVE_STATUS_IDS)),
+            # Дочерние заявки инцидентов
+            models.Index(fields=['parent_application_root_id'], name='request_parent_root_idx',
+                         condition=models.Q(parent_application_root_id__isnull=False)),
+            # Отбор заявок в списках (backend.filters) в порядке курсорной пагинации
+            models.Index(fields=['address', 'created_at'], name='request_address_created_idx'),
+            models.Index(fields=['source', 'created_at'], name='request_source_created_idx'),
+            models.Index(fields=['implementing_organization', 'created_at'], name='request_org_created_idx'),
+            models.Index(fields=['created_at', 'root_id'], name='request_incident_created_idx',
+                         condition=models.Q(incident_sign=True)),
+            models.Index(fields=['updated_at'], name='request_updated_idx'),
+        ]
 
     def __str__(self):
         return f'{str(self.root_id)} {str(self.version_id)} {self.number} {self.unique_public_services_appeal_number}'
 
+    def save(self, *args, **kwargs):
+        # Счётчики активных заявок и поток заявок (backend.signals) изменяются до и после записи заявки:
+        # все изменения фиксируются или откатываются вместе с ней
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
 
 class MarmExecutor(models.Model):
     """
@@ -316,12 +456,24 @@ class MarmImplementingOrganization(models.Model):
         return f'{self.name_reason_refusal} {self.failure_reason_id}'
 
 
+class Efficiency(LookupModel):
+    """
+    Модель результативности закрытия
+    """
+    name = models.CharField(max_length=33, unique=True, verbose_name='Результативность')
+    code = models.CharField(max_length=9, verbose_name='Код результативности')
+
+    class Meta:
+        verbose_name = 'Результативность'
+        verbose_name_plural = 'Результативность'
+
+
 class ClosingResult(models.Model):
     """
     Модель результатов закрытия
     """
     consumed_material = models.CharField(max_length=200, blank=True, verbose_name='Израсходованный материал')
-    security_events_sign = models.CharField(max_length=3, verbose_name='Признак проведения охранных мероприятий')
+    security_events_sign = models.BooleanField(default=False, verbose_name='Признак проведения охранных мероприятий')
     security_events_time = models.DateTimeField(blank=True,
                                                 null=True,
                                                 verbose_name='Время проведения охранных мероприятий')
@@ -329,7 +481,10 @@ class ClosingResult(models.Model):
                                                               blank=True,
                                                               verbose_name='Описание выполненных действий при '
                                                                            'проведении охранных мероприятий')
-    effectiveness = models.CharField(max_length=33, verbose_name='Результативность')
+    efficiency = models.ForeignKey(Efficiency,
+                                   verbose_name='Результативность',
+                                   related_name='closing_results',
+                                   on_delete=models.PROTECT)
     marm_executor = models.ForeignKey(MarmExecutor,
                                       verbose_name='МАРМ (Исполнитель)',
                                       blank=True,
@@ -342,10 +497,10 @@ class ClosingResult(models.Model):
                                                        null=True,
                                                        related_name='closing_results',
                                                        on_delete=models.CASCADE)
-    efficiency_code = models.CharField(max_length=9, verbose_name='Код результативности')
-    being_under_revision_sign = models.CharField(max_length=3, verbose_name='Признак нахождения на доработке')
-    sign_alerted = models.CharField(max_length=3, verbose_name='Признак “Оповещен”')
-    closing_date = models.DateTimeField(auto_now=True, verbose_name='Дата закрытия')
+    being_under_revision_sign = models.BooleanField(default=False, verbose_name='Признак нахождения на доработке')
+    sign_alerted = models.BooleanField(default=False, verbose_name='Признак “Оповещен”')
+    # Проставляется при создании результата и не меняется при его изменении (например, при возврате на доработку)
+    closing_date = models.DateTimeField(default=timezone.now, verbose_name='Дата закрытия')
     request = models.OneToOneField(Request,
                                    verbose_name='Заявка',
                                    related_name='closing_result',
@@ -389,3 +544,112 @@ class Refinement(models.Model):
     class Meta:
         verbose_name = 'Доработка'
         verbose_name_plural = 'Список доработок'
+
+
+class ReferenceVersion(models.Model):
+    """
+    Модель версий справочников (счётчик изменений для условных запросов и кеша)
+    """
+    name = models.CharField(max_length=50, unique=True, verbose_name='Справочник')
+    version = models.PositiveBigIntegerField(default=0, verbose_name='Версия')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
+
+    class Meta:
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочников'
+
+    def __str__(self):
+        return f'{self.name} {str(self.version)}'
+
+
+class RequestNumberCounter(models.Model):
+    """
+    Модель счётчика номеров заявок по годам (номер заявки - "N/ГГ")
+    """
+    year = models.PositiveSmallIntegerField(unique=True, verbose_name='Год')
+    last_number = models.PositiveIntegerField(default=0, verbose_name='Последний выданный номер')
+
+    class Meta:
+        verbose_name = 'Счётчик номеров заявок'
+        verbose_name_plural = 'Счётчики номеров заявок'
+
+    def __str__(self):
+        return f'{str(self.year)} {str(self.last_number)}'
+
+
+class OpenRequestRollup(models.Model):
+    """
+    Модель счётчиков активных заявок по району, ОДС, управляющей компании и категории дефекта.
+    Поддерживается при изменении заявок (backend.rollups), сверяется командой reconcile_rollups
+    """
+    DISTRICT = 'district'
+    ODS = 'ods'
+    MANAGEMENT_COMPANY = 'management_company'
+    DEFECT_CATEGORY = 'defect_category'
+    DIMENSIONS = (
+        (DISTRICT, 'Район'),
+        (ODS, 'ОДС'),
+        (MANAGEMENT_COMPANY, 'Управляющая компания'),
+        (DEFECT_CATEGORY, 'Категория дефекта'),
+    )
+
+    dimension = models.CharField(max_length=18, choices=DIMENSIONS, verbose_name='Разрез')
+    key = models.CharField(max_length=109, verbose_name='Значение')
+    open_count = models.IntegerField(default=0, verbose_name='Активных заявок')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
+
+    class Meta:
+        verbose_name = 'Счётчик активных заявок'
+        verbose_name_plural = 'Счётчики активных заявок'
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key'], name='open_request_rollup_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.dimension} {self.key} {str(self.open_count)}'
+
+
+class RequestFlowBucket(models.Model):
+    """
+    Модель числа созданных и закрытых заявок за час или сутки по источнику поступления, категории дефекта и району.
+    Часовые интервалы пополняются при создании и закрытии заявок (backend.flows) и со временем сворачиваются в суточные
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    GRANULARITIES = (
+        (HOUR, 'Час'),
+        (DAY, 'Сутки'),
+    )
+    CREATED = 'created'
+    CLOSED = 'closed'
+    EVENTS = (
+        (CREATED, 'Создание'),
+        (CLOSED, 'Закрытие'),
+    )
+    SOURCE = 'source'
+    DEFECT_CATEGORY = 'defect_category'
+    DISTRICT = 'district'
+    DIMENSIONS = (
+        (SOURCE, 'Источник поступления'),
+        (DEFECT_CATEGORY, 'Категория дефекта'),
+        (DISTRICT, 'Район'),
+    )
+
+    event = models.CharField(max_length=7, choices=EVENTS, verbose_name='Событие')
+    dimension = models.CharField(max_length=15, choices=DIMENSIONS, verbose_name='Разрез')
+    bucket_start = models.DateTimeField(verbose_name='Начало интервала')
+    granularity = models.CharField(max_length=4, choices=GRANULARITIES, verbose_name='Длина интервала')
+    key = models.CharField(max_length=100, verbose_name='Значение')
+    count = models.IntegerField(default=0, verbose_name='Заявок')
+
+    class Meta:
+        verbose_name = 'Интервал потока заявок'
+        verbose_name_plural = 'Интервалы потока заявок'
+        constraints = [
+            # Порядок колонок рассчитан и на ON CONFLICT, и на выборку разреза за период
+            models.UniqueConstraint(fields=['event', 'dimension', 'bucket_start', 'granularity', 'key'],
+                                    name='request_flow_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.event} {self.dimension} {self.key} {self.bucket_start} {str(self.count)}'
@@ -0,0 +1,144 @@
+import json
+from datetime import datetime
+
+from django.db.models import BooleanField, F, Func, Value
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor
+
+
+class RowComparison(Func):
+    """
+    Сравнение строк (поле, ...) < (значение, ...) или >: PostgreSQL проверяет его по составному индексу
+    по этим полям и читает индекс с позиции, а не с начала
+    """
+    output_field = BooleanField()
+
+    def __init__(self, fields, operator, values):
+        self.operator = operator
+        super().__init__(*(F(field) for field in fields), *(Value(value) for value in values))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        parts, params = [], []
+        for expression in self.source_expressions:
+            sql, expression_params = compiler.compile(expression)
+            parts.append(sql)
+            params.extend(expression_params)
+        size = len(parts) // 2
+        return f'({", ".join(parts[:size])}) {self.operator} ({", ".join(parts[size:])})', params
+
+
+def parse_position_datetime(value):
+    """
+    Дата и время позиции курсора в формате ISO 8601
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+def encode_position_value(value):
+    # Дата и время - в формате ISO 8601 с микросекундами, иначе позиция не совпадёт со значением в БД
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в позицию курсора')
+
+
+class KeysetCursorPaginationMixin:
+    """
+    Курсорная пагинация по паре полей ordering (неуникальное поле и уникальный ключ, в одном направлении).
+
+    Позиция курсора - значения обоих полей, условие на позицию - сравнение строк (RowComparison), поэтому
+    при совпадении значений первого поля следующая страница не отсчитывается смещением (OFFSET) от позиции,
+    а запрос к глубокой странице читает индекс по паре полей с позиции.
+    position_types - преобразование значений полей позиции при разборе курсора.
+    """
+    position_types = (str, str)
+
+    def get_position_filter(self, position, reverse):
+        operator = '<' if self.ordering[0].startswith('-') != reverse else '>'
+        return RowComparison([name.lstrip('-') for name in self.ordering], operator, position)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = None if self.cursor is None else self.cursor.position
+
+        if reverse:
+            queryset = queryset.order_by(*(name[1:] if name.startswith('-') else f'-{name}'
+                                           for name in self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position, reverse))
+
+        # Лишняя строка показывает, есть ли страница за текущей
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+        following = self._get_position_from_instance(results[-1], self.ordering) if has_following else None
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = position is not None, position
+            self.has_previous, self.previous_position = has_following, following
+        else:
+            self.has_next, self.next_position = has_following, following
+            self.has_previous, self.previous_position = position is not None, position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            values = json.loads(cursor.position)
+            if not isinstance(values, list) or len(values) != len(self.position_types):
+                raise ValueError(cursor.position)
+            position = tuple(convert(value) for convert, value in zip(self.position_types, values))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=cursor.reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        if cursor.position is not None:
+            position = json.dumps(list(cursor.position), default=encode_position_value)
+            cursor = Cursor(offset=0, reverse=cursor.reverse, position=position)
+        return super().encode_cursor(cursor)
+
+    def _get_position_from_instance(self, instance, ordering):
+        names = [name.lstrip('-') for name in ordering]
+        if isinstance(instance, dict):
+            return tuple(instance[name] for name in names)
+        return tuple(getattr(instance, name) for name in names)
+
+
+class RequestCursorPagination(KeysetCursorPaginationMixin, CursorPagination):
+    """
+    Курсорная (keyset) пагинация заявок по убыванию даты создания, при равной дате - по убыванию root_id.
+
+    Позиция страницы - пара (created_at, root_id) последней заявки; условие на неё читается по индексу
+    request_created_root_idx (и индексам статусов), поэтому запрос к 1000-й странице стоит столько же,
+    сколько к первой, даже если у многих заявок одна дата создания (массовое создание, загрузка выгрузки).
+    """
+    ordering = ('-created_at', '-root_id')
+    position_types = (parse_position_datetime, int)
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class RequestSearchCursorPagination(RequestCursorPagination):
+    """
+    Курсорная пагинация результатов поиска: по убыванию релевантности (аннотация rank, backend.search),
+    при равной релевантности - по убыванию root_id
+    """
+    ordering = ('-rank', '-root_id')
+    position_types = (float, int)
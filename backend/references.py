@@ -0,0 +1,43 @@
+from django.db.models import F
+from django.utils import timezone
+
+from backend.models import Address, ODS, Defect, WorkPerformedType, ImplementingOrganization, User, \
+    ReferenceVersion
+
+# Справочники и модели, изменение которых меняет их содержимое
+REFERENCE_DEPENDENCIES = {
+    'addresses': (Address, ODS),
+    'defects': (Defect,),
+    'work-performed-types': (WorkPerformedType, Defect),
+    'implementing-organizations': (ImplementingOrganization, User),
+}
+
+
+def get_dependent_references(model):
+    """
+    Справочники, которые зависят от модели
+    """
+    return [name for name, dependencies in REFERENCE_DEPENDENCIES.items() if model in dependencies]
+
+
+def bump_reference_versions(names):
+    """
+    Увеличение версий справочников после изменения их данных
+    """
+    names = set(names)
+    if not names:
+        return
+    now = timezone.now()
+    updated = ReferenceVersion.objects.filter(name__in=names).update(version=F('version') + 1, updated_at=now)
+    if updated < len(names):
+        existing = set(ReferenceVersion.objects.filter(name__in=names).values_list('name', flat=True))
+        for name in names - existing:
+            ReferenceVersion.objects.get_or_create(name=name, defaults={'version': 1})
+
+
+def get_reference_version(name):
+    """
+    Текущая версия справочника и время её изменения
+    """
+    version = ReferenceVersion.objects.filter(name=name).values_list('version', 'updated_at').first()
+    return version or (0, None)
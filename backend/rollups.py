@@ -0,0 +1,60 @@
+from django.db import connection, transaction
+from django.utils import timezone
+
+from backend.models import Request, Address, ODS, Defect, OpenRequestRollup, ACTIVE_STATUS_IDS
+
+
+def rollup_source_sql():
+    """
+    FROM-часть выборки заявок r с разрезами счётчиков: каждая заявка даёт по строке (разрез, значение)
+    на район, ОДС, управляющую компанию и категорию дефекта
+    """
+    request, address, ods, defect = (connection.ops.quote_name(model._meta.db_table)
+                                     for model in (Request, Address, ODS, Defect))
+    return (f'FROM {request} r JOIN {address} a ON a.id = r.address_id JOIN {ods} o ON o.id = a.ods_id '
+            f'JOIN {defect} d ON d.id = r.defect_id '
+            f"CROSS JOIN LATERAL (VALUES ('{OpenRequestRollup.DISTRICT}', a.district_name), "
+            f"('{OpenRequestRollup.ODS}', o.number), "
+            f"('{OpenRequestRollup.MANAGEMENT_COMPANY}', a.management_company), "
+            f"('{OpenRequestRollup.DEFECT_CATEGORY}', d.category_name)) AS v (dimension, key)")
+
+
+def adjust_open_request_rollups(request_ids, sign):
+    """
+    Изменение счётчиков на вклад заявок request_ids (первичные ключи) одним INSERT ... ON CONFLICT:
+    sign=1 добавляет, sign=-1 вычитает. Учитываются активные заявки в их текущем состоянии в БД,
+    поэтому вычитание вызывается до изменения заявок, а добавление - после.
+    """
+    request_ids = list(request_ids)
+    if not request_ids:
+        return
+    rollup = connection.ops.quote_name(OpenRequestRollup._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {rollup} (dimension, key, open_count, updated_at) '
+                       f'SELECT v.dimension, v.key, %s * COUNT(*), %s {rollup_source_sql()} '
+                       f'WHERE r.id = ANY(%s) AND r.status_id = ANY(%s) GROUP BY v.dimension, v.key '
+                       f'ON CONFLICT (dimension, key) DO UPDATE '
+                       f'SET open_count = {rollup}.open_count + EXCLUDED.open_count, updated_at = EXCLUDED.updated_at',
+                       [sign, timezone.now(), request_ids, list(ACTIVE_STATUS_IDS)])
+
+
+def reconcile_open_request_rollups():
+    """
+    Сверка счётчиков с таблицей заявок: перезаписываются только разошедшиеся счётчики.
+
+    На время сверки таблица счётчиков блокируется от изменений (чтение не блокируется), чтобы
+    одновременные изменения заявок не потерялись. Возвращает число исправленных счётчиков.
+    """
+    rollup = connection.ops.quote_name(OpenRequestRollup._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {rollup} IN EXCLUSIVE MODE')
+        cursor.execute(f'WITH actual AS (SELECT v.dimension, v.key, COUNT(*) AS open_count {rollup_source_sql()} '
+                       f'WHERE r.status_id = ANY(%s) GROUP BY v.dimension, v.key) '
+                       f'INSERT INTO {rollup} (dimension, key, open_count, updated_at) '
+                       f'SELECT dimension, key, COALESCE(actual.open_count, 0), %s '
+                       f'FROM actual FULL JOIN {rollup} stored USING (dimension, key) '
+                       f'WHERE COALESCE(actual.open_count, 0) IS DISTINCT FROM stored.open_count '
+                       f'ON CONFLICT (dimension, key) DO UPDATE '
+                       f'SET open_count = EXCLUDED.open_count, updated_at = EXCLUDED.updated_at',
+                       [list(ACTIVE_STATUS_IDS), timezone.now()])
+        return cursor.rowcount
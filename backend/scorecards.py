@@ -0,0 +1,48 @@
+from django.db import connection
+
+from backend.models import ImplementingOrganization
+
+# Материализованное представление с показателями организаций-исполнителей по месяцам (миграция 0020)
+SCORECARD_VIEW = 'backend_contractorscorecard'
+
+
+def refresh_contractor_scorecards():
+    """
+    Пересчёт показателей целиком (по всем закрытым заявкам, не только изменившимся). CONCURRENTLY не блокирует
+    ни чтение показателей, ни запись в таблицы заявок
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {SCORECARD_VIEW}')
+
+
+def contractor_scorecards(month_from=None, month_to=None, organization_identifier=None, by_month=False):
+    """
+    Показатели организаций-исполнителей за месяцы с month_from по month_to (первые числа месяцев):
+    средняя оценка качества работ, среднее число возвратов и доля заявок на доработке.
+    Считаются по помесячным суммам, поэтому время не зависит от числа заявок.
+    При by_month - отдельно по каждому месяцу. Лучшие по оценке качества - первыми.
+    """
+    organization = connection.ops.quote_name(ImplementingOrganization._meta.db_table)
+    conditions, params = ['TRUE'], []
+    if month_from:
+        conditions.append('s.month >= %s')
+        params.append(month_from)
+    if month_to:
+        conditions.append('s.month <= %s')
+        params.append(month_to)
+    if organization_identifier is not None:
+        conditions.append('o.identifier = %s')
+        params.append(organization_identifier)
+    month = 's.month' if by_month else 'NULL::date'
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT o.identifier, o.name, {month} AS month, SUM(s.closed_count) AS closed_count, '
+                       f'SUM(s.review_count) AS review_count, '
+                       f'ROUND(SUM(s.quality_sum)::numeric / NULLIF(SUM(s.review_count), 0), 2)::float8 '
+                       f'AS average_quality, '
+                       f'ROUND(SUM(s.return_count)::numeric / SUM(s.closed_count), 2)::float8 AS average_return_count, '
+                       f'ROUND(SUM(s.revision_count)::numeric / SUM(s.closed_count), 4)::float8 AS revision_share '
+                       f'FROM {SCORECARD_VIEW} s JOIN {organization} o ON o.id = s.organization_id '
+                       f'WHERE {" AND ".join(conditions)} GROUP BY o.id, 3 '
+                       f'ORDER BY 3, average_quality DESC NULLS LAST, revision_share, o.name', params)
+        columns = [column.name for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -0,0 +1,30 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+from django.db import connection
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from backend.models import Request
+
+# Конфигурация текстового поиска (должна совпадать с генерируемой колонкой search_vector)
+SEARCH_CONFIG = 'russian'
+
+
+def search_vector():
+    """
+    Генерируемая колонка search_vector таблицы заявок (миграция 0021_request_search_vector)
+    """
+    return RawSQL(f'{connection.ops.quote_name(Request._meta.db_table)}.search_vector', [],
+                  output_field=SearchVectorField())
+
+
+def search_requests(queryset, text):
+    """
+    Заявки, подходящие под поисковую строку text (синтаксис websearch_to_tsquery: "фраза", or, -слово),
+    с релевантностью rank. Условие идёт по GIN-индексу request_search_idx.
+    """
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    # Вектор только используется в условии и ранжировании, но не выбирается
+    # rank приводится к double precision: курсор пагинации должен точно восстанавливать значение
+    return queryset.alias(search_vector=search_vector()).filter(search_vector=query) \
+        .annotate(rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
@@ -0,0 +1,78 @@
+from django.db import connection
+
+from backend.allocators import allocate_request_ids
+from backend.models import Request, ODS, Address, Defect, Organization, User, RequestStatus, RequestSource, \
+    PaymentCategory, UrgencyCategory, ImplementingOrganization
+
+# Распределение статусов синтетических заявок: большая часть заявок закрыта
+SEED_STATUSES = (RequestStatus.CLOSED,) * 7 + (RequestStatus.NEW, RequestStatus.PENDING_PROCESSING,
+                                               RequestStatus.IN_PROGRESS)
+
+
+def seed_references(addresses=500, defects=40):
+    """
+    Синтетические справочники для заявок: ОДС, адреса (по 5 округам, 10 районам и управляющим компаниям),
+    дефекты, организации-исполнители и пользователь
+    """
+    ods_list = ODS.objects.bulk_create(ODS(number=f'ОДС синтетических данных {i}') for i in range(20))
+    address_list = Address.objects.bulk_create(
+        Address(country_name=f'АО {i % 5}', country_code=900 + i % 5, district_name=f'Район {i % 10}',
+                district_code=900 + i % 10, problem_address=f'Синтетический адрес, д. {i}', unom=900000000 + i,
+                ods=ods_list[i % len(ods_list)], management_company=f'УК синтетических данных {i % 10}')
+        for i in range(addresses)
+    )
+    urgency_categories = (UrgencyCategory.resolve('Обычная', 'usual'),
+                          UrgencyCategory.resolve('Аварийная', 'emergency'))
+    defect_list = Defect.objects.bulk_create(
+        Defect(category_name=f'Категория {i % 10}', category_root_id=i % 10, name=f'Дефект {i}',
+               short_name=f'Дефект {i}', identifier=900000 + i, code=f'seed-{i}',
+               urgency_category=urgency_categories[i % 8 == 0], another_term=3,
+               repeated_location='Подъезд' if i % 2 else 'Квартира')
+        for i in range(defects)
+    )
+    organization = Organization.objects.create(name='Организация синтетических данных', identifier=900000000,
+                                               inn=900000000, business_role='Диспетчер')
+    user = User.objects.create(username='seed-dispatcher', first_name='Иван', last_name='Иванов',
+                               organization=organization)
+    implementing_organizations = ImplementingOrganization.objects.bulk_create(
+        ImplementingOrganization(name=f'Исполнитель синтетических данных {i}', identifier=900000000 + i,
+                                 inn=900000000 + i, business_role='Исполнитель')
+        for i in range(5)
+    )
+    return address_list, defect_list, user, implementing_organizations
+
+
+def seed_requests(count, batch_size=5000):
+    """
+    Синтетические заявки для замеров и проверки планов запросов.
+
+    Заявки равномерно распределены по адресам, дефектам и источникам, даты создания - по последним трём годам,
+    у трети заявок есть организация-исполнитель, каждая двадцатая заявка - дочерняя, а предыдущая - материнская.
+    Предполагается вызов внутри транзакции, которая затем откатывается.
+    """
+    addresses, defects, user, implementing_organizations = seed_references()
+    sources = (RequestSource.resolve('Портал', 'portal'), RequestSource.resolve('Телефон', 'phone'),
+               RequestSource.resolve('Мобильное приложение', 'mobile'))
+    payment_category = PaymentCategory.resolve('Бесплатная', 'free')
+    root_ids = allocate_request_ids(count)
+    requests = Request.objects.bulk_create(
+        (Request(root_id=root_id, number=f'{i + 1}/00', unique_public_services_appeal_number=f'seed-{i + 1}',
+                 source=sources[i % len(sources)], creator_name='Оператор', description='Синтетическая заявка',
+                 address=addresses[i % len(addresses)], status_id=SEED_STATUSES[i % len(SEED_STATUSES)],
+                 payment_category=payment_category, defect=defects[i % len(defects)], user=user,
+                 implementing_organization=implementing_organizations[i % 15] if i % 15 < 5 else None)
+         for i, root_id in enumerate(root_ids)),
+        batch_size=batch_size,
+    )
+    table = connection.ops.quote_name(Request._meta.db_table)
+    with connection.cursor() as cursor:
+        # created_at проставляется при вставке (auto_now_add), поэтому даты задаются отдельным запросом
+        cursor.execute(f"UPDATE {table} SET created_at = now() - random() * interval '1095 days' "
+                       f"WHERE root_id >= %s", [root_ids[0]])
+        cursor.execute(f"UPDATE {table} SET updated_at = created_at, "
+                       f"parent_application_root_id = CASE WHEN root_id %% 20 = 0 THEN root_id - 1 END, "
+                       f"incident_sign = root_id %% 20 = 19 "
+                       f"WHERE root_id >= %s", [root_ids[0]])
+        for model in (Request, Address, Defect, ImplementingOrganization, RequestStatus, RequestSource):
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+    return requests
@@ -1,7 +1,24 @@
 from rest_framework import serializers
 
+from backend.compiled_serializers import compile_serializer
 from backend.models import Request, Address, ODS, ImplementingOrganization, Defect, User, Organization, \
-    WorkPerformedType, SecurityEvents, ClosingResult, MarmExecutor, MarmImplementingOrganization, Review, Refinement
+    WorkPerformedType, SecurityEvents, ClosingResult, MarmExecutor, MarmImplementingOrganization, Review, Refinement, \
+    OpenRequestRollup, RequestSource, PaymentCategory
+
+# Представление признаков (булевых полей) в API
+SIGN_YES = 'Да'
+SIGN_NO = 'Нет'
+
+
+class SignField(serializers.BooleanField):
+    """
+    Признак "Да"/"Нет": в БД хранится как boolean, в API - строкой, как и раньше
+    """
+    TRUE_VALUES = serializers.BooleanField.TRUE_VALUES | {SIGN_YES}
+    FALSE_VALUES = serializers.BooleanField.FALSE_VALUES | {SIGN_NO}
+
+    def to_representation(self, value):
+        return SIGN_YES if value else SIGN_NO
 
 
 class ODSSerializer(serializers.ModelSerializer):
@@ -39,6 +56,9 @@ class WorkPerformedTypeSerializer(serializers.ModelSerializer):
 
 class DefectSerializer(serializers.ModelSerializer):
     work_performed_types = WorkPerformedTypeSerializer(read_only=True, many=True)
+    sign_return_for_revision = SignField(read_only=True)
+    urgency_category_name = serializers.CharField(source='urgency_category.name', read_only=True)
+    urgency_category_code = serializers.CharField(source='urgency_category.code', read_only=True)
 
     class Meta:
         model = Defect
@@ -110,6 +130,10 @@ class ClosingResultSerializer(serializers.ModelSerializer):
     marm_implementing_organization = MarmImplementingOrganizationSerializer()
     review = ReviewSerializer()
     refinement = RefinementSerializer()
+    effectiveness = serializers.CharField(source='efficiency.name', read_only=True)
+    efficiency_code = serializers.CharField(source='efficiency.code', read_only=True)
+    being_under_revision_sign = SignField()
+    sign_alerted = SignField()
 
     class Meta:
         model = ClosingResult
@@ -124,6 +148,20 @@ class RequestSerializer(serializers.ModelSerializer):
     defect = DefectSerializer()
     user = UserSerializer()
     closing_result = ClosingResultSerializer()
+    # Источник и категория платности выбираются по наименованию из существующих записей справочников,
+    # статус задаётся представлением при сохранении
+    source_name = serializers.SlugRelatedField(
+        source='source', slug_field='name', queryset=RequestSource.objects.all(),
+        error_messages={'does_not_exist': 'Неизвестный источник поступления: {value}'})
+    source_code = serializers.CharField(source='source.code', read_only=True)
+    status_name = serializers.CharField(source='status.name', read_only=True)
+    status_code = serializers.CharField(source='status.code', read_only=True)
+    payment_category_name = serializers.SlugRelatedField(
+        source='payment_category', slug_field='name', queryset=PaymentCategory.objects.all(),
+        error_messages={'does_not_exist': 'Неизвестная категория платности: {value}'})
+    payment_category_code = serializers.CharField(source='payment_category.code', read_only=True)
+    incident_sign = SignField(required=False)
+    card_payment_sign = SignField(required=False)
 
     class Meta:
         model = Request
@@ -133,3 +171,57 @@ class RequestSerializer(serializers.ModelSerializer):
                   'apartment', 'implementing_organization', 'status_name', 'status_code', 'desired_time_from',
                   'desired_time_before', 'payment_category_name', 'payment_category_code', 'card_payment_sign',
                   'defect', 'user', 'closing_result')
+        # Корневой ИД и номер выдаются представлением при создании заявки
+        read_only_fields = ('root_id', 'number')
+
+
+class SecondsField(serializers.DurationField):
+    """
+    Интервал времени целым числом секунд (отрицательным для прошедших сроков)
+    """
+
+    def to_representation(self, value):
+        return int(value.total_seconds())
+
+
+class RequestSLASerializer(RequestSerializer):
+    """
+    Заявка со сроком выполнения и остатком времени до него в секундах (аннотации backend.sla.annotate_sla)
+    """
+    sla_deadline = serializers.DateTimeField(read_only=True)
+    sla_remaining = SecondsField(read_only=True)
+
+    class Meta(RequestSerializer.Meta):
+        fields = RequestSerializer.Meta.fields + ('sla_deadline', 'sla_remaining')
+
+
+class OpenRequestRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OpenRequestRollup
+        fields = ('dimension', 'key', 'open_count', 'updated_at')
+
+
+class RequestFlowSerializer(serializers.Serializer):
+    """
+    Интервал потока заявок (строка backend.flows.request_flow_series)
+    """
+    bucket_start = serializers.DateTimeField(source='bucket')
+    key = serializers.CharField()
+    count = serializers.IntegerField(source='requests')
+
+
+class ContractorScorecardSerializer(serializers.Serializer):
+    """
+    Показатели организации-исполнителя (строка backend.scorecards.contractor_scorecards)
+    """
+    identifier = serializers.IntegerField()
+    name = serializers.CharField()
+    month = serializers.DateField(format='%Y-%m')
+    closed_count = serializers.IntegerField()
+    review_count = serializers.IntegerField()
+    average_quality = serializers.FloatField()
+    average_return_count = serializers.FloatField()
+    revision_share = serializers.FloatField()
+
+
+CompiledRequestSerializer = compile_serializer(RequestSerializer)
@@ -0,0 +1,90 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from backend.models import Address, ODS, Defect, WorkPerformedType, ImplementingOrganization, User, Request, \
+    ClosingResult, RequestFlowBucket, RequestStatus
+from backend.flows import adjust_request_flow
+from backend.references import bump_reference_versions, get_dependent_references
+from backend.rollups import adjust_open_request_rollups
+
+
+@receiver(post_save, sender=Address)
+@receiver(post_save, sender=ODS)
+@receiver(post_save, sender=Defect)
+@receiver(post_save, sender=WorkPerformedType)
+@receiver(post_save, sender=ImplementingOrganization)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=Address)
+@receiver(post_delete, sender=ODS)
+@receiver(post_delete, sender=Defect)
+@receiver(post_delete, sender=WorkPerformedType)
+@receiver(post_delete, sender=ImplementingOrganization)
+@receiver(post_delete, sender=User)
+def reference_changed(sender, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login и не меняет справочники
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    bump_reference_versions(get_dependent_references(sender))
+
+
+@receiver(m2m_changed, sender=WorkPerformedType.defects.through)
+def work_performed_type_defects_changed(sender, action, **kwargs):
+    if action in {'post_add', 'post_remove', 'post_clear'}:
+        bump_reference_versions(get_dependent_references(WorkPerformedType))
+
+
+# Счётчики активных заявок: вклад заявки вычитается до изменения и добавляется после, в одной транзакции
+# с записью заявки (Request.save, при удалении - транзакция Collector.delete).
+# bulk_create и update() сигналы не отправляют, там счётчики обновляются явно
+
+@receiver(pre_save, sender=Request)
+def request_rollups_before_save(sender, instance, **kwargs):
+    if instance.pk is not None:
+        adjust_open_request_rollups([instance.pk], -1)
+
+
+@receiver(post_save, sender=Request)
+def request_rollups_after_save(sender, instance, **kwargs):
+    adjust_open_request_rollups([instance.pk], 1)
+
+
+@receiver(pre_delete, sender=Request)
+def request_rollups_before_delete(sender, instance, **kwargs):
+    adjust_open_request_rollups([instance.pk], -1)
+
+
+# Поток заявок: создание учитывается при добавлении заявки, закрытие - при переходе заявки в статус "Закрыта"
+# (или при добавлении результата закрытия уже закрытой заявке) по дате результата закрытия.
+# Сохранение результата закрытия без смены статуса (например, возврат на доработку) поток не меняет
+
+@receiver(pre_save, sender=Request)
+def request_flow_before_save(sender, instance, **kwargs):
+    instance._flow_was_closed = instance.pk is not None and Request.objects.filter(
+        pk=instance.pk, status_id=RequestStatus.CLOSED).exists()
+    if instance._flow_was_closed and instance.status_id != RequestStatus.CLOSED:
+        # Заявка открывается снова: закрытие вычитается, пока в БД прежний статус
+        adjust_request_flow(RequestFlowBucket.CLOSED, [instance.pk], -1)
+
+
+@receiver(post_save, sender=Request)
+def request_flow_after_save(sender, instance, created, **kwargs):
+    if created:
+        adjust_request_flow(RequestFlowBucket.CREATED, [instance.pk], 1)
+    elif instance.status_id == RequestStatus.CLOSED and not instance._flow_was_closed:
+        adjust_request_flow(RequestFlowBucket.CLOSED, [instance.pk], 1)
+
+
+@receiver(pre_delete, sender=Request)
+def request_flow_before_delete(sender, instance, **kwargs):
+    adjust_request_flow(RequestFlowBucket.CREATED, [instance.pk], -1)
+
+
+@receiver(post_save, sender=ClosingResult)
+def closing_flow_after_save(sender, instance, created, **kwargs):
+    if created:
+        adjust_request_flow(RequestFlowBucket.CLOSED, [instance.request_id], 1)
+
+
+@receiver(pre_delete, sender=ClosingResult)
+def closing_flow_before_delete(sender, instance, **kwargs):
+    adjust_request_flow(RequestFlowBucket.CLOSED, [instance.request_id], -1)
@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Value, Case, When, DateTimeField, DurationField, ExpressionWrapper
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from backend.models import ACTIVE_STATUS_IDS
+
+# Категория срочности, для которой срок считается в часах
+EMERGENCY_URGENCY_CATEGORY = 'Аварийная'
+
+
+def sla_term():
+    """
+    Нормативный срок выполнения заявки как SQL-выражение (interval)
+    """
+    days = ExpressionWrapper(Coalesce(F('defect__another_term'), Value(settings.SLA_DEFAULT_TERM_DAYS))
+                             * Value(timedelta(days=1)), output_field=DurationField())
+    return Case(When(defect__urgency_category__name=EMERGENCY_URGENCY_CATEGORY,
+                     then=Value(timedelta(hours=settings.SLA_EMERGENCY_TERM_HOURS))),
+                default=days, output_field=DurationField())
+
+
+def annotate_sla(queryset, now=None):
+    """
+    Аннотация заявок сроком выполнения (sla_deadline) и остатком времени до него (sla_remaining,
+    отрицательный у просроченных). Считается в SQL для всей выборки, без загрузки заявок в Python.
+    """
+    if now is None:
+        now = timezone.now()
+    return queryset \
+        .annotate(sla_deadline=ExpressionWrapper(F('created_at') + sla_term(), output_field=DateTimeField())) \
+        .annotate(sla_remaining=ExpressionWrapper(F('sla_deadline') - Value(now), output_field=DurationField()))
+
+
+def overdue_requests(queryset, warning=None, now=None):
+    """
+    Активные заявки, срок которых истёк или истекает в ближайшие warning (по умолчанию SLA_WARNING_HOURS).
+
+    Условие на статус совпадает с условием частичного индекса request_active_created_idx, поэтому
+    читаются только активные заявки, а не вся таблица.
+    """
+    if now is None:
+        now = timezone.now()
+    if warning is None:
+        warning = timedelta(hours=settings.SLA_WARNING_HOURS)
+    return annotate_sla(queryset.filter(status__in=ACTIVE_STATUS_IDS), now) \
+        .filter(sla_deadline__lte=now + warning)
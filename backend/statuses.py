@@ -0,0 +1,24 @@
+from django.db import connection
+from django.utils import timezone
+
+from backend.models import Request, STATUS_TRANSITIONS
+
+
+def transition_request_statuses(root_ids, status_id):
+    """
+    Перевод заявок root_ids в статус status_id одним UPDATE ... RETURNING.
+
+    Допустимость перехода проверяется условием на текущий статус в том же запросе, поэтому заявки, статус
+    которых успел измениться, не затрагиваются. updated_at проставляется явно, как и в mark_incident_parents.
+    Возвращает root_id изменённых заявок.
+    Переходы идут только между активными статусами, поэтому счётчики активных заявок (backend.rollups) не меняются.
+    """
+    allowed = STATUS_TRANSITIONS.get(status_id)
+    if not allowed or not root_ids:
+        return []
+    table = connection.ops.quote_name(Request._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'UPDATE {table} SET status_id = %s, updated_at = %s '
+                       f'WHERE root_id = ANY(%s) AND status_id = ANY(%s) RETURNING root_id',
+                       [status_id, timezone.now(), list(root_ids), list(allowed)])
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,68 @@
+import json
+
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+# Размер пачки строк, читаемой из серверного курсора (и дозагружаемой prefetch_related)
+STREAM_CHUNK_SIZE = 2000
+
+
+def iterate_queryset(queryset, chunk_size=STREAM_CHUNK_SIZE, hold=False):
+    """
+    Обход queryset через именованный (серверный) курсор Postgres.
+
+    Строки читаются пачками по chunk_size, prefetch_related выполняется для каждой пачки отдельно.
+    Обход идёт внутри транзакции, чтобы курсор не объявлялся WITH HOLD и не материализовался целиком.
+    При hold=True обход идёт вне транзакции: курсор WITH HOLD материализуется при объявлении, зато между
+    пачками можно фиксировать изменения в отдельных коротких транзакциях.
+    """
+    if hold:
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+    with transaction.atomic():
+        yield from queryset.iterator(chunk_size=chunk_size)
+
+
+def dump_json(data):
+    """
+    Сериализация в JSON с теми же параметрами, что и у JSONRenderer
+    """
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def iterate_ndjson(queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Построчная выгрузка объектов в формате NDJSON, по одной пачке строк за раз
+    """
+    buffer = []
+    for obj in iterate_queryset(queryset, chunk_size):
+        buffer.append(dump_json(serializer_class(obj).data))
+        if len(buffer) >= chunk_size:
+            yield '\n'.join(buffer) + '\n'
+            buffer = []
+    if buffer:
+        yield '\n'.join(buffer) + '\n'
+
+
+def iterate_json_array(queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Выгрузка объектов единым JSON-массивом, формируемым по мере чтения курсора
+    """
+    yield '['
+    separator = ''
+    for lines in iterate_ndjson(queryset, serializer_class, chunk_size):
+        yield separator + lines.rstrip('\n').replace('\n', ',')
+        separator = ','
+    yield ']'
+
+
+def streaming_response(queryset, serializer_class, stream_format='ndjson', chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Потоковый ответ со всеми объектами queryset: память не растёт с размером таблицы
+    """
+    if stream_format == 'json':
+        return StreamingHttpResponse(iterate_json_array(queryset, serializer_class, chunk_size),
+                                     content_type='application/json')
+    return StreamingHttpResponse(iterate_ndjson(queryset, serializer_class, chunk_size),
+                                 content_type='application/x-ndjson')
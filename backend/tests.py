@@ -1,3 +1,906 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+from base64 import b64decode, b64encode
+from datetime import date, datetime, time, timedelta
+from itertools import combinations
+from unittest import mock, skipIf
+from time import monotonic, sleep
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection, IntegrityError
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from backend.allocators import REQUEST_ID_SEQUENCE, SequenceAllocator, allocate_request_numbers
+from backend.autocomplete import AddressPrefixIndex, AddressPrefixIndexHolder, address_suggestions_from_db
+from backend.cache import reference_cache
+from backend.exports import CSV_DELIMITER, EXPORT_COLUMNS, Workbook, format_value
+from backend.filters import REQUEST_FILTERS, REQUEST_DATE_FILTERS, filter_requests
+from backend.flows import backfill_request_flow
+from backend.incidents import incident_parent_candidates, incident_parent_exists
+from backend.models import Request, User, RequestStatus, RequestSource, PaymentCategory, ClosingResult, \
+    Efficiency, RequestFlowBucket, OpenRequestRollup, Address, RequestNumberCounter
+from backend.pagination import RequestCursorPagination, RequestSearchCursorPagination
+from backend.rollups import reconcile_open_request_rollups
+from backend.search import search_requests
+from backend.seeding import seed_references, seed_requests
+from backend.serializers import RequestSerializer
+from backend.sla import overdue_requests
+from backend.views import REQUESTS_QUERYSET, RequestsViewSet, ActiveRequestsViewSet, NewRequestsViewSet, \
+    PendingProcessingRequestsViewSet, InProgressRequestsViewSet, ClosedRequestsViewSet, AddRequestToIncidentViewSet
+
+
+# Частичные индексы заявок: их условие отбирает строки и без условия по полям индекса
+PARTIAL_INDEXES = {index.name for index in Request._meta.indexes if index.condition is not None}
+
+
+def find_seq_scans(plan, table=Request._meta.db_table):
+    """
+    Узлы плана EXPLAIN (FORMAT JSON), включая подпланы, которые читают таблицу table целиком: Seq Scan,
+    а также чтение полного индекса без условия по нему, при котором строки отбираются только фильтром
+    (так планировщик обходит таблицу при запрещённом последовательном чтении)
+    """
+    nodes = []
+    if plan.get('Relation Name') == table and (
+            plan.get('Node Type') == 'Seq Scan'
+            or 'Filter' in plan and not {'Index Cond', 'Recheck Cond'} & plan.keys()
+            and plan.get('Index Name') not in PARTIAL_INDEXES):
+        nodes.append(plan)
+    for child in plan.get('Plans', ()):
+        nodes.extend(find_seq_scans(child, table))
+    return nodes
+
+
+def sample_filter_params(sample):
+    """
+    Значения параметров отбора (backend.filters) по заявке sample: параметр или период -> параметры запроса
+    """
+    created = timezone.localdate(sample.created_at)
+    period = {'_from': str(created - timedelta(days=30)), '_to': str(created)}
+    params = {
+        'district_code': str(sample.address.district_code),
+        'country_code': str(sample.address.country_code),
+        'ods': sample.address.ods.number,
+        'management_company': sample.address.management_company,
+        'defect_category': sample.defect.category_name,
+        'urgency_category': sample.defect.urgency_category.name,
+        'implementing_organization': str(sample.implementing_organization.identifier),
+        'source': sample.source.name,
+        'status_name': sample.status.name,
+        'incident_sign': 'Да',
+    }
+    assert set(params) == set(REQUEST_FILTERS), 'Не для всех параметров отбора заданы значения'
+    groups = {name: {name: value} for name, value in params.items()}
+    groups.update({prefix: {f'{prefix}{suffix}': value for suffix, value in period.items()}
+                   for prefix in REQUEST_DATE_FILTERS})
+    return groups
+
+
+class ApiTestCase(TestCase):
+    """
+    Базовый класс для тестов API от имени авторизованного пользователя
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='dispatcher', first_name='Иван', last_name='Иванов')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+def run_workers(workers, work):
+    """
+    Параллельный вызов work() в workers потоках (каждый со своим соединением с БД): списки результатов потоков
+    """
+    results = [None] * workers
+    errors = []
+    barrier = threading.Barrier(workers)
+
+    def run(index):
+        try:
+            barrier.wait()
+            results[index] = work()
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+class ReadOnlyRequestListsTests(ApiTestCase):
+    """
+    Списки просроченных заявок и результатов поиска доступны только для чтения
+    """
+    READ_ONLY_PATHS = ('overdue', 'search')
+
+    def test_write_methods_not_allowed(self):
+        for path in self.READ_ONLY_PATHS:
+            for method in ('post', 'put', 'patch', 'delete'):
+                url = f'/api/v1/requests/{path}/' if method == 'post' else f'/api/v1/requests/{path}/1/'
+                with self.subTest(path=path, method=method):
+                    response = getattr(self.client, method)(url, {}, format='json')
+                    self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class OverdueConditionalGetTests(ApiTestCase):
+    """
+    Условные GET-запросы к списку просроченных заявок учитывают время расчёта остатка срока
+    """
+    URL = '/api/v1/requests/overdue/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        seed_requests(20)
+
+    def get(self, now, **headers):
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            return self.client.get(self.URL, **headers)
+
+    def test_not_modified_within_step(self):
+        now = timezone.now().replace(second=0, microsecond=0)
+        response = self.get(now)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['results'])
+        response = self.get(now + timedelta(seconds=30), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_modified_after_step(self):
+        now = timezone.now().replace(second=0, microsecond=0)
+        first = self.get(now)
+        second = self.get(now + timedelta(seconds=90), HTTP_IF_NONE_MATCH=first['ETag'],
+                          HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(first.data['results'][0]['sla_remaining'] - second.data['results'][0]['sla_remaining'], 60)
+
+
+class RequestExportTests(ApiTestCase):
+    """
+    Выгрузка заявок: текст, похожий на формулу, выгружается как текст
+    """
+    FORMULAS = ('=HYPERLINK("http://example.com")', '+7 (495) 000-00-00', '-1+1', '@SUM(A1)', '\t=1', '\r=1')
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        seed_requests(len(cls.FORMULAS))
+        for request, formula in zip(Request.objects.order_by('root_id'), cls.FORMULAS):
+            Request.objects.filter(pk=request.pk).update(description=formula)
+
+    def test_format_value(self):
+        for formula in self.FORMULAS:
+            with self.subTest(formula=formula):
+                self.assertEqual(format_value(formula), f"'{formula}")
+        self.assertEqual(format_value('Протечка = 2 м'), 'Протечка = 2 м')
+        self.assertEqual(format_value(-1), -1)
+
+    def test_csv(self):
+        response = self.client.get('/api/v1/requests/all/export/', {'file_format': 'csv'})
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(content, newline=''), delimiter=CSV_DELIMITER))
+        column = rows[0].index('Описание')
+        self.assertEqual(sorted(row[column] for row in rows[1:]), sorted(f"'{formula}" for formula in self.FORMULAS))
+
+    def test_command_filters(self):
+        request = Request.objects.select_related('address', 'source').first()
+        params = {'district_code': str(request.address.district_code), 'source': request.source.name}
+        expected = filter_requests(Request.objects.all(), params).count()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'requests.csv')
+            call_command('export_requests', path, '--district-code', params['district_code'],
+                         '--source', params['source'], stdout=io.StringIO())
+            with open(path, encoding='utf-8-sig', newline='') as file:
+                rows = list(csv.reader(file, delimiter=CSV_DELIMITER))
+        self.assertEqual(len(rows) - 1, expected)
+
+    @skipIf(Workbook is None, 'Не установлен openpyxl')
+    def test_xlsx(self):
+        from openpyxl import load_workbook
+
+        response = self.client.get('/api/v1/requests/all/export/', {'file_format': 'xlsx'})
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        column = [title for _, title in EXPORT_COLUMNS].index('Описание') + 1
+        cells = [row[0] for row in sheet.iter_rows(min_row=2, min_col=column, max_col=column)]
+        self.assertEqual(len(cells), len(self.FORMULAS))
+        for cell in cells:
+            self.assertEqual(cell.data_type, 's')
+            self.assertTrue(cell.value.startswith("'"), cell.value)
+
+
+class ClosingFlowTests(ApiTestCase):
+    """
+    Закрытия в потоке заявок учитываются только при переходе заявки в статус "Закрыта"
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        seed_requests(10)
+        cls.request = Request.objects.filter(status=RequestStatus.IN_PROGRESS, incident_sign=False,
+                                             parent_application_root_id__isnull=True,
+                                             defect__urgency_category__name='Обычная').first()
+        cls.efficiency = Efficiency.resolve('Выполнено', 'done')
+
+    def closed_counts(self):
+        return dict(RequestFlowBucket.objects.filter(event=RequestFlowBucket.CLOSED).values('dimension')
+                    .annotate(total=Sum('count')).filter(total__gt=0).values_list('dimension', 'total'))
+
+    def set_status(self, status_id):
+        self.request.refresh_from_db()
+        self.request.status_id = status_id
+        self.request.save()
+
+    def test_closed_on_status_transition(self):
+        closing_result = ClosingResult.objects.create(request=self.request, efficiency=self.efficiency)
+        self.assertEqual(self.closed_counts(), {})
+
+        self.set_status(RequestStatus.CLOSED)
+        closed = {dimension: 1 for dimension, _ in RequestFlowBucket.DIMENSIONS}
+        self.assertEqual(self.closed_counts(), closed)
+        # Повторное сохранение закрытой заявки и результата закрытия закрытие не добавляет
+        self.set_status(RequestStatus.CLOSED)
+        closing_result.consumed_material = 'Герметик'
+        closing_result.save()
+        self.assertEqual(self.closed_counts(), closed)
+
+        closing_date = closing_result.closing_date
+        self.set_status(RequestStatus.NEW)
+        self.assertEqual(self.closed_counts(), {})
+        self.set_status(RequestStatus.CLOSED)
+        self.assertEqual(self.closed_counts(), closed)
+        closing_result.refresh_from_db()
+        self.assertEqual(closing_result.closing_date, closing_date)
+
+    def test_closing_result_of_closed_request(self):
+        self.set_status(RequestStatus.CLOSED)
+        self.assertEqual(self.closed_counts(), {})
+        closing_result = ClosingResult.objects.create(request=self.request, efficiency=self.efficiency)
+        self.assertEqual(self.closed_counts(), {dimension: 1 for dimension, _ in RequestFlowBucket.DIMENSIONS})
+        closing_result.delete()
+        self.assertEqual(self.closed_counts(), {})
+
+    def test_refinement_is_not_closure(self):
+        self.set_status(RequestStatus.CLOSED)
+        closing_result = ClosingResult.objects.create(request=self.request, efficiency=self.efficiency)
+        Request.objects.filter(pk=self.request.pk).update(updated_at=timezone.now())
+        buckets = list(RequestFlowBucket.objects.values_list('event', 'dimension', 'bucket_start', 'key', 'count'))
+
+        response = self.client.put(f'/api/v1/requests/refinement/{self.request.root_id}/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        closing_result.refresh_from_db()
+        self.assertTrue(closing_result.being_under_revision_sign)
+        self.assertEqual(list(RequestFlowBucket.objects.values_list('event', 'dimension', 'bucket_start', 'key',
+                                                                    'count')), buckets)
+
+    def test_matches_backfill(self):
+        ClosingResult.objects.create(request=self.request, efficiency=self.efficiency)
+        self.set_status(RequestStatus.CLOSED)
+        self.set_status(RequestStatus.NEW)
+        self.set_status(RequestStatus.CLOSED)
+        counts = self.closed_counts()
+        start = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=1), time.min))
+        backfill_request_flow(start, start + timedelta(days=2))
+        self.assertEqual(self.closed_counts(), counts)
+
+
+class CursorPaginationTestCase(ApiTestCase):
+    """
+    Базовый класс для тестов курсорной пагинации: обход страниц по ссылкам next и обратно по previous
+    """
+
+    def get_page(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Позиция курсора - пара значений, без смещения (OFFSET)
+        for link in (response.data['next'], response.data['previous']):
+            if link is not None:
+                cursor = b64decode(parse_qs(urlparse(link).query)['cursor'][0]).decode()
+                self.assertNotIn('o', parse_qs(cursor))
+        return response.data
+
+    def assert_pages(self, url, params, expected_root_ids, page_count):
+        page = self.get_page(url, {**params, 'page_size': 2, 'fields': 'root_id'})
+        pages = [page]
+        while page['next'] is not None:
+            page = self.get_page(page['next'])
+            pages.append(page)
+        self.assertEqual(len(pages), page_count)
+        self.assertEqual([row['root_id'] for page in pages for row in page['results']], expected_root_ids)
+
+        # Обратно по ссылкам previous - те же страницы
+        previous = pages[-1]
+        for expected in reversed(pages[:-1]):
+            previous = self.get_page(previous['previous'])
+            self.assertEqual(previous['results'], expected['results'])
+        self.assertIsNone(previous['previous'])
+
+
+class RequestListPaginationTests(CursorPaginationTestCase):
+    """
+    Постраничные списки заявок при одинаковой дате создания: позиция курсора - пара (created_at, root_id)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        seed_requests(7)
+        # Две группы заявок с одинаковой датой создания, граница групп и страниц не совпадает
+        created_at = timezone.make_aware(datetime(2024, 3, 1, 12, 0, 0, 123456))
+        root_ids = sorted(Request.objects.values_list('root_id', flat=True))
+        Request.objects.filter(root_id__in=root_ids[:3]).update(created_at=created_at)
+        Request.objects.filter(root_id__in=root_ids[3:]).update(created_at=created_at + timedelta(microseconds=1))
+
+    def test_pages_with_equal_created_at(self):
+        expected = list(Request.objects.order_by('-created_at', '-root_id').values_list('root_id', flat=True))
+        self.assertEqual(expected, sorted(expected, reverse=True))
+        self.assert_pages('/api/v1/requests/all/', {}, expected, 4)
+
+    def test_position_filter(self):
+        # Условие на позицию - сравнение строк, которое читается по индексу (created_at, root_id)
+        sample = Request.objects.order_by('created_at', 'root_id')[1]
+        queryset = Request.objects.filter(
+            RequestCursorPagination().get_position_filter((sample.created_at, sample.root_id), False))
+        self.assertIn('("backend_request"."created_at", "backend_request"."root_id") <', str(queryset.query))
+        self.assertEqual(list(queryset.values_list('root_id', flat=True)),
+                         list(Request.objects.order_by('created_at', 'root_id')[:1].values_list('root_id', flat=True)))
+
+
+class RequestSearchPaginationTests(CursorPaginationTestCase):
+    """
+    Постраничный поиск при одинаковой релевантности: позиция курсора - пара (rank, root_id), без смещения
+    """
+    URL = '/api/v1/requests/search/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        seed_requests(7)
+
+    def test_pages_with_equal_rank(self):
+        expected = sorted(Request.objects.values_list('root_id', flat=True), reverse=True)
+        self.assert_pages(self.URL, {'q': 'синтетическая'}, expected, 4)
+
+    def test_invalid_cursor(self):
+        cursor = b64encode(b'p=%5B1.0%5D').decode()
+        response = self.client.get(self.URL, {'q': 'синтетическая', 'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RequestLookupValidationTests(ApiTestCase):
+    """
+    Источник поступления и категория платности новой заявки выбираются из справочников, а не создаются
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.addresses, cls.defects, _, _ = seed_references(addresses=10, defects=10)
+        RequestSource.resolve('Портал', 'portal')
+        PaymentCategory.resolve('Бесплатная', 'free')
+
+    def create_request(self, **values):
+        data = {'description': 'Протечка', 'defect': {'name': self.defects[0].name}, **values}
+        return self.client.post('/api/v1/requests/all/', data, format='json')
+
+    def assert_lookups_unchanged(self):
+        self.assertEqual(list(RequestSource.objects.values_list('name', flat=True)), ['Портал'])
+        self.assertEqual(list(PaymentCategory.objects.values_list('name', flat=True)), ['Бесплатная'])
+
+    def test_missing_lookup_names(self):
+        response = self.create_request()
+        self.assertIn('source_name', response.data)
+        self.assertIn('payment_category_name', response.data)
+        self.assert_lookups_unchanged()
+
+    def test_unknown_lookup_names(self):
+        for value in ('Голубиная почта', 'x' * 100, None):
+            with self.subTest(value=value):
+                response = self.create_request(source_name=value, payment_category_name=value)
+                self.assertIn('source_name', response.data)
+                self.assertIn('payment_category_name', response.data)
+        self.assert_lookups_unchanged()
+
+    def test_invalid_request_keeps_numbering(self):
+        # Номер выдаётся только после проверки заявки: ошибка не оставляет пропуска в номерах года
+        counters = list(RequestNumberCounter.objects.values_list('year', 'last_number'))
+        response = self.create_request(source_name='Голубиная почта', payment_category_name='Бесплатная')
+        self.assertIn('source_name', response.data)
+        self.assertNotIn('root_id', response.data)
+        self.assertNotIn('number', response.data)
+        self.assertEqual(list(RequestNumberCounter.objects.values_list('year', 'last_number')), counters)
+        self.assertFalse(Request.objects.exists())
+
+    def test_known_lookup_names_are_valid(self):
+        serializer = RequestSerializer(data={'source_name': 'Портал', 'payment_category_name': 'Бесплатная'},
+                                       partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data['source'].code, 'portal')
+        self.assertEqual(serializer.validated_data['payment_category'].code, 'free')
+
+    def test_bulk_unknown_source(self):
+        record = {'unom': self.addresses[0].unom, 'defect_identifier': self.defects[0].identifier,
+                  'unique_public_services_appeal_number': 'bulk-1', 'creator_name': 'Оператор',
+                  'description': 'Протечка', 'source_name': 'Голубиная почта', 'payment_category_name': 'Бесплатная'}
+        response = self.client.post('/api/v1/requests/all/bulk/', [record], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Голубиная почта', response.data['results'][0]['errors'])
+        self.assert_lookups_unchanged()
+
+
+class RequestBulkCreateTests(ApiTestCase):
+    """
+    Создание массива заявок (/requests/all/bulk/)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.addresses, cls.defects, cls.other_user, _ = seed_references(addresses=10, defects=10)
+        RequestSource.resolve('Портал', 'portal')
+        PaymentCategory.resolve('Бесплатная', 'free')
+
+    def record(self, index, **values):
+        return {'unom': self.addresses[index].unom, 'defect_identifier': self.defects[index].identifier,
+                'unique_public_services_appeal_number': f'bulk-{index}', 'creator_name': 'Оператор',
+                'description': 'Протечка', 'source_name': 'Портал', 'payment_category_name': 'Бесплатная', **values}
+
+    def post(self, records):
+        return self.client.post('/api/v1/requests/all/bulk/', records, format='json')
+
+    def test_created(self):
+        started = timezone.now()
+        # Поля, которые задаёт сервер, из записей не берутся
+        server_fields = {'username': self.other_user.username, 'created_at': '2020-01-01T00:00:00',
+                         'status_name': 'Закрыта', 'incident_sign': 'Да', 'parent_application_root_id': 1,
+                         'parent_application_number': '1/20'}
+        response = self.post([self.record(0, **server_fields), self.record(1)])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 0))
+        self.assertEqual([result['index'] for result in response.data['results']], [0, 1])
+        for result in response.data['results']:
+            request = Request.objects.get(root_id=result['root_id'])
+            self.assertEqual(request.number, result['number'])
+            self.assertEqual(request.user, self.user)
+            self.assertEqual(request.status_id, RequestStatus.NEW)
+            self.assertGreaterEqual(request.created_at, started)
+            self.assertFalse(request.incident_sign)
+            self.assertIsNone(request.parent_application_root_id)
+            self.assertFalse(request.parent_application_number)
+
+    def test_partially_created(self):
+        response = self.post([self.record(0), self.record(1, unom=1)])
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 1))
+        created, failed = response.data['results']
+        self.assertTrue(Request.objects.filter(root_id=created['root_id']).exists())
+        self.assertEqual(failed['index'], 1)
+        self.assertIn('unom=1', failed['errors'])
+        self.assertEqual(Request.objects.count(), 1)
+
+    def test_conflict(self):
+        with mock.patch.object(Request.objects, 'bulk_create', side_effect=IntegrityError('duplicate key')):
+            response = self.post([self.record(0)])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(response.data['Status'])
+        self.assertFalse(Request.objects.exists())
+
+
+class RequestBulkStatusTests(ApiTestCase):
+    """
+    Массовая смена статуса заявок (/requests/all/bulk-status/)
+    """
+    URL = '/api/v1/requests/all/bulk-status/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        seed_requests(3)
+        cls.updated_at = timezone.make_aware(datetime(2024, 3, 1, 12, 0))
+        cls.new, cls.pending, cls.closed = Request.objects.order_by('root_id').values_list('root_id', flat=True)
+        for root_id, status_id in ((cls.new, RequestStatus.NEW), (cls.pending, RequestStatus.PENDING_PROCESSING),
+                                   (cls.closed, RequestStatus.CLOSED)):
+            Request.objects.filter(root_id=root_id).update(status_id=status_id, updated_at=cls.updated_at)
+
+    def test_status_changed(self):
+        unknown = max(self.new, self.pending, self.closed) + 1
+        response = self.client.post(self.URL, {'root_ids': [self.new, self.pending, self.closed, unknown],
+                                               'status_name': 'В работе'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['Status'])
+        self.assertEqual(response.data['updated'], sorted([self.new, self.pending]))
+        # Закрытую заявку перевести в работу нельзя, неизвестная заявка не найдена
+        self.assertEqual(response.data['skipped'], [self.closed, unknown])
+        requests = {request.root_id: request for request in Request.objects.all()}
+        for root_id in (self.new, self.pending):
+            self.assertEqual(requests[root_id].status_id, RequestStatus.IN_PROGRESS)
+            self.assertGreater(requests[root_id].updated_at, self.updated_at)
+        self.assertEqual(requests[self.closed].status_id, RequestStatus.CLOSED)
+        self.assertEqual(requests[self.closed].updated_at, self.updated_at)
+
+    def test_all_changed(self):
+        response = self.client.post(self.URL, {'root_ids': [self.new], 'status_name': 'Ожидает обработки'},
+                                    format='json')
+        self.assertEqual(response.data, {'Status': True, 'updated': [self.new], 'skipped': []})
+
+    def test_invalid_arguments(self):
+        for data in ({'root_ids': [], 'status_name': 'В работе'}, {'root_ids': ['1'], 'status_name': 'В работе'},
+                     {'root_ids': [self.new], 'status_name': 'Закрыта'}):
+            with self.subTest(data=data):
+                response = self.client.post(self.URL, data, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Request.objects.get(root_id=self.new).status_id, RequestStatus.NEW)
+
+
+class RequestFilterTests(ApiTestCase):
+    """
+    Отбор заявок по параметрам backend.filters
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        seed_requests(60)
+        # Даты создания - по суткам подряд начиная с 1 марта, в 23:30 по времени проекта
+        start = timezone.make_aware(datetime(2024, 3, 1, 23, 30))
+        for index, request in enumerate(Request.objects.order_by('root_id')):
+            Request.objects.filter(pk=request.pk).update(created_at=start + timedelta(days=index))
+        cls.requests = list(Request.objects.select_related('address__ods', 'defect__urgency_category', 'source',
+                                                           'status', 'implementing_organization'))
+
+    def assert_filtered(self, params, predicate):
+        expected = {request.pk for request in self.requests if predicate(request)}
+        self.assertTrue(expected, 'Отбор должен находить заявки')
+        self.assertLess(len(expected), len(self.requests), 'Отбор должен отсеивать заявки')
+        self.assertEqual(set(filter_requests(Request.objects.all(), params).values_list('pk', flat=True)), expected)
+
+    def test_each_filter(self):
+        sample = next(request for request in self.requests
+                      if request.implementing_organization is not None and request.status_id != RequestStatus.CLOSED)
+        cases = {
+            'district_code': (sample.address.district_code, lambda r: r.address.district_code),
+            'country_code': (sample.address.country_code, lambda r: r.address.country_code),
+            'ods': (sample.address.ods.number, lambda r: r.address.ods.number),
+            'management_company': (sample.address.management_company, lambda r: r.address.management_company),
+            'defect_category': (sample.defect.category_name, lambda r: r.defect.category_name),
+            'urgency_category': ('Аварийная', lambda r: r.defect.urgency_category.name),
+            'implementing_organization': (sample.implementing_organization.identifier,
+                                          lambda r: getattr(r.implementing_organization, 'identifier', None)),
+            'source': (sample.source.name, lambda r: r.source.name),
+            'status_name': (sample.status.name, lambda r: r.status.name),
+            'incident_sign': ('Да', lambda r: 'Да' if r.incident_sign else 'Нет'),
+        }
+        self.assertEqual(set(cases), set(REQUEST_FILTERS))
+        for name, (value, getter) in cases.items():
+            with self.subTest(name=name):
+                self.assert_filtered({name: str(value)}, lambda request: getter(request) == value)
+
+    def test_multiple_values(self):
+        self.assert_filtered({'district_code': '900, 901'}, lambda request: request.address.district_code in {900, 901})
+        self.assert_filtered({'incident_sign': 'Нет'}, lambda request: not request.incident_sign)
+
+    def test_combined_filters(self):
+        self.assert_filtered({'district_code': '900', 'source': 'Портал'},
+                             lambda request: request.address.district_code == 900 and request.source.name == 'Портал')
+
+    def test_date_period(self):
+        # Границы включительно по времени проекта: заявки за 2-4 марта
+        self.assert_filtered({'created_from': '2024-03-02', 'created_to': '2024-03-04'},
+                             lambda request: date(2024, 3, 2) <= timezone.localdate(request.created_at)
+                             <= date(2024, 3, 4))
+        self.assert_filtered({'created_to': '2024-03-01'},
+                             lambda request: timezone.localdate(request.created_at) == date(2024, 3, 1))
+
+    def test_empty_params_ignored(self):
+        queryset = filter_requests(Request.objects.all(), {'district_code': '', 'created_from': None})
+        self.assertEqual(queryset.count(), len(self.requests))
+
+    def test_invalid_values(self):
+        cases = {
+            'district_code': 'девятьсот',
+            'country_code': '900,x',
+            'implementing_organization': '1.5',
+            'incident_sign': 'Возможно',
+            'created_from': '2024-13-01',
+            'updated_to': 'вчера',
+        }
+        for name, value in cases.items():
+            with self.subTest(name=name):
+                with self.assertRaises(ValidationError) as context:
+                    filter_requests(Request.objects.all(), {name: value})
+                self.assertIn(name, context.exception.detail)
+
+    def test_invalid_value_in_list_response(self):
+        response = self.client.get('/api/v1/requests/all/', {'district_code': 'девятьсот'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'district_code': 'Ожидается код района'})
+
+    def test_list_filtered(self):
+        response = self.client.get('/api/v1/requests/all/', {'district_code': '900', 'fields': 'root_id'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({row['root_id'] for row in response.data['results']},
+                         {request.root_id for request in self.requests if request.address.district_code == 900})
+
+
+class ReferenceDeltaTests(ApiTestCase):
+    """
+    Справочник из внутрипроцессного кеша: дельта относительно версии клиента (?version=)
+    """
+    URL = '/api/v1/defects/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        _, cls.defects, _, _ = seed_references(addresses=1, defects=3)
+
+    def setUp(self):
+        super().setUp()
+        # Версии справочников откатываются вместе с транзакцией теста, снимки прежних тестов не нужны
+        reference_cache.clear()
+        self.addCleanup(reference_cache.clear)
+
+    def get(self, params=None):
+        response = self.client.get(self.URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, json.loads(response.content)
+
+    def test_delta_after_change(self):
+        response, rows = self.get()
+        version = int(response['X-Reference-Version'])
+        self.assertEqual(len(rows), 3)
+        old_row = next(row for row in rows if row['name'] == self.defects[0].name)
+
+        self.defects[0].name = 'Дефект переименованный'
+        self.defects[0].save()
+        response, delta = self.get({'version': version})
+        self.assertEqual(int(response['X-Reference-Version']), version + 1)
+        self.assertEqual(delta['version'], version + 1)
+        self.assertFalse(delta['unchanged'])
+        self.assertEqual(delta['removed'], [old_row])
+        self.assertEqual(delta['added'], [dict(old_row, name='Дефект переименованный')])
+
+        _, delta = self.get({'version': version + 1})
+        self.assertEqual(delta, {'version': version + 1, 'unchanged': True})
+
+    def test_unknown_version(self):
+        # Прежней версии нет в кеше - справочник целиком
+        _, delta = self.get({'version': 100})
+        self.assertFalse(delta['unchanged'])
+        self.assertEqual({row['name'] for row in delta['results']}, {defect.name for defect in self.defects})
+
+
+class AddressAutocompleteTests(ApiTestCase):
+    """
+    Подсказки адресов (backend.autocomplete)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        addresses, _, _, _ = seed_references(addresses=5, defects=1)
+        template = addresses[0]
+        for unom, problem_address in ((910000001, 'ул. Тверская, д. 7'), (910000002, 'ул. Тверская-Ямская, д. 3'),
+                                      (910000003, 'пр. Твер, д. 1')):
+            Address.objects.create(country_name=template.country_name, country_code=template.country_code,
+                                   district_name=template.district_name, district_code=template.district_code,
+                                   problem_address=problem_address, unom=unom, ods=template.ods,
+                                   management_company=template.management_company)
+
+    def test_prefix_suggestions(self):
+        # Начало любого слова адреса, в том числе из одной-двух букв
+        tverskaya = {'ул. Тверская, д. 7', 'ул. Тверская-Ямская, д. 3'}
+        self.assertEqual({row['problem_address'] for row in address_suggestions_from_db('тв', 5)},
+                         tverskaya | {'пр. Твер, д. 1'})
+        self.assertEqual([row['problem_address'] for row in address_suggestions_from_db('Ямс', 5)],
+                         ['ул. Тверская-Ямская, д. 3'])
+        self.assertEqual(address_suggestions_from_db('Я', 5, exclude=[910000002]), [])
+
+    def test_prefix_before_trigram_suggestions(self):
+        # С "Тверс" начинаются слова двух адресов, "пр. Твер" на него только похож по триграммам
+        found = [row['problem_address'] for row in address_suggestions_from_db('Тверс', 5)]
+        self.assertEqual(set(found[:2]), {'ул. Тверская, д. 7', 'ул. Тверская-Ямская, д. 3'})
+        self.assertEqual(found[2:], ['пр. Твер, д. 1'])
+        self.assertEqual(len(address_suggestions_from_db('Тверс', 2)), 2)
+
+    def test_trigram_suggestions(self):
+        # Опечатка в слове адреса: совпадения по началу нет, адрес находится по триграммам
+        found = address_suggestions_from_db('Тверскя', 5)
+        self.assertEqual({row['problem_address'] for row in found}, {'ул. Тверская, д. 7', 'ул. Тверская-Ямская, д. 3'})
+
+    @override_settings(ADDRESS_PREFIX_INDEX_ENABLED=False)
+    def test_autocomplete_api(self):
+        response = self.client.get('/api/v1/addresses/autocomplete/', {'q': 'Тверскя', 'limit': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertIn('Тверская', response.data[0]['problem_address'])
+        response = self.client.get('/api/v1/addresses/autocomplete/', {'q': '91000000'})
+        self.assertEqual([row['unom'] for row in response.data], [910000001, 910000002, 910000003])
+
+    def test_single_rebuild(self):
+        # Пока индекс строится, повторные запросы подсказок не запускают новых потоков перестроения
+        holder = AddressPrefixIndexHolder()
+        started, release = threading.Event(), threading.Event()
+        index = AddressPrefixIndex(None, [])
+
+        def build():
+            started.set()
+            release.wait(5)
+            return index
+
+        with mock.patch.object(AddressPrefixIndex, 'build', side_effect=build) as build_mock, \
+                mock.patch('backend.autocomplete.threading.Thread', wraps=threading.Thread) as thread_mock:
+            for _ in range(5):
+                self.assertIsNone(holder.get_current())
+            self.assertTrue(started.wait(5))
+            holder.rebuild()
+            release.set()
+            deadline = monotonic() + 5
+            while holder._building and monotonic() < deadline:
+                sleep(0.05)
+        self.assertEqual(thread_mock.call_count, 1)
+        self.assertEqual(build_mock.call_count, 1)
+        self.assertIs(holder.index, index)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Планы основных запросов к заявкам (EXPLAIN) на синтетических данных:
+    последовательное чтение таблицы заявок считается регрессией.
+
+    Данных немного, поэтому последовательное чтение запрещается планировщику (enable_seqscan): оно остаётся
+    в плане, только если запрос не может прочитать ни один индекс
+    """
+    ROWS = 500
+    PAGINATED_VIEWSETS = (RequestsViewSet, ActiveRequestsViewSet, NewRequestsViewSet, PendingProcessingRequestsViewSet,
+                          InProgressRequestsViewSet, ClosedRequestsViewSet)
+
+    @classmethod
+    def setUpTestData(cls):
+        requests = seed_requests(cls.ROWS)
+        # Заявка с организацией-исполнителем, чтобы отбор по всем её параметрам находил её
+        cls.sample = Request.objects.select_related('defect__urgency_category', 'address__ods', 'source', 'status',
+                                                    'implementing_organization') \
+            .get(pk=requests[len(requests) // 2 // 15 * 15].pk)
+
+    def setUp(self):
+        # Действует до отката транзакции теста
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assert_no_seq_scan(self, queryset):
+        plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+        self.assertEqual(find_seq_scans(plan), [], f'Последовательное чтение заявок: {json.dumps(plan)}')
+
+    def first_page(self, queryset, pagination_class=RequestCursorPagination):
+        return queryset.order_by(*pagination_class.ordering)[:pagination_class.page_size + 1]
+
+    def test_list_pages(self):
+        for viewset in self.PAGINATED_VIEWSETS:
+            with self.subTest(viewset=viewset.__name__):
+                self.assert_no_seq_scan(self.first_page(viewset.queryset))
+            # Вторая и следующие страницы: условие по позиции курсора
+            with self.subTest(viewset=viewset.__name__, cursor=True):
+                position = RequestCursorPagination().get_position_filter(
+                    (self.sample.created_at, self.sample.root_id), False)
+                self.assert_no_seq_scan(self.first_page(viewset.queryset.filter(position)))
+
+    def test_overdue_requests(self):
+        self.assert_no_seq_scan(self.first_page(overdue_requests(REQUESTS_QUERYSET)))
+
+    def test_search(self):
+        queryset = search_requests(REQUESTS_QUERYSET, 'протечка')
+        self.assert_no_seq_scan(self.first_page(queryset, RequestSearchCursorPagination))
+        # Следующие страницы: условие по паре (rank, root_id)
+        position = RequestSearchCursorPagination().get_position_filter((0.1, self.sample.root_id), False)
+        self.assert_no_seq_scan(self.first_page(queryset.filter(position), RequestSearchCursorPagination))
+
+    def test_incidents(self):
+        self.assert_no_seq_scan(AddRequestToIncidentViewSet.queryset.filter(incident_parent_exists()))
+        self.assert_no_seq_scan(incident_parent_candidates(self.sample.defect.name,
+                                                           self.sample.defect.repeated_location)[:1])
+        self.assert_no_seq_scan(Request.objects.filter(parent_application_root_id=self.sample.root_id))
+
+    def test_request_by_root_id(self):
+        self.assert_no_seq_scan(Request.objects.filter(root_id=self.sample.root_id))
+
+    def test_filters(self):
+        # Каждый параметр отбора и каждая пара параметров
+        groups = sample_filter_params(self.sample)
+        for size in (1, 2):
+            for names in combinations(groups, size):
+                params = {name: value for group in names for name, value in groups[group].items()}
+                with self.subTest(filters=names):
+                    self.assert_no_seq_scan(self.first_page(filter_requests(REQUESTS_QUERYSET, params)))
+
+
+class ConcurrentAllocationTests(TransactionTestCase):
+    """
+    Параллельная выдача идентификаторов и номеров заявок несколькими "процессами" без коллизий
+    """
+    # Справочники, заполненные миграциями (статусы заявок), восстанавливаются после очистки БД
+    serialized_rollback = True
+    WORKERS = 8
+    PER_WORKER = 200
+
+    def test_request_ids_unique(self):
+        for block_size in (1, 10):
+            def work():
+                # Отдельный распределитель на поток - как у отдельного процесса-воркера
+                allocator = SequenceAllocator(REQUEST_ID_SEQUENCE, block_size)
+                return [value for _ in range(self.PER_WORKER) for value in allocator.allocate()]
+
+            with self.subTest(block_size=block_size):
+                ids = [value for values in run_workers(self.WORKERS, work) for value in values]
+                self.assertEqual(len(ids), self.WORKERS * self.PER_WORKER)
+                self.assertEqual(len(set(ids)), len(ids))
+
+    def test_request_numbers_unique(self):
+        numbers = [number for numbers in run_workers(self.WORKERS, lambda: [
+            number for _ in range(self.PER_WORKER // 10) for number in allocate_request_numbers(10, year=2000)])
+            for number in numbers]
+        self.assertEqual(sorted(numbers), sorted(f'{number}/00' for number in range(1, len(numbers) + 1)))
+
+
+class ClusterIncidentsTests(TransactionTestCase):
+    """
+    Пересчёт инцидентов читает заявки вне транзакции и фиксирует каждую пачку изменений отдельно
+    """
+    serialized_rollback = True
+
+    def test_chunks_committed_separately(self):
+        requests = seed_requests(200)
+        # Все заявки по одному адресу: инциденты образуют заявки с одной категорией дефекта
+        Request.objects.update(address=requests[0].address_id, parent_application_root_id=None,
+                               parent_application_number='', incident_sign=False)
+        depths = []
+        bulk_update = Request.objects.bulk_update
+
+        def record_depth(*args, **kwargs):
+            depths.append(len(connection.atomic_blocks))
+            return bulk_update(*args, **kwargs)
+
+        with mock.patch.object(Request.objects, 'bulk_update', side_effect=record_depth):
+            call_command('cluster_incidents', chunk_size=5, window_days=10000, stdout=io.StringIO())
+        self.assertGreater(len(depths), 1)
+        self.assertEqual(set(depths), {1})
+        self.assertTrue(Request.objects.filter(parent_application_root_id__isnull=False).exists())
+
+
+class RequestRollupTransactionTests(TransactionTestCase):
+    """
+    Изменения счётчиков активных заявок откатываются вместе с неудавшимся сохранением заявки
+    """
+    serialized_rollback = True
+
+    def rollups(self):
+        return set(OpenRequestRollup.objects.filter(open_count__gt=0).values_list('dimension', 'key', 'open_count'))
+
+    def test_failed_save_keeps_rollups(self):
+        seed_requests(20)
+        reconcile_open_request_rollups()
+        rollups = self.rollups()
+        request, other = Request.objects.filter(status__in=(RequestStatus.NEW, RequestStatus.IN_PROGRESS))[:2]
+        request.number = other.number
+        with self.assertRaises(IntegrityError):
+            request.save()
+        self.assertEqual(self.rollups(), rollups)
+        self.assertEqual(reconcile_open_request_rollups(), 0)
@@ -4,12 +4,15 @@ from rest_framework.routers import DefaultRouter
 from backend.views import ActiveRequestsViewSet, NewRequestsViewSet, PendingProcessingRequestsViewSet, \
     InProgressRequestsViewSet, ClosedRequestsViewSet, LoginView, RequestsViewSet, RequestsRefinementViewSet, \
     AddressesViewSet, AddRequestToIncidentViewSet, DefectsViewSet, ImplementingOrganizationsViewSet, \
-    WorkPerformedTypesViewSet
+    WorkPerformedTypesViewSet, OverdueRequestsViewSet, OpenRequestRollupsViewSet, RequestFlowViewSet, \
+    ContractorScorecardsViewSet, RequestSearchViewSet
 
 app_name = 'backend'
 
 router = DefaultRouter()
 router.register('work-performed-types', WorkPerformedTypesViewSet, basename='work-performed-types')
+# Регистрируется раньше implementing-organizations, иначе путь совпадёт с карточкой организации
+router.register('implementing-organizations/scorecards', ContractorScorecardsViewSet, basename='scorecards')
 router.register('implementing-organizations', ImplementingOrganizationsViewSet, basename='implementing-organizations')
 router.register('defects', DefectsViewSet, basename='defects')
 router.register('requests/incident', AddRequestToIncidentViewSet, basename='add-request-to-incident')
@@ -17,6 +20,10 @@ router.register('addresses', AddressesViewSet, basename='addresses')
 router.register('requests/refinement', RequestsRefinementViewSet, basename='requests-refinement')
 router.register('requests/all', RequestsViewSet, basename='requests')
 router.register('requests/active', ActiveRequestsViewSet, basename='active-requests')
+router.register('requests/overdue', OverdueRequestsViewSet, basename='overdue-requests')
+router.register('requests/rollups', OpenRequestRollupsViewSet, basename='request-rollups')
+router.register('requests/flow', RequestFlowViewSet, basename='request-flow')
+router.register('requests/search', RequestSearchViewSet, basename='request-search')
 router.register('requests/new', NewRequestsViewSet, basename='new-requests')
 router.register('requests/pending-processing', PendingProcessingRequestsViewSet, basename='pending-processing-requests')
 router.register('requests/in-progress', InProgressRequestsViewSet, basename='in-progress-requests')
@@ -1,20 +1,63 @@
 import pytz
 
+from django.conf import settings
 from django.contrib.auth import authenticate
-from django.contrib.postgres.aggregates import StringAgg
-from django.db.models import Q, Max, CharField
-from django.db.models.functions import Cast
+from django.db import transaction, IntegrityError
 from django.http import JsonResponse, Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import status
 from rest_framework.authtoken.models import Token
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
-from datetime import datetime, timedelta
-
-from backend.models import Request, Refinement, Address, Defect, ImplementingOrganization, WorkPerformedType
-from backend.serializers import RequestSerializer, AddressSerializer, DefectSerializer
+from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet, GenericViewSet
+from datetime import datetime, time, timedelta
+
+from backend.allocators import allocate_request_id, allocate_request_number
+from backend.autocomplete import address_suggestions
+from backend.compiled_serializers import compile_serializer
+from backend.conditional import ConditionalListMixin, CachedReferenceListMixin
+from backend.exports import EXPORT_FORMATS, XLSX_MAX_ROWS, Workbook, export_response
+from backend.filters import RequestFilterBackend, filter_requests, parse_filter_date
+from backend.flows import request_flow_series
+from backend.fieldsets import parse_fieldset, shape_queryset
+from backend.importers import API_COLUMNS, RequestImporter
+from backend.incidents import find_incident_parent, mark_incident_parents, incident_parent_exists
+from backend.models import Request, Refinement, Address, Defect, ImplementingOrganization, WorkPerformedType, \
+    RequestStatus, OpenRequestRollup, RequestFlowBucket, ACTIVE_STATUS_IDS, STATUS_TRANSITIONS
+from backend.pagination import RequestCursorPagination, RequestSearchCursorPagination
+from backend.serializers import RequestSerializer, RequestSLASerializer, AddressSerializer, DefectSerializer, \
+    OpenRequestRollupSerializer, RequestFlowSerializer, ContractorScorecardSerializer
+from backend.scorecards import contractor_scorecards
+from backend.search import search_requests
+from backend.sla import overdue_requests
+from backend.statuses import transition_request_statuses
+from backend.streaming import streaming_response
+
+REQUESTS_QUERYSET = Request.objects \
+    .prefetch_related('defect__work_performed_types',
+                      'defect__work_performed_types__security_events',
+                      'defect__work_performed_types__defects') \
+    .select_related('address__ods',
+                    'implementing_organization',
+                    'defect__urgency_category',
+                    'source',
+                    'status',
+                    'payment_category',
+                    'user__organization',
+                    'user__implementing_organization',
+                    'closing_result',
+                    'closing_result__efficiency',
+                    'closing_result__marm_executor',
+                    'closing_result__marm_implementing_organization',
+                    'closing_result__review',
+                    'closing_result__refinement')
+
+# Наибольшее число заявок в одном запросе на массовое создание
+BULK_CREATE_MAX_ITEMS = 1000
 
 
 class LoginView(APIView):
@@ -31,28 +74,57 @@ class LoginView(APIView):
             return JsonResponse({'Status': False, 'Errors': 'Не указаны все необходимые аргументы'})
 
 
-class RequestsViewSet(ModelViewSet):
+class BaseRequestsViewSet(ConditionalListMixin, ModelViewSet):
     """
-    Класс для работы с заявками
+    Базовый класс для списков заявок с курсорной пагинацией, выбором полей (?fields=, ?expand=)
+    и отбором по району, ОДС, дефекту, исполнителю, источнику, датам и т.д. (backend.filters)
     """
-    queryset = Request.objects\
-        .prefetch_related('defect__work_performed_types', 'defect__work_performed_types__security_events') \
-        .select_related('address__ods',
-                        'implementing_organization',
-                        'defect',
-                        'user__organization',
-                        'user__implementing_organization',
-                        'closing_result',
-                        'closing_result__marm_executor',
-                        'closing_result__marm_implementing_organization',
-                        'closing_result__review',
-                        'closing_result__refinement')
+    queryset = REQUESTS_QUERYSET
     serializer_class = RequestSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = RequestCursorPagination
+    filter_backends = [RequestFilterBackend]
+    # Поля, загружаемые независимо от ?fields= (по ним упорядочивает пагинация)
+    fieldset_extra_fields = ('created_at', 'root_id')
+
+    def is_read_request(self):
+        return self.request is not None and self.request.method in {'GET', 'HEAD'}
+
+    def get_fieldset(self):
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = None
+            if self.is_read_request():
+                self._fieldset = parse_fieldset(self.serializer_class(),
+                                                self.request.query_params.get('fields'),
+                                                self.request.query_params.get('expand'))
+        return self._fieldset
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            queryset = shape_queryset(queryset, self.serializer_class(), fieldset, self.fieldset_extra_fields)
+        return queryset
+
+    def get_serializer_class(self):
+        # Чтение идёт через скомпилированный сериализатор, запись - через обычный
+        if self.is_read_request():
+            return compile_serializer(self.serializer_class, self.get_fieldset())
+        return super().get_serializer_class()
+
+
+class RequestsViewSet(BaseRequestsViewSet):
+    """
+    Класс для работы с заявками
+    """
 
     def list(self, request, *args, **kwargs):
-        serializer = self.get_serializer(self.get_queryset(), many=True)
-        return Response(serializer.data)
+        # Потоковая выгрузка всей таблицы: ?stream=1 (NDJSON) или ?stream=json (JSON-массив)
+        stream_format = request.query_params.get('stream')
+        if stream_format in {'1', 'ndjson', 'json'}:
+            return streaming_response(self.filter_queryset(self.get_queryset()), self.get_serializer_class(),
+                                      stream_format)
+        return super().list(request, *args, **kwargs)
 
     def retrieve(self, request, pk=None, *args, **kwargs):
         try:
@@ -60,7 +132,7 @@ class RequestsViewSet(ModelViewSet):
         except Request.DoesNotExist:
             raise Http404
         serializer = self.get_serializer(request_obj)
-        if request_obj.closing_result.being_under_revision_sign == 'Да':
+        if request_obj.closing_result.being_under_revision_sign:
             current_datetime = datetime.now(pytz.timezone('Europe/Moscow'))
             date = current_datetime - request_obj.created_at
             data = {'total_term': date}
@@ -69,59 +141,121 @@ class RequestsViewSet(ModelViewSet):
         return Response(serializer.data)
 
     def create(self, request, *args, **kwargs):
-        # Генерация корневого ИД заявки
-        max_values = Request.objects.aggregate(Max('root_id'), Max('version_id'))
-        if max_values['root_id__max'] > max_values['version_id__max']:
-            max_val = max_values['root_id__max']
-        else:
-            max_val = max_values['version_id__max']
-        request.data.update({'root_id': max_val + 1})
-
-        # Генерация номера заявки
-        values = Request.objects.aggregate(string_agg=StringAgg(Cast('number', CharField()), delimiter=', '))
-        numbers = values['string_agg'].split(", ")
-        max_number = max(list(map(lambda x: int(x.split("/")[0]), numbers)))
-        current_datetime = datetime.now(pytz.timezone('Europe/Moscow')).year
-        request.data.update({'number': str(max_number) + str(current_datetime)[-2:]})
-
-        # Инцидент
-        defect_name = request.data.get('defect').get('name')
-        repeated_location = request.data.get('defect').get('repeated_location')
-
-        current_datetime = datetime.now(pytz.timezone('Europe/Moscow'))
-        requests = Request.objects.filter(defect__name=defect_name,
-                                          defect__repeated_location=repeated_location)
-        for r in requests:
-            if r.created_at + timedelta(r.defect.another_term) < current_datetime:
-                r.incident_sign = 'Да'
-                request.data.update({'incident_sign': 'Нет',
-                                     'parent_application_root_id': r.root_id,
-                                     'parent_application_number': r.number})
-
-        # Присвоение статуса
-        request.data.update({'status_name': 'Новая', 'status_code': 'new'})
-
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            # Инцидент
+            defect_name = request.data['defect'].get('name')
+            repeated_location = request.data['defect'].get('repeated_location')
+            parent = find_incident_parent(defect_name, repeated_location)
+            incident = {} if parent is None else {'incident_sign': False,
+                                                  'parent_application_root_id': parent['root_id'],
+                                                  'parent_application_number': parent['number']}
+            # Корневой ИД и номер выдаются только проверенной заявке и в одной транзакции с её записью:
+            # при ошибке счётчик номеров года откатывается, и в номерах не остаётся пропусков
+            with transaction.atomic():
+                # Присвоение статуса (источник и категория платности проверены сериализатором)
+                serializer.save(root_id=allocate_request_id(), number=allocate_request_number(),
+                                status_id=RequestStatus.NEW, **incident)
+                if parent is not None:
+                    mark_incident_parents([parent['root_id']])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=False, methods=['get'])
+    def export(self, request, *args, **kwargs):
+        """
+        Выгрузка заявок в файл: ?file_format=csv|xlsx, ?gzip=1 для сжатого CSV,
+        отбор по тем же параметрам, что и в списках заявок (backend.filters)
+        """
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response({'Status': False, 'Errors': f'Допустимые форматы: {", ".join(EXPORT_FORMATS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if file_format == 'xlsx' and Workbook is None:
+            return Response({'Status': False, 'Errors': 'Выгрузка в XLSX недоступна: не установлен openpyxl'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        queryset = filter_requests(Request.objects.all(), request.query_params)
+        if file_format == 'xlsx' and queryset.count() > XLSX_MAX_ROWS:
+            return Response({'Status': False, 'Errors': f'В XLSX помещается не более {XLSX_MAX_ROWS} заявок'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return export_response(queryset, file_format, request.query_params.get('gzip') in {'1', 'true'})
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        """
+        Создание массива заявок одним запросом.
+
+        Заявки передаются в плоском виде, как в import_requests (unom, defect_identifier и т.д.), но принимаются
+        только колонки API_COLUMNS: автор - текущий пользователь, дата создания, статус и привязка к инциденту
+        задаются сервером, источник и категория платности выбираются из справочников.
+        Идентификаторы и номера выдаются на весь массив сразу, материнские заявки подбираются одним запросом,
+        вставка - одним bulk_create. Ошибочные заявки не мешают созданию остальных: результат возвращается
+        по каждому элементу массива.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+            return Response({'Status': False, 'Errors': 'Ожидается непустой массив заявок'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > BULK_CREATE_MAX_ITEMS:
+            return Response({'Status': False, 'Errors': f'Не более {BULK_CREATE_MAX_ITEMS} заявок в одном запросе'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Новые заявки всегда получают статус "Новая" (status_name не передаётся)
+        records = [dict({column: item[column] for column in API_COLUMNS if column in item},
+                        username=request.user.username)
+                   for item in items]
+        try:
+            created, errors = RequestImporter(create_lookups=False).import_batch(records, first_row=0,
+                                                                                 match_incidents=True)
+        except IntegrityError as error:
+            return Response({'Status': False, 'Errors': str(error)}, status=status.HTTP_409_CONFLICT)
+
+        results = [{'index': index, 'root_id': request_obj.root_id, 'number': request_obj.number,
+                    'parent_application_number': request_obj.parent_application_number}
+                   for index, request_obj in created]
+        results += [{'index': index, 'errors': message} for index, message in errors]
+        results.sort(key=lambda result: result['index'])
+        if not errors:
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({'Status': not errors, 'created': len(created), 'failed': len(errors), 'results': results},
+                        status=response_status)
+
+    @action(detail=False, methods=['post'], url_path='bulk-status')
+    def bulk_status(self, request, *args, **kwargs):
+        """
+        Массовая смена статуса: {"root_ids": [...], "status_name": "В работе"}.
+        Заявки, для которых переход недопустим или которых нет, возвращаются в skipped.
+        """
+        root_ids = request.data.get('root_ids')
+        if not isinstance(root_ids, list) or not root_ids or \
+                not all(isinstance(root_id, int) and not isinstance(root_id, bool) for root_id in root_ids):
+            return Response({'Status': False, 'Errors': 'Ожидается непустой список root_ids'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        status_id = RequestStatus.objects.filter(name=request.data.get('status_name'),
+                                                 pk__in=STATUS_TRANSITIONS).values_list('pk', flat=True).first()
+        if status_id is None:
+            allowed = RequestStatus.objects.filter(pk__in=STATUS_TRANSITIONS).values_list('name', flat=True)
+            return Response({'Status': False, 'Errors': f'Допустимые статусы: {", ".join(allowed)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        updated = transition_request_statuses(root_ids, status_id)
+        skipped = sorted(set(root_ids) - set(updated))
+        return Response({'Status': not skipped, 'updated': sorted(updated), 'skipped': skipped})
+
     def update(self, request, pk=None, *args, **kwargs):
         try:
             request_obj = Request.objects.get(root_id=pk)
         except Request.DoesNotExist:
             raise Http404
-        if request_obj.status_name in {'Новая', 'Ожидает обработки', 'В работе'} or \
-                request_obj.defect.urgency_category_name != 'Аварийная':
+        if request_obj.status_id in ACTIVE_STATUS_IDS or \
+                request_obj.defect.urgency_category.name != 'Аварийная':
 
             # Генерация ИД версии заявки
-            max_values = Request.objects.aggregate(Max('root_id'), Max('version_id'))
-            if max_values['root_id__max'] > max_values['version_id__max']:
-                max_val = max_values['root_id__max']
-            else:
-                max_val = max_values['version_id__max']
-            request.data.update({'version_id': max_val + 1})
+            request.data.update({'version_id': allocate_request_id()})
 
             # Отправка пользователя и роли
             request_obj.user = request.user.id
@@ -132,106 +266,89 @@ class RequestsViewSet(ModelViewSet):
             raise Http404
 
 
-class ActiveRequestsViewSet(ModelViewSet):
+class ActiveRequestsViewSet(BaseRequestsViewSet):
     """
     Класс для получения активных заявок
     """
-    queryset = Request.objects.filter(Q(status_name="Новая") |
-                                      Q(status_name="Ожидает обработки") |
-                                      Q(status_name="В работе")) \
-        .prefetch_related('defect__work_performed_types', 'defect__work_performed_types__security_events') \
-        .select_related('address__ods',
-                        'implementing_organization',
-                        'defect',
-                        'user__organization',
-                        'user__implementing_organization',
-                        'closing_result',
-                        'closing_result__marm_executor',
-                        'closing_result__marm_implementing_organization',
-                        'closing_result__review',
-                        'closing_result__refinement')
-    serializer_class = RequestSerializer
-    permission_classes = [IsAuthenticated]
+    queryset = REQUESTS_QUERYSET.filter(status__in=ACTIVE_STATUS_IDS)
 
 
-class NewRequestsViewSet(ModelViewSet):
+class OverdueRequestsViewSet(BaseRequestsViewSet):
+    """
+    Класс для получения активных заявок, срок выполнения которых истёк или истекает
+    в ближайшие ?within_hours= часов (по умолчанию SLA_WARNING_HOURS). Только чтение
+    """
+    http_method_names = ['get', 'head', 'options']
+    queryset = REQUESTS_QUERYSET
+    serializer_class = RequestSLASerializer
+
+    def get_now(self):
+        # Текущее время, округлённое вниз до SLA_CONDITIONAL_GET_SECONDS: от него считаются остаток срока
+        # и состав выборки, поэтому в пределах шага ответ определяется валидаторами списка
+        if not hasattr(self, '_now'):
+            now = timezone.now()
+            self._now = now - timedelta(seconds=now.timestamp() % settings.SLA_CONDITIONAL_GET_SECONDS)
+        return self._now
+
+    def get_queryset(self):
+        warning = None
+        within_hours = self.request.query_params.get('within_hours') if self.request is not None else None
+        if within_hours:
+            try:
+                warning = timedelta(hours=float(within_hours))
+            except (ValueError, OverflowError):
+                raise ValidationError({'within_hours': 'Ожидается число часов'})
+        return overdue_requests(super().get_queryset(), warning, self.get_now())
+
+    def get_list_validators(self):
+        # Остаток срока меняется со временем, поэтому в валидаторы входит и момент расчёта
+        state, last_modified = super().get_list_validators()
+        now = self.get_now()
+        return f'{state}|{now.isoformat()}', now if last_modified is None else max(last_modified, now)
+
+
+class NewRequestsViewSet(BaseRequestsViewSet):
     """
     Класс для получения заявок со стастусом "Новая"
     """
-    queryset = Request.objects.filter(status_name="Новая")\
-        .prefetch_related('defect__work_performed_types', 'defect__work_performed_types__security_events')\
-        .select_related('address__ods',
-                        'implementing_organization',
-                        'defect',
-                        'user__organization',
-                        'user__implementing_organization',
-                        'closing_result',
-                        'closing_result__marm_executor',
-                        'closing_result__marm_implementing_organization',
-                        'closing_result__review',
-                        'closing_result__refinement')
-    serializer_class = RequestSerializer
-    permission_classes = [IsAuthenticated]
+    queryset = REQUESTS_QUERYSET.filter(status=RequestStatus.NEW)
 
 
-class PendingProcessingRequestsViewSet(ModelViewSet):
+class PendingProcessingRequestsViewSet(BaseRequestsViewSet):
     """
     Класс для получения заявок со статусом "Ожидает обработки"
     """
-    queryset = Request.objects.filter(status_name="Ожидает обработки")\
-        .prefetch_related('defect__work_performed_types', 'defect__work_performed_types__security_events')\
-        .select_related('address__ods',
-                        'implementing_organization',
-                        'defect',
-                        'user__organization',
-                        'user__implementing_organization',
-                        'closing_result',
-                        'closing_result__marm_executor',
-                        'closing_result__marm_implementing_organization',
-                        'closing_result__review',
-                        'closing_result__refinement')
-    serializer_class = RequestSerializer
-    permission_classes = [IsAuthenticated]
+    queryset = REQUESTS_QUERYSET.filter(status=RequestStatus.PENDING_PROCESSING)
 
 
-class InProgressRequestsViewSet(ModelViewSet):
+class InProgressRequestsViewSet(BaseRequestsViewSet):
     """
     Класс для получения заявок со статусом "В работе"
     """
-    queryset = Request.objects.filter(status_name="В работе")\
-        .prefetch_related('defect__work_performed_types', 'defect__work_performed_types__security_events')\
-        .select_related('address__ods',
-                        'implementing_organization',
-                        'defect',
-                        'user__organization',
-                        'user__implementing_organization',
-                        'closing_result',
-                        'closing_result__marm_executor',
-                        'closing_result__marm_implementing_organization',
-                        'closing_result__review',
-                        'closing_result__refinement')
-    serializer_class = RequestSerializer
-    permission_classes = [IsAuthenticated]
+    queryset = REQUESTS_QUERYSET.filter(status=RequestStatus.IN_PROGRESS)
 
 
-class ClosedRequestsViewSet(ModelViewSet):
+class ClosedRequestsViewSet(BaseRequestsViewSet):
     """
     Класс для получения заявок со статусом "Закрыта"
     """
-    queryset = Request.objects.filter(status_name="Закрыта")\
-        .prefetch_related('defect__work_performed_types', 'defect__work_performed_types__security_events')\
-        .select_related('address__ods',
-                        'implementing_organization',
-                        'defect',
-                        'user__organization',
-                        'user__implementing_organization',
-                        'closing_result',
-                        'closing_result__marm_executor',
-                        'closing_result__marm_implementing_organization',
-                        'closing_result__review',
-                        'closing_result__refinement')
-    serializer_class = RequestSerializer
-    permission_classes = [IsAuthenticated]
+    queryset = REQUESTS_QUERYSET.filter(status=RequestStatus.CLOSED)
+
+
+class RequestSearchViewSet(BaseRequestsViewSet):
+    """
+    Класс для полнотекстового поиска заявок по описанию, комментариям и вопросу (?q=, с учётом словоформ).
+    Результаты упорядочены по релевантности и отбираются по тем же параметрам, что и списки заявок. Только чтение
+    """
+    http_method_names = ['get', 'head', 'options']
+    pagination_class = RequestSearchCursorPagination
+    fieldset_extra_fields = ('root_id',)
+
+    def get_queryset(self):
+        text = self.request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': 'Не указан текст поиска'})
+        return search_requests(super().get_queryset(), text)
 
 
 class RequestsRefinementViewSet(ModelViewSet):
@@ -251,18 +368,17 @@ class RequestsRefinementViewSet(ModelViewSet):
             difference = current_datetime - request_obj.created_at
         else:
             difference = current_datetime - request_obj.updated_at
-        urgency_category = request_obj.defect.urgency_category_name
+        urgency_category = request_obj.defect.urgency_category.name
         incident_sign = request_obj.incident_sign
         parent_application_root_id = request_obj.parent_application_root_id
         if difference.days >= 5 \
                 or urgency_category == 'Аварийная' \
-                or (incident_sign == 'Нет' and parent_application_root_id is not None) \
-                or incident_sign == 'Да':
+                or (not incident_sign and parent_application_root_id is not None) \
+                or incident_sign:
             raise Http404
-        request_obj.status_name = 'Новая'
-        request_obj.status_code = 'new'
+        request_obj.status_id = RequestStatus.NEW
 
-        request_obj.closing_result.being_under_revision_sign = 'Да'
+        request_obj.closing_result.being_under_revision_sign = True
         request_obj.closing_result.save()
 
         refinement, _ = Refinement.objects.get_or_create(closing_result=request_obj.closing_result)
@@ -273,79 +389,156 @@ class RequestsRefinementViewSet(ModelViewSet):
         return Response(serializer.data)
 
 
-class AddressesViewSet(ReadOnlyModelViewSet):
+class OpenRequestRollupsViewSet(ReadOnlyModelViewSet):
+    """
+    Класс для получения числа активных заявок по районам, ОДС, управляющим компаниям и категориям дефектов
+    из счётчиков, без подсчёта по таблице заявок. Разрез выбирается параметром dimension
+    """
+    queryset = OpenRequestRollup.objects.filter(open_count__gt=0).order_by('dimension', '-open_count', 'key')
+    serializer_class = OpenRequestRollupSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        dimension = self.request.query_params.get('dimension')
+        if dimension:
+            dimensions = dict(OpenRequestRollup.DIMENSIONS)
+            if dimension not in dimensions:
+                raise ValidationError({'dimension': f'Ожидается одно из: {", ".join(dimensions)}'})
+            queryset = queryset.filter(dimension=dimension)
+        return queryset
+
+
+class RequestFlowViewSet(GenericViewSet):
+    """
+    Класс для получения числа созданных или закрытых заявок по часам или суткам из интервалов потока заявок.
+    Параметры: event (created, closed), dimension (source, defect_category, district), granularity (hour, day),
+    date_from и date_to (даты включительно), key (значение разреза)
+    """
+    serializer_class = RequestFlowSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_choice(self, name, choices, default=None):
+        value = self.request.query_params.get(name, default)
+        if value not in dict(choices):
+            raise ValidationError({name: f'Ожидается одно из: {", ".join(dict(choices))}'})
+        return value
+
+    def list(self, request, *args, **kwargs):
+        event = self.get_choice('event', RequestFlowBucket.EVENTS, RequestFlowBucket.CREATED)
+        dimension = self.get_choice('dimension', RequestFlowBucket.DIMENSIONS)
+        granularity = self.get_choice('granularity', RequestFlowBucket.GRANULARITIES, RequestFlowBucket.DAY)
+        if not request.query_params.get('date_from') or not request.query_params.get('date_to'):
+            return Response({'Status': False, 'Errors': 'Не указан период date_from - date_to'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        date_from = parse_filter_date(request.query_params, 'date_from')
+        date_to = parse_filter_date(request.query_params, 'date_to')
+        days = (date_to - date_from).days + 1
+        if granularity == RequestFlowBucket.HOUR and days > settings.REQUEST_FLOW_MAX_HOURLY_DAYS:
+            return Response({'Status': False, 'Errors': f'Почасовой ряд строится не более чем за '
+                                                        f'{settings.REQUEST_FLOW_MAX_HOURLY_DAYS} суток'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Границы периода - полночь по времени проекта
+        start = timezone.make_aware(datetime.combine(date_from, time.min))
+        end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+        series = request_flow_series(event, dimension, granularity, start, end, request.query_params.get('key'))
+        return Response(self.get_serializer(series, many=True).data)
+
+
+class AddressesViewSet(CachedReferenceListMixin, ReadOnlyModelViewSet):
     """
     Класс для получения адресов
     """
+    reference_name = 'addresses'
     queryset = Address.objects.select_related('ods')
     serializer_class = AddressSerializer
     permission_classes = [IsAuthenticated]
 
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request, *args, **kwargs):
+        """
+        Подсказки адресов: ?q= - начало УНОМ, начало слов адреса или похожий текст, ?limit= - число подсказок
+        """
+        limit = request.query_params.get('limit', str(settings.ADDRESS_SUGGEST_LIMIT))
+        if not limit.isdigit() or not 0 < int(limit) <= settings.ADDRESS_SUGGEST_MAX_LIMIT:
+            raise ValidationError({'limit': f'Ожидается число от 1 до {settings.ADDRESS_SUGGEST_MAX_LIMIT}'})
+        return Response(address_suggestions(request.query_params.get('q', ''), int(limit)))
 
-class AddRequestToIncidentViewSet(ModelViewSet):
+
+class AddRequestToIncidentViewSet(BaseRequestsViewSet):
     """
     Класс для добавления заявки в инцидент
     """
-    queryset = Request.objects.filter(Q(status_name="Новая") |
-                                      Q(status_name="Ожидает обработки") |
-                                      Q(status_name="В работе")) \
-        .prefetch_related('defect__work_performed_types', 'defect__work_performed_types__security_events')\
-        .select_related('address__ods',
-                        'implementing_organization',
-                        'defect',
-                        'user__organization',
-                        'user__implementing_organization',
-                        'closing_result',
-                        'closing_result__marm_executor',
-                        'closing_result__marm_implementing_organization',
-                        'closing_result__review',
-                        'closing_result__refinement')
-    serializer_class = RequestSerializer
-    permission_classes = [IsAuthenticated]
+    # Явное условие на родителя позволяет читать только дочерние заявки по индексу request_parent_root_idx
+    queryset = REQUESTS_QUERYSET.filter(status__in=ACTIVE_STATUS_IDS, parent_application_root_id__isnull=False)
 
     def list(self, request, *args, **kwargs):
-        requests_list = []
-        for q in self.get_queryset():
-            if q.parent_application_root_id:
-                parent_request = Request.objects.filter(root_id=q.parent_application_root_id).first()
-                if q.defect.category_name == parent_request.defect.category_name and \
-                        q.address.problem_address == parent_request.address.problem_address:
-                    diff = q.created_at - timedelta(7)
-                    if diff < parent_request.created_at and parent_request.created_at + timedelta(1) < q.created_at:
-                        requests_list.append(q)
-        serializer = self.get_serializer(requests_list, many=True)
+        queryset = self.filter_queryset(self.get_queryset()).filter(incident_parent_exists())
+        serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
 
-class DefectsViewSet(ReadOnlyModelViewSet):
+class DefectsViewSet(CachedReferenceListMixin, ReadOnlyModelViewSet):
     """
     Класс для получения дефектов
     """
+    reference_name = 'defects'
     queryset = Defect.objects.values('category_name', 'name')
     serializer_class = DefectSerializer
     permission_classes = [IsAuthenticated]
 
 
-class ImplementingOrganizationsViewSet(ModelViewSet):
+class ImplementingOrganizationsViewSet(CachedReferenceListMixin, ModelViewSet):
     """
     Класс для получения организаций-исполнителей
     """
     permission_classes = [IsAuthenticated]
+    reference_name = 'implementing-organizations'
+
+    def get_reference_data(self):
+        return ImplementingOrganization.objects.prefetch_related('users').values('name',
+                                                                                 'users__first_name',
+                                                                                 'users__last_name',
+                                                                                 'users__middle_name')
+
+
+class ContractorScorecardsViewSet(GenericViewSet):
+    """
+    Класс для получения рейтинга организаций-исполнителей по отзывам и доработкам.
+    Параметры: month_from и month_to (ГГГГ-ММ), organization (идентификатор организации),
+    by_month=1 - показатели по каждому месяцу. Показатели пересчитываются командой refresh_scorecards
+    """
+    serializer_class = ContractorScorecardSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_month(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            month = parse_date(f'{value}-01')
+        except ValueError:
+            month = None
+        if month is None:
+            raise ValidationError({name: 'Ожидается месяц в формате ГГГГ-ММ'})
+        return month
 
     def list(self, request, *args, **kwargs):
-        queryset = ImplementingOrganization.objects.prefetch_related('users').values('name',
-                                                                                     'users__first_name',
-                                                                                     'users__last_name',
-                                                                                     'users__middle_name')
-        return Response(queryset)
+        organization = request.query_params.get('organization')
+        if organization is not None and not organization.isdigit():
+            raise ValidationError({'organization': 'Ожидается идентификатор организации'})
+        scorecards = contractor_scorecards(self.get_month('month_from'), self.get_month('month_to'),
+                                           int(organization) if organization is not None else None,
+                                           request.query_params.get('by_month') in {'1', 'true'})
+        return Response(self.get_serializer(scorecards, many=True).data)
 
 
-class WorkPerformedTypesViewSet(ReadOnlyModelViewSet):
+class WorkPerformedTypesViewSet(CachedReferenceListMixin, ReadOnlyModelViewSet):
     """
     Класс для получения видов выполненных работ
     """
     permission_classes = [IsAuthenticated]
+    reference_name = 'work-performed-types'
 
-    def list(self, request, *args, **kwargs):
-        queryset = WorkPerformedType.objects.prefetch_related('defects').values('work_performed_type', 'defects__name')
-        return Response(queryset)
+    def get_reference_data(self):
+        return WorkPerformedType.objects.prefetch_related('defects').values('work_performed_type', 'defects__name')